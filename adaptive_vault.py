@@ -1,14 +1,18 @@
 #!/usr/bin/env python3
 # adaptive_vault.py — live adaptive console
 
-from translator_gate import process_upload
+from translator_gate import process_upload, process_spool, SPOOL_FILES
 from policy import choose_cipher
-from crypto import encrypt, sign_log
+from crypto import encrypt
 from monitor import get_resource_state
 from datetime import datetime
 from modules.api_registry import find_api, update_cache
 from modules.learning.neural_core import NeuralCore
-import json, time, os
+from modules.intake_watcher import IntakeWatcher
+from modules import audit_writer
+import audit
+from concurrent.futures import ProcessPoolExecutor
+import time, os
 
 # --- Initialize neural core memory and API cache ---
 core = NeuralCore()
@@ -50,13 +54,73 @@ def log_state(gate_status, cpu, cipher, message=""):
     print(f"[{ts}] GATE: {gate_status:<10} | CPU: {cpu:>5.1f}% | Cipher: {cipher:<8} | {message}")
 
 
+def record_allowed(base_dir, mission, message="System active"):
+    """Pick a cipher for the current load and write the signed audit entry."""
+    metrics = get_resource_state()
+    cipher = choose_cipher(metrics, mission)
+    cpu = metrics.get("cpu", 0.0)
+
+    # Reinforcement signal: performance success
+    core.record_experience("efficiency_engine", "success", latency=cpu / 10 or 1.0)
+
+    # hash-chained, and signed with the rest of its flush batch under one Merkle root
+    entry = {"ts": time.time(), "cpu": cpu, "cipher": cipher}
+    audit.open_log(os.path.join(base_dir, "audit.log")).write(entry)
+
+    log_state("allow", cpu, cipher, message)
+
+
+def run_spool_pass(base_dir, mission, spool_dir, pool, min_age=0):
+    """Batch mode: gate every upload waiting in the spool directory."""
+    results = process_spool(spool_dir, pool=pool, min_age=min_age)
+    if not results:
+        log_state("waiting", 0.0, "-", f"Spool empty: {spool_dir}")
+        return False
+    allowed = 0
+    for res in results:
+        if res.get("status") == "allow":
+            allowed += 1
+            core.record_experience("translator_gate", "success")
+        else:
+            core.record_experience("translator_gate", "failure")
+    log_state("batch", 0.0, "-", f"{len(results)} artifacts, {allowed} allowed, "
+                                 f"{len(results) - allowed} quarantined/rejected")
+    if allowed:
+        record_allowed(base_dir, mission, f"Spool batch of {len(results)}")
+    return True
+
+
 def main():
     base_dir = os.getcwd()
     mission = load_env(os.path.join(base_dir, "mission.env"))
     print("[INIT] Mission loaded:", mission.get("MISSION", "unknown"))
 
+    # Signing policy for the console's audit log, set once before anything writes to it
+    audit.open_log(os.path.join(base_dir, "audit.log"), sign=True)
+
+    # Optional batch intake: SPOOL_DIR=<dir> and GATE_WORKERS=<n> in mission.env
+    spool_dir = mission.get("SPOOL_DIR")
+    pool = None
+    if spool_dir:
+        spool_dir = os.path.join(base_dir, spool_dir)
+        workers = int(mission.get("GATE_WORKERS", 0)) or None
+        pool = ProcessPoolExecutor(max_workers=workers)
+        print(f"[INIT] Spool intake: {spool_dir} ({workers or os.cpu_count()} workers)")
+
+    # Event-driven intake: sleep until an upload finishes landing (INTAKE_HEARTBEAT caps the idle wait)
+    heartbeat = float(mission.get("INTAKE_HEARTBEAT", 60))
+    watcher = IntakeWatcher(spool_dir or base_dir, names=SPOOL_FILES, recursive=bool(spool_dir))
+
     while True:
         try:
+            if spool_dir:
+                core.record_experience("core_loop", "success")
+                if not run_spool_pass(base_dir, mission, spool_dir, pool, min_age=watcher.settle):
+                    watcher.wait(timeout=heartbeat)
+                else:
+                    maybe_run_diag()
+                continue
+
             manifest_path = os.path.join(base_dir, "manifest.json")
             sig_path = os.path.join(base_dir, "manifest.sig")
             artifact_path = os.path.join(base_dir, "artifact.bin")
@@ -67,7 +131,11 @@ def main():
             # Check required files
             if not all(os.path.exists(p) for p in [manifest_path, sig_path, artifact_path]):
                 log_state("waiting", 0.0, "-", "No input files detected")
-                time.sleep(5)
+                watcher.wait(timeout=heartbeat)
+                continue
+            if watcher.pending():
+                # an upload is still being written; don't hash a partial file
+                watcher.wait(timeout=heartbeat)
                 continue
 
             # Run translator gate
@@ -77,27 +145,13 @@ def main():
             if gate_status != "allow":
                 core.record_experience("translator_gate", "failure")
                 log_state(gate_status, 0.0, "-", "Quarantined or rejected")
-                time.sleep(5)
+                watcher.wait(timeout=heartbeat)
                 continue
 
             core.record_experience("translator_gate", "success")
-
-            # Gather metrics & choose cipher
-            metrics = get_resource_state()
-            cipher = choose_cipher(metrics, mission)
-            cpu = metrics.get("cpu", 0.0)
-
-            # Reinforcement signal: performance success
-            core.record_experience("efficiency_engine", "success", latency=cpu / 10 or 1.0)
-
-            entry = {"ts": time.time(), "cpu": cpu, "cipher": cipher}
-            signed_entry = sign_log(entry)
-            with open(os.path.join(base_dir, "audit.log"), "a") as f:
-                f.write(json.dumps(signed_entry) + "\n")
-
-            log_state(gate_status, cpu, cipher, "System active")
+            record_allowed(base_dir, mission)
             maybe_run_diag()
-            time.sleep(5)
+            watcher.wait(timeout=heartbeat)
 
         except KeyboardInterrupt:
             print("\n[CTRL+C] Graceful shutdown...")
@@ -107,6 +161,11 @@ def main():
             log_state("error", 0.0, "-", f"GATE ERROR: {e}")
             time.sleep(5)
 
+    watcher.close()
+    if pool is not None:
+        pool.shutdown()
+    audit_writer.close_all()  # flush queued audit entries before exiting
+
     # Post-run self-reflection
     print("\n[SHUTDOWN] Reflecting on recent performance...")
     core.introspect()
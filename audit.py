@@ -0,0 +1,247 @@
+# audit.py
+"""
+Hash-chained audit log.
+Every entry gets seq, prev (hash of the entry before it) and hash = sha256(prev ||
+canonical entry), so no line can be changed, dropped or reordered without breaking
+every later link. Every CHECKPOINT_EVERY entries a signed checkpoint entry is chained
+in. verify() resumes from the last checkpoint it already checked (state kept in
+audit.verify), so a check costs the entries added since then, not the whole log.
+
+The chain is linked by the audit writer's flusher thread while it holds the log's
+flock, reading the head back from the file, so processes appending to the same log
+extend one chain instead of forking it. The log is rolled
+over into compressed, indexed segments (modules/audit_segments.py); the chain runs on
+across them and verify() follows it from segment to segment.
+"""
+
+import os, json, time, hashlib, threading
+import crypto
+from modules import audit_writer, audit_segments
+
+AUDIT_LOG = "audit.log"
+VERIFY_STATE = "audit.verify"
+CHECKPOINT_EVERY = 1000
+GENESIS = "0" * 64
+TAIL = 64 << 10    # bytes read back at a time when recovering the chain head
+_UNHASHED = ("hash", "signature", "merkle")
+
+def entry_hash(entry):
+    body = {k: v for k, v in entry.items() if k not in _UNHASHED}
+    return hashlib.sha256(bytes.fromhex(entry["prev"]) +
+                          json.dumps(body, sort_keys=True).encode()).hexdigest()
+
+def last_link(path):
+    """(seq, hash) of the last chained entry in path or its segments, or (0, GENESIS)."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return audit_segments.last_link(path) or (0, GENESIS)
+    with f:
+        end = os.fstat(f.fileno()).st_size
+        carry = b""
+        while end > 0:
+            start = max(0, end - TAIL)
+            f.seek(start)
+            chunk = f.read(end - start) + carry
+            lines = chunk.split(b"\n")
+            carry = lines.pop(0) if start > 0 else b""  # maybe a partial line
+            for raw in reversed(lines):
+                try:
+                    e = json.loads(raw)
+                except ValueError:
+                    continue
+                if isinstance(e, dict) and "hash" in e and "seq" in e:
+                    return e["seq"], e["hash"]
+            end = start
+    return audit_segments.last_link(path) or (0, GENESIS)
+
+
+class AuditChain:
+    """Links entries for one log file; used as its audit writer's sealer."""
+
+    def __init__(self, path=AUDIT_LOG, sign=False, checkpoint_every=CHECKPOINT_EVERY):
+        self.path = path
+        self.sign = sign
+        self.checkpoint_every = checkpoint_every
+        self.seq = None
+        self.head = None
+
+    def seal(self, entries):
+        """Chain copies of entries, add due checkpoints, and sign. Returns the records to write.
+
+        Called by the audit writer holding the log's flock, so the head read back from
+        the log is the one these records are appended after, whichever process wrote
+        it. Nothing is kept unless the whole batch was linked; a key that cannot be
+        loaded leaves the records chained but unsigned.
+        """
+        seq, head = last_link(self.path)
+        out = []
+
+        def link(entry):
+            nonlocal seq, head
+            seq += 1
+            entry["seq"] = seq
+            entry["prev"] = head
+            entry["hash"] = head = entry_hash(entry)
+            out.append(entry)
+
+        for e in entries:
+            e = dict(e)
+            e.setdefault("ts", time.time())  # segment indexes range over it
+            link(e)
+            if seq % self.checkpoint_every == 0:
+                link({"action": "checkpoint", "ts": time.time(), "head": head})
+        try:
+            if self.sign:
+                crypto.sign_batch(out)
+            else:
+                for e in out:
+                    if e.get("action") == "checkpoint":
+                        crypto.sign_log(e)
+        except (OSError, ValueError, TypeError) as err:  # missing, unreadable or malformed key
+            print(f"[AUDIT] cannot sign {self.path}: {err}")
+            for e in out:
+                e.pop("signature", None)
+                e.pop("merkle", None)
+        self.seq, self.head = seq, head
+        return out
+
+
+_chains = {}
+_lock = threading.Lock()
+
+def open_log(path=AUDIT_LOG, sign=None):
+    """The chained, segmented writer for path; sign=True also Merkle-signs every flushed batch."""
+    key = os.path.abspath(path)
+    with _lock:
+        chain = _chains.get(key)
+        if chain is None:
+            chain = _chains[key] = AuditChain(key)
+            # segments a previous run rolled but did not get to compress
+            threading.Thread(target=audit_segments.seal_pending, args=(key,),
+                             name="audit-seal", daemon=True).start()
+        if sign is not None:
+            chain.sign = sign
+    return audit_writer.get(key, sealer=chain.seal, roller=audit_segments.roll)
+
+def append_entry(data, sync=False, path=AUDIT_LOG):
+    """Queue one entry on the chained log; sync=True returns once it is on disk."""
+    return open_log(path).write(data, sync=sync)
+
+
+# --- verification ---
+def _load_state(state_path):
+    try:
+        with open(state_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_state(state_path, state):
+    tmp = state_path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, state_path)
+
+def _parts(path):
+    """(segment number or None for the live file, file) for the whole log, oldest first."""
+    return audit_segments.segments(path) + [(None, os.path.abspath(path))]
+
+def _anchored(file, state):
+    """True if the checkpoint line state was saved at still ends at state["offset"] in file."""
+    at = state["offset"] - state["length"]
+    if at < 0:
+        return False
+    try:
+        for _, raw in audit_segments.read_lines(file, at):
+            return len(raw) == state["length"] and json.loads(raw).get("hash") == state["hash"]
+    except (OSError, ValueError, AttributeError):
+        pass
+    return False
+
+def _resume(parts, state):
+    """Index into parts and offset to continue verifying from, or None."""
+    if state.get("segment") is not None:
+        candidates = [i for i, (n, _) in enumerate(parts) if n == state["segment"]]
+    else:
+        # the live file it was saved for may have been rolled over since
+        candidates = list(range(len(parts) - 1, -1, -1))
+    for i in candidates:
+        if _anchored(parts[i][1], state):
+            return i, state["offset"]
+    return None
+
+def verify(path=AUDIT_LOG, state_path=VERIFY_STATE, full=False):
+    """Check the chain from the last verified checkpoint (or from the start), across
+    the rolled segments and the live file.
+
+    Returns {"ok", "verified", "start", "checkpoint", "errors": [(file, offset, reason)]},
+    start being (file, offset). The saved state only ever advances to a checkpoint whose
+    signature verifies and whose chain is intact up to it.
+    """
+    state = None if full else _load_state(state_path)
+    parts = _parts(path)
+    first, start, seq, head = 0, 0, 0, GENESIS
+    errors = []
+    if state:
+        found = _resume(parts, state)
+        if found is None:
+            errors.append((None, state["offset"], "checkpoint anchor changed; re-verifying from start"))
+        else:
+            (first, start), seq, head = found, state["seq"], state["hash"]
+
+    resumed = (os.path.basename(parts[first][1]), start)
+    verified, chained, checkpoint = 0, seq > 0, seq or None
+    broken = False
+    for number, file in parts[first:]:
+        name = os.path.basename(file)
+        try:
+            for line_at, raw in audit_segments.read_lines(file, start):
+                try:
+                    e = json.loads(raw)
+                    if not isinstance(e, dict):
+                        raise ValueError(raw)
+                except ValueError:
+                    errors.append((name, line_at, "malformed line"))
+                    broken = True
+                    break
+                if "hash" not in e:
+                    if chained:
+                        errors.append((name, line_at, "unchained entry inside the chain"))
+                        broken = True
+                        break
+                    continue  # legacy lines written before the chain started
+                chained = True
+                if e.get("prev") != head or e.get("seq") != seq + 1:
+                    errors.append((name, line_at, f"chain broken at seq {e.get('seq')}"))
+                    broken = True
+                    break
+                try:
+                    ok = entry_hash(e) == e["hash"]
+                except (KeyError, TypeError, ValueError):
+                    ok = False
+                if not ok:
+                    errors.append((name, line_at, f"entry {e.get('seq')} does not match its hash"))
+                    broken = True
+                    break
+                seq, head = e["seq"], e["hash"]
+                verified += 1
+                if e.get("action") == "checkpoint":
+                    if not crypto.verify_log(e):
+                        errors.append((name, line_at, f"checkpoint {seq} signature does not verify"))
+                        broken = True
+                        break
+                    checkpoint = seq
+                    _save_state(state_path, {"segment": number, "offset": line_at + len(raw),
+                                             "length": len(raw), "seq": seq, "hash": head})
+        except (OSError, ValueError) as err:
+            errors.append((name, start, f"unreadable: {err}"))
+            broken = True
+        if broken:
+            break
+        start = 0
+    return {"ok": not broken, "verified": verified, "start": resumed, "checkpoint": checkpoint,
+            "errors": errors}
+
+if __name__ == "__main__":
+    print(json.dumps(verify(), indent=2))
@@ -1,7 +1,14 @@
 from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from cryptography.hazmat.primitives import serialization
-import os, json, base64
+from cryptography.exceptions import InvalidSignature
+from verify_manifest import load_pubkey, PUBKEY_PATH, PRIVKEY_PATH
+import os, json, base64, hashlib, functools
+
+# Merkle batch signing: one Ed25519 signature over the root of a batch, and an
+# inclusion proof in every entry so each line still verifies on its own
+MERKLE_TAG = b"adaptive-vault/merkle-root/v1:"
+_LEAF, _NODE = b"\x00", b"\x01"
 
 def encrypt(data: bytes, cipher_name: str) -> bytes:
     key = os.urandom(32)
@@ -9,10 +16,100 @@ def encrypt(data: bytes, cipher_name: str) -> bytes:
     cipher = AESGCM(key) if cipher_name == "aesgcm" else ChaCha20Poly1305(key)
     return cipher.encrypt(nonce, data, None)
 
-def sign_log(entry: dict, privkey_path="keys/privkey.pem"):
-    with open(privkey_path, "rb") as keyfile:
-        private_key = Ed25519PrivateKey.from_private_bytes(keyfile.read())
-    payload = json.dumps(entry, sort_keys=True).encode()
-    signature = private_key.sign(payload)
+@functools.lru_cache(maxsize=4)
+def _load_privkey(path, mtime_ns):
+    with open(path, "rb") as keyfile:
+        return Ed25519PrivateKey.from_private_bytes(keyfile.read())
+
+def load_privkey(path=PRIVKEY_PATH):
+    """Parsed signing key; read once per process and again only if the file changes."""
+    return _load_privkey(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+def _payload(entry):
+    # what gets signed: the entry without its signature material
+    body = {k: v for k, v in entry.items() if k not in ("signature", "merkle")}
+    return json.dumps(body, sort_keys=True).encode()
+
+def sign_log(entry: dict, privkey_path=PRIVKEY_PATH):
+    signature = load_privkey(privkey_path).sign(_payload(entry))
     entry["signature"] = base64.b64encode(signature).decode()
     return entry
+
+# --- Merkle batches ---
+def _leaf(entry):
+    return hashlib.sha256(_LEAF + _payload(entry)).digest()
+
+def _levels(leaves):
+    """All tree levels, leaves first; an odd node at the end of a level moves up unchanged."""
+    levels = [leaves]
+    while len(levels[-1]) > 1:
+        cur = levels[-1]
+        nxt = [hashlib.sha256(_NODE + cur[i] + cur[i + 1]).digest() for i in range(0, len(cur) - 1, 2)]
+        if len(cur) % 2:
+            nxt.append(cur[-1])
+        levels.append(nxt)
+    return levels
+
+def _proof(levels, index):
+    proof = []
+    for level in levels[:-1]:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(level[sibling].hex())
+        index //= 2
+    return proof
+
+def _root_from_proof(leaf, index, size, proof):
+    node, width, steps = leaf, size, iter(proof)
+    while width > 1:
+        if index % 2:
+            node = hashlib.sha256(_NODE + bytes.fromhex(next(steps)) + node).digest()
+        elif index + 1 < width:
+            node = hashlib.sha256(_NODE + node + bytes.fromhex(next(steps))).digest()
+        index, width = index // 2, (width + 1) // 2
+    if next(steps, None) is not None:
+        raise ValueError("proof longer than the tree")
+    return node
+
+def sign_batch(entries, privkey_path=PRIVKEY_PATH):
+    """Sign a list of entry dicts with one signature over their Merkle root.
+
+    Each entry gets "signature" (the root signature, base64) and "merkle" with the
+    root, its index, the batch size and its inclusion proof. Entries are modified
+    in place and returned.
+    """
+    if not entries:
+        return entries
+    levels = _levels([_leaf(e) for e in entries])
+    root = levels[-1][0]
+    signature = base64.b64encode(load_privkey(privkey_path).sign(MERKLE_TAG + root)).decode()
+    for i, e in enumerate(entries):
+        e["signature"] = signature
+        e["merkle"] = {"root": root.hex(), "index": i, "size": len(entries),
+                       "proof": _proof(levels, i)}
+    return entries
+
+def verify_log(entry: dict, pubkey_path=PUBKEY_PATH, roots=None):
+    """True if entry's signature (plain or Merkle-batched) verifies under the public key.
+
+    roots, a set shared across calls, remembers batch roots whose signature already
+    verified, so the rest of a batch only costs its inclusion proof.
+    """
+    try:
+        signature = base64.b64decode(entry["signature"], validate=True)
+        merkle = entry.get("merkle")
+        if merkle is None:
+            message = _payload(entry)
+        else:
+            root = _root_from_proof(_leaf(entry), merkle["index"], merkle["size"], merkle["proof"])
+            if root.hex() != merkle["root"]:
+                return False
+            if roots is not None and (merkle["root"], entry["signature"]) in roots:
+                return True
+            message = MERKLE_TAG + root
+        load_pubkey(pubkey_path).verify(signature, message)
+        if roots is not None and merkle is not None:
+            roots.add((merkle["root"], entry["signature"]))
+        return True
+    except (InvalidSignature, KeyError, TypeError, ValueError, StopIteration):
+        return False
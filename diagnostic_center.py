@@ -49,7 +49,30 @@ def run_diagnostic_menu():
     choice = input(Fore.WHITE + "Enter option: ").strip()
     section("Executing Task", "🚀", Fore.MAGENTA)
 
-    if choice == "8":
+    if choice == "2":
+        try:
+            import audit
+            from modules import audit_verify
+            print(Fore.CYAN + "[AUDIT] Checking hash chain...")
+            chain = audit.verify()
+            if chain["ok"]:
+                print(Fore.GREEN + f"✅ Hash chain intact: {chain['verified']} entries checked "
+                      f"(last checkpoint {chain['checkpoint']}).")
+            for where, offset, reason in chain["errors"]:
+                print((Fore.YELLOW if chain["ok"] else Fore.RED) + f"⚠️ {where or 'audit.log'}@{offset}: {reason}")
+            print(Fore.CYAN + "[AUDIT] Verifying signatures...")
+            report = audit_verify.verify_signatures()
+            color = Fore.GREEN if not report["bad"] and not report["malformed"] else Fore.RED
+            print(color + f"🔏 {report['ok']}/{report['checked']} signatures valid, {report['bad']} bad, "
+                  f"{report['malformed']} malformed, {report['missing']} unsigned "
+                  f"({report['rate']:.0f} entries/s).")
+            for kind in ("bad", "malformed"):
+                for where, offset in report["offsets"][kind][:10]:
+                    print(Fore.RED + f"   {kind}: {where}@{offset}")
+        except Exception as e:
+            print(Fore.RED + f"⚠️ Audit integrity check error: {e}")
+
+    elif choice == "8":
         service = ExternalIntelligenceService()
         try:
             print(Fore.CYAN + "[NET] Checking external intelligence feeds...")
@@ -0,0 +1,160 @@
+# modules/audit_dedupe.py
+"""
+Audit Dedupe
+Incremental duplicate-line removal for the live audit log (duplicates come from a
+batch replayed after a failed write). Each run reads only the lines appended since the
+last one, from the offset kept in the index file, and checks their 16-byte digests
+against an on-disk open-addressing table (memory-mapped, so memory use does not grow
+with the log). Duplicates are dropped by compacting the new lines in place; nothing
+before the first duplicate is ever rewritten.
+
+Every slot stores the global position its line was kept at. A line that finds its own
+position is not a duplicate, so a run interrupted halfway through compacting can be
+repeated safely. The pass holds the same flock the audit writer appends under.
+
+Only for unchained logs (written before audit.py's hash chain, or by other writers):
+a replayed batch of the chained log is sealed again with a new seq/prev/hash, so its
+lines are never byte-identical, and dropping any chained line would break the chain.
+"""
+
+import os, mmap, struct, hashlib, fcntl
+
+INDEX = "audit.dedupe"
+MAGIC = b"AVDEDUP1"
+HEADER = struct.Struct("<8sQQQQQ")   # magic, slot count, slots used, log inode, base, offset
+SLOT = struct.Struct("<16sQ")        # line digest, global position the line was kept at
+INITIAL_SLOTS = 1 << 16
+MAX_LOAD = 0.6
+_EMPTY = b"\0" * 16
+
+def line_digest(raw):
+    d = hashlib.blake2b(raw.strip(), digest_size=16).digest()
+    return d if d != _EMPTY else d[:15] + b"\1"  # all-zero marks an empty slot
+
+
+class DigestIndex:
+    """(digest -> position) table in a memory-mapped file, doubled when it fills up.
+    Positions are base + offset in the current log file; base moves past a log file
+    once it is rolled over or replaced, so positions never repeat."""
+
+    def __init__(self, path=INDEX, slots=INITIAL_SLOTS):
+        self.path = path
+        if not os.path.exists(path):
+            self._create(path, slots)
+        self._open()
+
+    @staticmethod
+    def _create(path, slots, fields=(0, 0, 0, 0)):
+        with open(path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, slots, *fields))
+            f.truncate(HEADER.size + slots * SLOT.size)
+
+    def _open(self):
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, self.slots, self.used, self.inode, self.base, self.offset = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{self.path}: not an audit dedupe index")
+        self._mask = self.slots - 1
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def find(self, digest):
+        """(slot, position kept at or None) for digest."""
+        i = int.from_bytes(digest[:8], "little") & self._mask
+        m = self._map
+        while True:
+            at = HEADER.size + i * SLOT.size
+            stored = m[at:at + 16]
+            if stored == _EMPTY:
+                return i, None
+            if stored == digest:
+                return i, SLOT.unpack_from(m, at)[1]
+            i = (i + 1) & self._mask
+
+    def put(self, slot, digest, pos, new):
+        SLOT.pack_into(self._map, HEADER.size + slot * SLOT.size, digest, pos)
+        if new:
+            self.used += 1
+            if self.used > self.slots * MAX_LOAD:
+                self._grow()
+
+    def _grow(self):
+        tmp = self.path + ".tmp"
+        self._create(tmp, self.slots * 2, (0, self.inode, self.base, self.offset))
+        bigger = DigestIndex(tmp)
+        for i in range(self.slots):
+            digest, pos = SLOT.unpack_from(self._map, HEADER.size + i * SLOT.size)
+            if digest != _EMPTY:
+                slot, _ = bigger.find(digest)
+                bigger.put(slot, digest, pos, True)
+        bigger.commit()
+        bigger.close()
+        self.close()
+        os.replace(tmp, self.path)
+        self._open()
+
+    def commit(self):
+        HEADER.pack_into(self._map, 0, MAGIC, self.slots, self.used, self.inode, self.base, self.offset)
+        self._map.flush()
+
+
+def _compact(path, log, index):
+    """Check the lines from index.offset on; returns how many duplicates were dropped."""
+    read_at = write_at = index.offset
+    removed = 0
+    with open(path, "rb") as reader:
+        reader.seek(read_at)
+        for raw in reader:
+            if not raw.endswith(b"\n"):
+                break  # a line still being written; the next run picks it up
+            here = read_at
+            read_at += len(raw)
+            if raw.strip():
+                digest = line_digest(raw)
+                slot, kept = index.find(digest)
+                if kept is not None and kept != index.base + here:
+                    removed += 1
+                    continue
+            if write_at != here:
+                log.seek(write_at)
+                log.write(raw)  # only ever lands on lines already read
+            if raw.strip():
+                # recorded only once the line sits at its position
+                index.put(slot, digest, index.base + write_at, kept is None)
+            write_at += len(raw)
+        if write_at != read_at:
+            reader.seek(read_at)
+            tail = reader.read()
+            log.seek(write_at)
+            log.write(tail)
+            log.truncate(write_at + len(tail))
+            os.fsync(log.fileno())
+    index.offset = write_at
+    return removed
+
+def dedupe(path, index_path=INDEX):
+    """Drop duplicate lines appended to the log at path since the last run; returns how
+    many were dropped, or None if there is no log."""
+    try:
+        log = open(path, "r+b", buffering=0)
+    except FileNotFoundError:
+        return None
+    index = DigestIndex(index_path)
+    with log:
+        fcntl.flock(log, fcntl.LOCK_EX)  # the audit writer appends under the same lock
+        try:
+            st = os.fstat(log.fileno())
+            if st.st_ino != index.inode or st.st_size < index.offset:
+                # rolled over or replaced: positions carry on past the old file
+                index.base += index.offset
+                index.inode, index.offset = st.st_ino, 0
+            removed = _compact(path, log, index)
+            index.commit()
+        finally:
+            fcntl.flock(log, fcntl.LOCK_UN)
+            index.close()
+    return removed
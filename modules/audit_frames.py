@@ -0,0 +1,341 @@
+# modules/audit_frames.py
+"""
+Audit Frames
+Binary form of the audit log: after an 8-byte file magic, one frame per entry,
+    body length <I | signature length <H | CBOR body | raw signature | CRC32 <I
+the CRC covering everything before it in the frame. The Ed25519 signature is stored
+raw instead of base64, and lowercase hex strings (hashes, chain links, Merkle proofs)
+as CBOR byte strings under tag 23 ("expected base16"), about half their JSON size.
+Converting back gives the same JSON lines, so signatures and the hash chain verify
+on either form.
+
+FrameReader maps the file and walks frame headers without decoding bodies, so it can
+index, iterate or jump to a record at an offset without copying the file.
+
+    python -m modules.audit_frames to-frames audit.log audit.avf
+    python -m modules.audit_frames to-jsonl audit.avf audit.log
+    python -m modules.audit_frames bench audit.log
+"""
+
+import os, re, sys, mmap, json, time, zlib, base64, struct, binascii
+
+try:
+    import cbor2   # C decoder for bodies, if installed; frames are written the same either way
+except Exception:
+    cbor2 = None
+
+MAGIC = b"AVFRAME1"
+HEAD = struct.Struct("<IH")   # body length, signature length
+CRC = struct.Struct("<I")
+HEX_TAG = 23
+BIGNUM_TAGS = (2, 3)          # unsigned / negative bignum: integers past 64 bits
+_HEX = re.compile(r"(?:[0-9a-f]{2}){8,}")   # only these survive bytes -> .hex() unchanged
+
+
+class FrameError(ValueError):
+    pass
+
+
+# --- CBOR (the subset JSON needs, plus bignums and tag 23 for hex) ---
+def _head(major, n):
+    if n < 24:
+        return bytes([major << 5 | n])
+    for info, size in ((24, 1), (25, 2), (26, 4), (27, 8)):
+        if n < 1 << (8 * size):
+            return bytes([major << 5 | info]) + n.to_bytes(size, "big")
+    raise ValueError(f"integer {n} too large for CBOR")
+
+def _encode(obj, out):
+    if obj is None:
+        out += b"\xf6"
+    elif obj is True:
+        out += b"\xf5"
+    elif obj is False:
+        out += b"\xf4"
+    elif isinstance(obj, int):
+        major, n = (0, obj) if obj >= 0 else (1, -1 - obj)
+        if n < 1 << 64:
+            out += _head(major, n)
+        else:
+            raw = n.to_bytes((n.bit_length() + 7) // 8, "big")
+            out += _head(6, BIGNUM_TAGS[major]) + _head(2, len(raw)) + raw
+    elif isinstance(obj, float):
+        out += b"\xfb" + struct.pack(">d", obj)
+    elif isinstance(obj, str):
+        if _HEX.fullmatch(obj):
+            raw = bytes.fromhex(obj)
+            out += _head(6, HEX_TAG) + _head(2, len(raw)) + raw
+        else:
+            data = obj.encode("utf-8")
+            out += _head(3, len(data)) + data
+    elif isinstance(obj, (bytes, bytearray)):
+        out += _head(2, len(obj)) + obj
+    elif isinstance(obj, (list, tuple)):
+        out += _head(4, len(obj))
+        for item in obj:
+            _encode(item, out)
+    elif isinstance(obj, dict):
+        out += _head(5, len(obj))
+        for k, v in obj.items():
+            _encode(k, out)
+            _encode(v, out)
+    else:
+        raise TypeError(f"cannot encode {type(obj).__name__} in an audit frame")
+
+_SIMPLE = {20: False, 21: True, 22: None, 23: None}
+_FLOATS = {25: struct.Struct(">e"), 26: struct.Struct(">f"), 27: struct.Struct(">d")}
+
+def _decode(buf, i):
+    ib = buf[i]
+    major, info = ib >> 5, ib & 31
+    i += 1
+    if major == 7:
+        if info in _SIMPLE:
+            return _SIMPLE[info], i
+        if info in _FLOATS:
+            fmt = _FLOATS[info]
+            return fmt.unpack_from(buf, i)[0], i + fmt.size
+        raise FrameError(f"unsupported CBOR simple value {info}")
+    if info < 24:
+        n = info
+    elif info < 28:
+        size = 1 << (info - 24)
+        n = int.from_bytes(buf[i:i + size], "big")
+        i += size
+    else:
+        raise FrameError("indefinite-length CBOR items are not supported")
+    if major == 0:
+        return n, i
+    if major == 1:
+        return -1 - n, i
+    if major == 2:
+        return bytes(buf[i:i + n]), i + n
+    if major == 3:
+        return str(buf[i:i + n], "utf-8"), i + n
+    if major == 4:
+        out = []
+        for _ in range(n):
+            item, i = _decode(buf, i)
+            out.append(item)
+        return out, i
+    if major == 5:
+        out = {}
+        for _ in range(n):
+            k, i = _decode(buf, i)
+            out[k], i = _decode(buf, i)
+        return out, i
+    value, i = _decode(buf, i)  # major 6: tag
+    if n == HEX_TAG and isinstance(value, bytes):
+        return value.hex(), i
+    if n in BIGNUM_TAGS and isinstance(value, bytes):
+        big = int.from_bytes(value, "big")
+        return (big if n == BIGNUM_TAGS[0] else -1 - big), i
+    return value, i
+
+def dumps(obj):
+    out = bytearray()
+    _encode(obj, out)
+    return bytes(out)
+
+def _tag_hook(decoder, tag):
+    if tag.tag == HEX_TAG and isinstance(tag.value, bytes):
+        return tag.value.hex()
+    return tag.value
+
+def loads(buf):
+    if cbor2 is not None:
+        try:
+            return cbor2.loads(bytes(buf), tag_hook=_tag_hook)
+        except cbor2.CBORDecodeError as e:
+            raise FrameError(f"bad CBOR body: {e}")
+    value, end = _decode(buf, 0)
+    if end != len(buf):
+        raise FrameError("trailing bytes after CBOR body")
+    return value
+
+
+# --- frames ---
+def _raw_signature(entry):
+    sig = entry.get("signature")
+    if not isinstance(sig, str):
+        return b""
+    try:
+        raw = base64.b64decode(sig, validate=True)
+    except (binascii.Error, ValueError):
+        return b""
+    # only when it turns back into the very same text
+    return raw if raw and base64.b64encode(raw).decode() == sig else b""
+
+def encode_frame(entry):
+    sig = _raw_signature(entry)
+    if sig:
+        entry = dict(entry, signature=None)  # keeps the key where it was
+    body = dumps(entry)
+    frame = HEAD.pack(len(body), len(sig)) + body + sig
+    return frame + CRC.pack(zlib.crc32(frame))
+
+def decode_frame(body, sig):
+    entry = loads(body)
+    if len(sig):
+        entry["signature"] = base64.b64encode(sig).decode()
+    return entry
+
+
+class FrameReader:
+    """Memory-mapped reader for a frames file; use as a context manager."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < len(MAGIC):
+                raise FrameError(f"{path}: not an audit frames file")
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self._map.close()
+            raise FrameError(f"{path}: not an audit frames file")
+        self.size = size
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _bounds(self, offset):
+        """(body start, signature start, signature end, next frame) for the frame at offset, CRC checked."""
+        if offset + HEAD.size > self.size:
+            raise FrameError(f"{self.path}: truncated frame header at {offset}")
+        blen, slen = HEAD.unpack_from(self._map, offset)
+        body = offset + HEAD.size
+        sig = body + blen
+        end = sig + slen + CRC.size
+        if end > self.size:
+            raise FrameError(f"{self.path}: truncated frame at {offset}")
+        with memoryview(self._map) as view:
+            crc = zlib.crc32(view[offset:sig + slen])
+        if crc != CRC.unpack_from(self._map, sig + slen)[0]:
+            raise FrameError(f"{self.path}: CRC mismatch in frame at {offset}")
+        return body, sig, sig + slen, end
+
+    def offsets(self):
+        """Offset of every frame, from the headers alone (no CRC or decoding)."""
+        out, offset = [], len(MAGIC)
+        while offset + HEAD.size <= self.size:
+            out.append(offset)
+            blen, slen = HEAD.unpack_from(self._map, offset)
+            offset += HEAD.size + blen + slen + CRC.size
+        return out
+
+    def read(self, offset):
+        """(entry, offset of the next frame) for the frame at offset."""
+        body, sig, sig_end, end = self._bounds(offset)
+        with memoryview(self._map) as view:
+            entry = decode_frame(view[body:sig], view[sig:sig_end])
+        return entry, end
+
+    def __iter__(self):
+        """(offset, entry) for every frame; raises FrameError at the first damaged one."""
+        offset = len(MAGIC)
+        while offset < self.size:
+            entry, nxt = self.read(offset)
+            yield offset, entry
+            offset = nxt
+
+
+def append_frames(path, entries):
+    """Append entries as frames to path, starting the file if needed; returns bytes written."""
+    data = b"".join(encode_frame(e) for e in entries)
+    with open(path, "ab") as f:
+        if f.tell() == 0:
+            data = MAGIC + data
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return len(data)
+
+
+# --- conversion ---
+def to_frames(jsonl_path, frames_path, batch=4096):
+    """Convert a JSONL audit log; non-JSON lines are skipped. Returns (entries, skipped)."""
+    count = skipped = 0
+    tmp = frames_path + ".tmp"
+    with open(jsonl_path, "rb") as src, open(tmp, "wb") as dst:
+        dst.write(MAGIC)
+        chunk = []
+        for raw in src:
+            try:
+                e = json.loads(raw)
+            except ValueError:
+                skipped += raw.strip() != b""
+                continue
+            if not isinstance(e, dict):
+                skipped += 1
+                continue
+            chunk.append(encode_frame(e))
+            count += 1
+            if len(chunk) >= batch:
+                dst.write(b"".join(chunk))
+                chunk = []
+        dst.write(b"".join(chunk))
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, frames_path)
+    return count, skipped
+
+def to_jsonl(frames_path, jsonl_path):
+    """Convert a frames file back to JSON lines; returns the number of entries."""
+    count = 0
+    tmp = jsonl_path + ".tmp"
+    with FrameReader(frames_path) as reader, open(tmp, "w", encoding="utf-8") as dst:
+        for _, e in reader:
+            dst.write(json.dumps(e) + "\n")
+            count += 1
+    os.replace(tmp, jsonl_path)
+    return count
+
+def bench(jsonl_path):
+    """Size and full-scan time of a JSONL log against its frames form."""
+    frames_path = jsonl_path + ".avf"
+    t = time.perf_counter()
+    count, _ = to_frames(jsonl_path, frames_path)
+    convert = time.perf_counter() - t
+    t = time.perf_counter()
+    with open(jsonl_path, "rb") as f:
+        for raw in f:
+            try:
+                json.loads(raw)
+            except ValueError:
+                pass
+    scan_json = time.perf_counter() - t
+    t = time.perf_counter()
+    with FrameReader(frames_path) as reader:
+        for _ in reader:
+            pass
+    scan_frames = time.perf_counter() - t
+    t = time.perf_counter()
+    with FrameReader(frames_path) as reader:
+        headers = len(reader.offsets())
+    index = time.perf_counter() - t
+    jsize, fsize = os.path.getsize(jsonl_path), os.path.getsize(frames_path)
+    os.unlink(frames_path)
+    print(f"[BENCH] {count} entries: jsonl {jsize} B, frames {fsize} B ({jsize / max(fsize, 1):.2f}x smaller)")
+    print(f"[BENCH] convert {convert:.3f}s | scan jsonl {scan_json:.3f}s | scan frames {scan_frames:.3f}s "
+          f"| index {headers} frames {index:.3f}s")
+    return {"entries": count, "jsonl_bytes": jsize, "frame_bytes": fsize,
+            "scan_jsonl": scan_json, "scan_frames": scan_frames, "index": index}
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else ""
+    if cmd == "to-frames" and len(sys.argv) == 4:
+        print("[FRAMES] %d entries converted, %d lines skipped" % to_frames(sys.argv[2], sys.argv[3]))
+    elif cmd == "to-jsonl" and len(sys.argv) == 4:
+        print(f"[FRAMES] {to_jsonl(sys.argv[2], sys.argv[3])} entries converted")
+    elif cmd == "bench" and len(sys.argv) == 3:
+        bench(sys.argv[2])
+    else:
+        sys.exit("usage: python -m modules.audit_frames to-frames LOG OUT | to-jsonl FRAMES OUT | bench LOG")
@@ -0,0 +1,304 @@
+# modules/audit_segments.py
+"""
+Audit Segments
+The audit writer rolls the live log over (by size or age) to <log>.<n>, numbered
+oldest first; seal() then compresses it in independent blocks (zstd if installed,
+else gzip) and writes a sidecar index, <log>.<n>.idx, mapping each artifact sha,
+action and timestamp range to the blocks that hold them. query() reads the indexes
+and decompresses only the blocks that can match, so "what happened to sha X last
+week" costs a few blocks, not the whole history.
+
+Offsets everywhere are uncompressed byte offsets into the segment as it was written,
+so a position in the live log stays valid after the log is rolled and sealed.
+
+A sealer holds the segment's flock from start to finish and writes through private
+temp files, so the roll's own seal thread and another process's seal_pending() can
+race for a segment: one seals it, the other finds it gone.
+"""
+
+import os, io, re, json, gzip, fcntl, tempfile, threading
+from bisect import bisect_right
+
+try:
+    import zstandard
+except Exception:
+    zstandard = None
+
+BLOCK = 256 << 10    # uncompressed bytes per independently compressed block
+CODEC = "zstd" if zstandard is not None else "gzip"
+SUFFIX = {"zstd": ".zst", "gzip": ".gz"}
+INDEXED = ("sha", "action")   # entry fields the sidecar index maps to blocks
+_NAME = re.compile(r"\.(\d{6,})(\.zst|\.gz)?")
+
+def _compress(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, mtime=0)
+
+def _decompress(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+def segment_base(path, number):
+    return f"{os.path.abspath(path)}.{number:06d}"
+
+def index_path(base):
+    return base + ".idx"
+
+def segments(path):
+    """Rolled segments of path, oldest first: [(number, file)]. The file is the sealed
+    one where it exists, else the plain segment still waiting to be sealed."""
+    path = os.path.abspath(path)
+    folder, name = os.path.split(path)
+    found = {}
+    for entry in os.listdir(folder):
+        if not entry.startswith(name + "."):
+            continue
+        m = _NAME.fullmatch(entry[len(name):])
+        if m is None:
+            continue
+        n = int(m.group(1))
+        if m.group(2) or n not in found:
+            found[n] = os.path.join(folder, entry)
+    return sorted(found.items())
+
+def load_index(base):
+    try:
+        with open(index_path(base)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _temp(path):
+    """A new private file next to path, for writing path atomically: (file object, name)."""
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp",
+                               dir=os.path.dirname(path))
+    return os.fdopen(fd, "wb"), tmp
+
+def _write_json(path, data):
+    f, tmp = _temp(path)
+    with f:
+        f.write(json.dumps(data, separators=(",", ":")).encode())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+# --- rolling and sealing ---
+def roll(path):
+    """Move the live log aside as the next segment and seal it in the background.
+    Called by the audit writer between batches, with the log closed."""
+    path = os.path.abspath(path)
+    number = max((n for n, _ in segments(path)), default=0) + 1
+    base = segment_base(path, number)
+    os.replace(path, base)
+    threading.Thread(target=seal, args=(base,), name="audit-seal", daemon=True).start()
+    return base
+
+def seal(base, codec=CODEC):
+    """Compress a plain segment block by block and write its index; returns the sealed
+    file, or None if another thread or process sealed it first."""
+    try:
+        claim = open(base, "rb")
+    except FileNotFoundError:
+        return None
+    with claim:
+        # the lock writers append under: a second sealer waits here, then finds the
+        # segment gone; the audit writer may still hold it for the roll
+        fcntl.flock(claim, fcntl.LOCK_EX)
+        try:
+            if os.stat(base).st_ino != os.fstat(claim.fileno()).st_ino:
+                return None  # sealed and removed while we waited for the lock
+        except FileNotFoundError:
+            return None
+        return _seal(claim, base, codec)
+
+def _seal(src, base, codec):
+    out = base + SUFFIX[codec]
+    idx = {"codec": codec, "lines": 0, "bytes": 0, "ts": None,
+           "first_seq": None, "first_prev": None, "last_seq": None, "last_hash": None,
+           "blocks": [], **{field: {} for field in INDEXED}}
+    dst, tmp = _temp(out)
+    try:
+        with dst:
+            while True:
+                data = src.read(BLOCK)
+                if not data:
+                    break
+                data += src.readline()  # blocks end on a line boundary
+                block = len(idx["blocks"])
+                lo = hi = None
+                for raw in data.split(b"\n"):
+                    try:
+                        e = json.loads(raw)
+                    except ValueError:
+                        continue
+                    if not isinstance(e, dict):
+                        continue
+                    idx["lines"] += 1
+                    ts = e.get("ts")
+                    if isinstance(ts, (int, float)):
+                        lo = ts if lo is None else min(lo, ts)
+                        hi = ts if hi is None else max(hi, ts)
+                    for field in INDEXED:
+                        value = e.get(field)
+                        if isinstance(value, str):
+                            blocks = idx[field].setdefault(value, [])
+                            if not blocks or blocks[-1] != block:
+                                blocks.append(block)
+                    if "hash" in e:
+                        if idx["first_seq"] is None:
+                            idx["first_seq"], idx["first_prev"] = e.get("seq"), e.get("prev")
+                        idx["last_seq"], idx["last_hash"] = e.get("seq"), e["hash"]
+                packed = _compress(codec, data)
+                idx["blocks"].append([idx["bytes"], dst.tell(), len(packed), lo, hi])
+                dst.write(packed)
+                idx["bytes"] += len(data)
+            dst.flush()
+            os.fsync(dst.fileno())
+        spans = [b for b in idx["blocks"] if b[3] is not None]
+        if spans:
+            idx["ts"] = [min(b[3] for b in spans), max(b[4] for b in spans)]
+        # index first: a sealed file is never visible without it
+        _write_json(index_path(base), idx)
+        os.replace(tmp, out)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    os.unlink(base)
+    return out
+
+def seal_pending(path):
+    """Seal segments left plain by an interrupted run."""
+    for n, f in segments(path):
+        if _split(f)[1] is None:
+            try:
+                seal(f)
+            except OSError as e:
+                print(f"[AUDIT] cannot seal {f}: {e}")
+
+
+# --- reading ---
+def _split(file):
+    """(base, codec or None) for a segment or live log file."""
+    for codec, suffix in SUFFIX.items():
+        if file.endswith(suffix):
+            return file[:-len(suffix)], codec
+    return file, None
+
+def _block_lines(data, offset):
+    for raw in io.BytesIO(data):
+        yield offset, raw
+        offset += len(raw)
+
+def block_table(file):
+    """[uncompressed offset, compressed offset, compressed length, ts min, ts max] per
+    block of a sealed segment, or None for a plain file."""
+    base, codec = _split(file)
+    if codec is None:
+        return None
+    idx = load_index(base)
+    if idx is None:
+        raise ValueError(f"{file}: sealed segment without an index")
+    return idx["blocks"]
+
+def read_lines(file, start=0, blocks=None):
+    """(offset, raw line) from a segment or the live log, from uncompressed offset start
+    (a line start). blocks, if given, limits a sealed segment to those block numbers."""
+    base, codec = _split(file)
+    if codec is None:
+        try:
+            f = open(file, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            f.seek(start)
+            offset = start
+            for raw in f:
+                yield offset, raw
+                offset += len(raw)
+        return
+    table = block_table(file)
+    first = max(0, bisect_right([b[0] for b in table], start) - 1)
+    wanted = range(first, len(table)) if blocks is None else sorted(b for b in blocks if b >= first)
+    with open(file, "rb") as f:
+        for i in wanted:
+            uoff, coff, clen, _, _ = table[i]
+            f.seek(coff)
+            for offset, raw in _block_lines(_decompress(codec, f.read(clen)), uoff):
+                if offset >= start:
+                    yield offset, raw
+
+def last_link(path):
+    """(seq, hash) of the newest chained entry in path's rolled segments, or None."""
+    for n, f in reversed(segments(path)):
+        idx = load_index(_split(f)[0])
+        if idx is not None:
+            if idx["last_seq"] is not None:
+                return idx["last_seq"], idx["last_hash"]
+            continue
+        link = None
+        for _, raw in read_lines(f):
+            try:
+                e = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(e, dict) and "hash" in e:
+                link = e.get("seq"), e["hash"]
+        if link is not None:
+            return link
+    return None
+
+
+# --- queries ---
+def _overlaps(lo, hi, since, until):
+    if lo is None:
+        return True   # entries without a timestamp: cannot rule the block out
+    return (since is None or hi >= since) and (until is None or lo <= until)
+
+def _matches(e, filters, since, until):
+    if any(e.get(field) != value for field, value in filters.items()):
+        return False
+    ts = e.get("ts")
+    if since is not None or until is not None:
+        if not isinstance(ts, (int, float)):
+            return False
+        if since is not None and ts < since or until is not None and ts > until:
+            return False
+    return True
+
+def _candidate_blocks(idx, filters, since, until):
+    if idx["ts"] is not None and not _overlaps(*idx["ts"], since, until):
+        return []
+    blocks = None
+    for field, value in filters.items():
+        hits = set(idx[field].get(value, ()))
+        blocks = hits if blocks is None else blocks & hits
+    if blocks is None:
+        blocks = range(len(idx["blocks"]))
+    return [b for b in sorted(blocks) if _overlaps(*idx["blocks"][b][3:5], since, until)]
+
+def query(path, sha=None, action=None, since=None, until=None):
+    """Entries of path's audit log (segments, then the live file) matching every given
+    filter, oldest first. since/until are epoch seconds, compared with the entry ts."""
+    filters = {k: v for k, v in (("sha", sha), ("action", action)) if v is not None}
+    files = [(f, load_index(_split(f)[0])) for _, f in segments(path)]
+    files.append((os.path.abspath(path), None))
+    for f, idx in files:
+        blocks = None
+        if idx is not None:
+            blocks = _candidate_blocks(idx, filters, since, until)
+            if not blocks:
+                continue
+        sealed = _split(f)[1] is not None
+        for _, raw in read_lines(f, blocks=blocks if sealed else None):
+            try:
+                e = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(e, dict) and _matches(e, filters, since, until):
+                yield e
@@ -0,0 +1,154 @@
+# modules/audit_verify.py
+"""
+Audit Verify
+Bulk check of the Ed25519 signatures in the audit log (crypto.sign_log /
+crypto.sign_batch), over the sealed segments and the live file. The log is cut into
+chunks of about CHUNK bytes (line-aligned byte ranges of plain files, runs of blocks
+of sealed segments); each process-pool worker reads its own chunk and loads the
+public key once. Batch roots that already verified in a chunk are remembered, so the
+rest of a Merkle batch only costs its inclusion proof.
+
+The report counts good, bad, missing (unsigned) and malformed records and gives the
+(file, offset) of the first REPORTED of each kind. Hash-chain continuity is
+audit.verify()'s job.
+
+    python -m modules.audit_verify [LOG] [--workers N] [--bench ENTRIES]
+"""
+
+import os, json, time, argparse, tempfile
+from concurrent.futures import ProcessPoolExecutor
+import crypto
+from verify_manifest import PUBKEY_PATH
+from modules import audit_segments
+
+AUDIT_LOG = "audit.log"
+CHUNK = 8 << 20          # bytes of log per worker task
+POOL_MIN = 2 * CHUNK     # smaller logs are checked in-process
+REPORTED = 1000          # offsets kept per kind of failure
+KINDS = ("bad", "missing", "malformed")
+
+def _tasks(path, chunk, pubkey_path):
+    """(file, start, end, blocks, pubkey_path) covering path's segments and live file."""
+    tasks = []
+    for _, file in audit_segments.segments(path) + [(None, os.path.abspath(path))]:
+        table = audit_segments.block_table(file)
+        if table is None:
+            try:
+                size = os.path.getsize(file)
+            except FileNotFoundError:
+                continue
+            tasks += [(file, start, min(start + chunk, size), None, pubkey_path)
+                      for start in range(0, size, chunk)]
+            continue
+        run, run_bytes = [], 0
+        for i, block in enumerate(table):
+            run.append(i)
+            last = i + 1 == len(table)
+            run_bytes += (audit_segments.BLOCK if last else table[i + 1][0] - block[0])
+            if run_bytes >= chunk or last:
+                tasks.append((file, None, None, run, pubkey_path))
+                run, run_bytes = [], 0
+    return tasks
+
+def _task_bytes(task):
+    file, start, end, blocks, _ = task
+    return end - start if blocks is None else len(blocks) * audit_segments.BLOCK
+
+def _lines(file, start, end, blocks):
+    if blocks is not None:
+        yield from audit_segments.read_lines(file, blocks=blocks)
+        return
+    with open(file, "rb") as f:
+        if start > 0:
+            # a line belongs to the chunk it starts in
+            f.seek(start - 1)
+            if f.read(1) != b"\n":
+                f.readline()
+        offset = f.tell()
+        while offset < end:
+            raw = f.readline()
+            if not raw:
+                break
+            yield offset, raw
+            offset += len(raw)
+
+def _check(task):
+    file, start, end, blocks, pubkey_path = task
+    name = os.path.basename(file)
+    roots = set()
+    out = {"checked": 0, "ok": 0, **{k: 0 for k in KINDS}, "offsets": {k: [] for k in KINDS}}
+
+    def fail(kind, offset):
+        out[kind] += 1
+        if len(out["offsets"][kind]) < REPORTED:
+            out["offsets"][kind].append((name, offset))
+
+    for offset, raw in _lines(file, start, end, blocks):
+        if not raw.endswith(b"\n") or not raw.strip():
+            continue  # blank, or still being written
+        out["checked"] += 1
+        try:
+            e = json.loads(raw)
+            if not isinstance(e, dict):
+                raise ValueError(raw)
+        except ValueError:
+            fail("malformed", offset)
+            continue
+        if "signature" not in e:
+            fail("missing", offset)
+        elif crypto.verify_log(e, pubkey_path, roots):
+            out["ok"] += 1
+        else:
+            fail("bad", offset)
+    return out
+
+def verify_signatures(path=AUDIT_LOG, pubkey_path=PUBKEY_PATH, workers=None, chunk=CHUNK):
+    """Verify every signed record in the audit log at path; returns the report dict."""
+    t = time.perf_counter()
+    tasks = _tasks(path, chunk, pubkey_path)
+    if workers == 1 or sum(_task_bytes(task) for task in tasks) < POOL_MIN:
+        parts = [_check(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            parts = list(pool.map(_check, tasks))
+    report = {"checked": 0, "ok": 0, **{k: 0 for k in KINDS}, "offsets": {k: [] for k in KINDS}}
+    for part in parts:  # tasks are in log order, so offsets stay sorted
+        for k in ("checked", "ok") + KINDS:
+            report[k] += part[k]
+        for k in KINDS:
+            report["offsets"][k].extend(part["offsets"][k][:REPORTED - len(report["offsets"][k])])
+    report["seconds"] = time.perf_counter() - t
+    report["rate"] = report["checked"] / report["seconds"] if report["seconds"] else 0.0
+    return report
+
+def bench(entries=200000, workers=None, batch=256):
+    """Time verify_signatures on a generated log of Merkle-signed batches (needs the
+    signing key), in-process and across the pool."""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "audit.log")
+        t = time.perf_counter()
+        with open(path, "w") as f:
+            for first in range(0, entries, batch):
+                rows = [{"action": "allow", "sha": os.urandom(32).hex(), "ts": time.time(), "i": i}
+                        for i in range(first, min(first + batch, entries))]
+                f.write("".join(json.dumps(e) + "\n" for e in crypto.sign_batch(rows)))
+        print(f"[BENCH] wrote {entries} signed entries in {time.perf_counter() - t:.2f}s")
+        results = {}
+        for label, n in (("inline", 1), ("pool", workers)):
+            r = verify_signatures(path, workers=n, chunk=CHUNK if n == 1 else 1 << 20)
+            results[label] = r
+            print(f"[BENCH] {label}: {r['ok']}/{r['checked']} ok in {r['seconds']:.2f}s "
+                  f"({r['rate']:.0f} entries/s)")
+    return results
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Verify audit log signatures")
+    ap.add_argument("log", nargs="?", default=AUDIT_LOG)
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--bench", type=int, metavar="ENTRIES", help="benchmark on a generated log instead")
+    args = ap.parse_args()
+    if args.bench:
+        bench(args.bench, args.workers)
+    else:
+        print(json.dumps(verify_signatures(args.log, workers=args.workers), indent=2))
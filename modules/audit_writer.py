@@ -0,0 +1,255 @@
+# modules/audit_writer.py
+"""
+Audit Writer
+Group-commit appender for the audit logs. Entries are queued and a background thread
+writes them in batches, once BATCH entries are waiting or INTERVAL seconds after the
+first one arrived, with one write and one fsync per batch on a file that stays open.
+write(entry, sync=True) returns only after the entry's batch is on disk. Pending
+entries are flushed by close() and at interpreter exit.
+
+One writer per file (get(path)), shared by every caller in the process, so lines from
+the gate and the vault loop keep a single order. A writer given a sealer (audit.py's
+hash chain and batch signer) passes each batch's dict entries through it just before
+writing, holding the file's flock; the sealer may append records of its own
+(checkpoints) and must not change the entries it is given. A writer given a
+roller hands the file over to it, between batches, once it reaches SEGMENT_BYTES or
+its first entry's ts is SEGMENT_AGE seconds old, however often the process restarted
+meanwhile (audit_segments.roll moves it aside and compresses it).
+"""
+
+import os, json, threading, time, atexit, fcntl
+
+BATCH = 256          # entries per write/fsync
+INTERVAL = 0.2       # seconds the oldest queued entry may wait
+SYNC_TIMEOUT = 30.0  # give up waiting for a durable write after this long
+SEGMENT_BYTES = 64 << 20   # roll the live log over at this size ...
+SEGMENT_AGE = 24 * 3600    # ... or once its first entry is this old
+
+
+class AuditWriter:
+    def __init__(self, path, batch=BATCH, interval=INTERVAL, fsync=True, sealer=None,
+                 roller=None, segment_bytes=SEGMENT_BYTES, segment_age=SEGMENT_AGE):
+        self.path = os.path.abspath(path)
+        self.sealer = sealer  # callable(list of dicts) -> list of dicts to write
+        self.roller = roller  # callable(path), called with the file closed
+        self.segment_bytes = segment_bytes
+        self.segment_age = segment_age
+        self.batch = batch
+        self.interval = interval
+        self.fsync = fsync
+        self._cond = threading.Condition()
+        self._queue = []
+        self._queued = 0      # sequence number of the last entry queued
+        self._written = 0     # ... and of the last entry on disk
+        self._first_at = None
+        self._waiters = 0     # producers blocked in a sync write or flush()
+        self._closing = False
+        self._thread = None
+        self._pid = None
+        self._file = None
+        self._ino = None
+        self._started = None  # epoch ts of the live file's first entry
+
+    # --- producer side ---
+    def write(self, entry, sync=False):
+        """Queue a dict (written as a JSON line) or a text line. With sync, block until it is on disk."""
+        if isinstance(entry, str):
+            line = entry if entry.endswith("\n") else entry + "\n"
+        elif self.sealer is not None:
+            line = dict(entry)  # sealed and serialised with its batch
+        else:
+            line = json.dumps(entry) + "\n"
+        with self._cond:
+            self._start()
+            self._queue.append(line)
+            self._queued += 1
+            seq = self._queued
+            if self._first_at is None:
+                # first entry of a batch: the flusher starts its INTERVAL timer now
+                self._first_at = time.monotonic()
+                self._cond.notify_all()
+            elif sync or len(self._queue) >= self.batch:
+                self._cond.notify_all()
+            if sync:
+                self._wait_for(seq)
+        return seq
+
+    def flush(self, timeout=SYNC_TIMEOUT):
+        """Block until everything queued so far is on disk."""
+        with self._cond:
+            if self._thread is None or not self._queue and self._written >= self._queued:
+                return
+            self._cond.notify_all()
+            self._wait_for(self._queued, timeout)
+
+    def close(self):
+        with self._cond:
+            if self._thread is None or self._pid != os.getpid():
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join()
+        with self._cond:
+            self._thread = None
+            self._closing = False
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _wait_for(self, seq, timeout=SYNC_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        self._waiters += 1
+        try:
+            while self._written < seq:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError(f"audit entry not written to {self.path} within {timeout}s")
+                self._cond.wait(left)
+        finally:
+            self._waiters -= 1
+
+    def _start(self):
+        # (re)start the flusher; a forked child gets its own queue, file and thread
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        if self._pid != os.getpid():
+            self._queue, self._queued, self._written, self._first_at = [], 0, 0, None
+            self._file = None
+            self._pid = os.getpid()
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+
+    # --- flusher thread ---
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._closing and not self._due():
+                    wait = None
+                    if self._first_at is not None:
+                        wait = max(0.0, self._first_at + self.interval - time.monotonic())
+                    self._cond.wait(wait)
+                lines, self._queue = self._queue, []
+                self._first_at = None
+                last = self._queued
+                closing = self._closing
+            if lines:
+                try:
+                    self._append(lines)
+                except OSError as e:
+                    print(f"[AUDIT] write to {self.path} failed, retrying: {e}")
+                    with self._cond:
+                        self._queue[:0] = lines
+                        self._first_at = time.monotonic()
+                    if closing:
+                        return
+                    time.sleep(self.interval)
+                    continue
+            with self._cond:
+                self._written = max(self._written, last)
+                self._cond.notify_all()
+                if closing and not self._queue:
+                    return
+
+    def _due(self):
+        if not self._queue:
+            return False
+        return (len(self._queue) >= self.batch or self._waiters > 0
+                or time.monotonic() - self._first_at >= self.interval)
+
+    def _render(self, items):
+        slots = [i for i, e in enumerate(items) if isinstance(e, dict)]
+        if slots:
+            try:
+                sealed = self.sealer([items[i] for i in slots])
+            except Exception as e:
+                print(f"[AUDIT] sealing batch for {self.path} failed, writing it unsealed: {e}")
+                sealed = [items[i] for i in slots]
+            # sealed entries keep their slots; extra records go after the batch
+            for i, e in zip(slots, sealed):
+                items[i] = e
+            items.extend(sealed[len(slots):])
+        return [e if isinstance(e, str) else json.dumps(e) + "\n" for e in items]
+
+    def _append(self, items):
+        while True:
+            # reopen when the file was rotated or rewritten underneath us
+            try:
+                ino = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                ino = None
+            if self._file is None or ino != self._ino:
+                if self._file is not None:
+                    self._file.close()
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                self._file = open(self.path, "a", encoding="utf-8")
+                self._ino = os.fstat(self._file.fileno()).st_ino
+                self._started = None
+            fcntl.flock(self._file, fcntl.LOCK_EX)  # segment sealers and audit_dedupe take it too
+            try:
+                ino = os.stat(self.path).st_ino
+            except FileNotFoundError:
+                ino = None
+            if ino == self._ino:
+                break
+            fcntl.flock(self._file, fcntl.LOCK_UN)  # rolled over by another process meanwhile
+        try:
+            # sealed under the lock: the chain head the sealer reads is the file's last line
+            self._file.write("".join(self._render(list(items))))
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            if self._started is None:
+                self._started = _first_ts(self.path) or time.time()
+            if self.roller is not None and (self._file.tell() >= self.segment_bytes or
+                                            time.time() - self._started >= self.segment_age):
+                self._roll()
+        finally:
+            if self._file is not None:
+                fcntl.flock(self._file, fcntl.LOCK_UN)
+
+    def _roll(self):
+        # the batch is already on disk: a failed roll only delays it to the next batch.
+        # Rolled while still holding the lock, so other writers find the new file.
+        try:
+            self.roller(self.path)
+        except OSError as e:
+            print(f"[AUDIT] cannot roll {self.path} over: {e}")
+            return
+        fcntl.flock(self._file, fcntl.LOCK_UN)
+        self._file.close()
+        self._file = None
+
+
+def _first_ts(path):
+    """ts of the first entry in path, or None (empty file, or no ts on that line)."""
+    try:
+        with open(path, "rb") as f:
+            ts = json.loads(f.readline()).get("ts")
+    except (OSError, ValueError, AttributeError):
+        return None
+    return ts if isinstance(ts, (int, float)) else None
+
+
+_writers = {}
+_lock = threading.Lock()
+
+def get(path, sealer=None, roller=None):
+    """The process-wide writer for path; a sealer or roller given here applies to later batches."""
+    key = os.path.abspath(path)
+    with _lock:
+        w = _writers.get(key)
+        if w is None:
+            w = _writers[key] = AuditWriter(key)
+        if sealer is not None:
+            w.sealer = sealer
+        if roller is not None:
+            w.roller = roller
+        return w
+
+def close_all():
+    with _lock:
+        writers = list(_writers.values())
+    for w in writers:
+        w.close()
+
+atexit.register(close_all)
@@ -1,7 +1,8 @@
-import os, sys, json, time, sqlite3, hashlib, shutil, stat, subprocess
+import os, sys, json, time, sqlite3, hashlib, stat, subprocess
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
 AUDIT_LOG = os.path.join(ROOT, "audit.log")
+AUDIT_DEDUPE = os.path.join(ROOT, "audit.dedupe")
 MISSION_ENV = os.path.join(ROOT, "mission.env")
 REG_DB = os.path.join(ROOT, "registry.db")
 QUARANTINE = os.path.join(ROOT, "quarantine")
@@ -88,33 +89,17 @@ def auto_install_deps(packages):
         return False
 
 # ---------- REGISTRY / SQLITE ----------
-SCHEMA = """CREATE TABLE IF NOT EXISTS signatures(
-    id INTEGER PRIMARY KEY,
-    name TEXT,
-    sha256 TEXT,
-    whirlpool TEXT,
-    ssdeep TEXT,
-    rule_tag TEXT,
-    author TEXT,
-    ts INTEGER,
-    signer_pub BLOB,
-    signature BLOB,
-    meta JSON
-);"""
-
 def ensure_registry():
     created = False
-    conn = sqlite3.connect(REG_DB)
-    cur = conn.cursor()
-    cur.execute(SCHEMA)
-    conn.commit()
-    conn.close()
+    sys.path.insert(0, ROOT)
+    from modules import registry_db, registry_schema
     if not os.path.exists(REG_DB) or os.path.getsize(REG_DB) == 0:
         created = True
+    conn = registry_db.connect(REG_DB, writer=True)  # migrates to the current schema version
     if created:
-        _warn("registry schema ensured")
+        _warn(f"registry schema ensured (v{registry_schema.version(conn)})")
     else:
-        _ok("registry schema OK")
+        _ok(f"registry schema OK (v{registry_schema.version(conn)})")
     return created
 
 # ---------- AUDIT DE-DUPE ----------
@@ -122,32 +107,32 @@ def dedupe_audit_log():
     if not os.path.exists(AUDIT_LOG):
         _warn("audit.log missing (will create on first run)")
         return False
-    seen = set()
-    lines = []
-    deduped = 0
-    with open(AUDIT_LOG, "r", errors="ignore") as f:
-        for raw in f:
-            s = raw.strip()
-            if not s:
-                continue
-            # Use full line hash as identity; you could parse JSON and normalize
-            h = hashlib.sha256(s.encode("utf-8")).hexdigest()
-            if h in seen:
-                deduped += 1
-                continue
-            seen.add(h)
-            lines.append(s)
+    sys.path.insert(0, ROOT)
+    from audit import last_link
+    if last_link(AUDIT_LOG)[0]:
+        # chained lines are unique by construction; removing one would break the chain
+        _ok("audit.log is hash-chained; no de-dupe pass")
+        return False
+    from modules.audit_dedupe import dedupe
+    # only lines appended since the last run are read; earlier data is left untouched
+    deduped = dedupe(AUDIT_LOG, AUDIT_DEDUPE)
     if deduped:
-        tmp = AUDIT_LOG + ".tmp"
-        with open(tmp, "w") as w:
-            for s in lines:
-                w.write(s + "\n")
-        shutil.move(tmp, AUDIT_LOG)
         _warn(f"deduped audit.log (removed {deduped} duplicate lines)")
         return True
     _ok("audit.log has no duplicate lines")
     return False
 
+# ---------- QUARANTINE LAYOUT ----------
+def migrate_quarantine():
+    sys.path.insert(0, ROOT)
+    from modules.quarantine_store import migrate_flat, stats
+    moved = migrate_flat(QUARANTINE)
+    if moved:
+        _warn(f"moved {moved} legacy quarantine files into the sharded store")
+    st = stats(QUARANTINE)
+    _ok(f"quarantine: {st['objects']} objects, {st['references']} refs, {st['bytes']} bytes")
+    return moved
+
 # ---------- SELF-TEST ARTIFACTS ----------
 def ensure_selftest_artifacts():
     # Create artifact.bin + manifest.json + manifest.sig that actually match
@@ -162,10 +147,17 @@ def ensure_selftest_artifacts():
     with open(manifest, "w") as f:
         json.dump({"name":"demo_artifact","content_sha256":sha}, f)
     sig = os.path.join(ROOT, "manifest.sig")
-    # fake base64 sig body (verification stub in translator_gate accepts reading only)
+    privkey = os.path.join(KEYS_DIR, "privkey.pem")
+    if os.path.exists(privkey):
+        sys.path.insert(0, ROOT)
+        from verify_manifest import sign_manifest
+        sign_manifest(manifest, sig, privkey)
+        _ok("self-test manifest/sig refreshed with correct hash and signature")
+        return True
+    # no signing key: placeholder sig, the gate will reject it as bad_signature
     with open(sig, "w") as f:
         f.write("ZHVtbXlzaWc=")
-    _ok("self-test manifest/sig refreshed with correct hash")
+    _warn("self-test manifest refreshed; keys/privkey.pem missing so manifest.sig is a placeholder")
     return True
 
 # ---------- MISSION ENV ----------
@@ -232,6 +224,11 @@ def run_all(auto_fix=True, auto_install=True):
     # liveness
     check_loop_liveness()
 
+    # quarantine layout
+    moved = migrate_quarantine()
+    if moved:
+        report["actions"].append({"quarantine_migrated": moved})
+
     # log hygiene
     if dedupe_audit_log():
         report["actions"].append({"audit_dedupe": "done"})
@@ -0,0 +1,64 @@
+# modules/digest_engine.py
+"""
+Digest Engine
+Reads an artifact once and produces every digest the gate, quarantine and registry use.
+"""
+
+import hashlib, mmap, os
+
+try:
+    import ssdeep
+except Exception:
+    ssdeep = None
+
+CHUNK = 1 << 20          # 1 MiB per update (hashlib drops the GIL on large buffers)
+MMAP_MIN = 64 << 20      # map files above 64 MiB instead of copying through read()
+ALGORITHMS = ("sha256", "sha1", "md5", "whirlpool")
+
+def _new_hash(name):
+    try:
+        return hashlib.new(name)
+    except ValueError:
+        return None  # whirlpool needs OpenSSL's legacy provider
+
+def available_algorithms():
+    return [a for a in ALGORITHMS if _new_hash(a) is not None]
+
+def digest_file(path, algorithms=ALGORITHMS, fuzzy=True):
+    """Single streaming pass over path.
+
+    Returns {"size", <algorithm>: hexdigest or None, "ssdeep": fuzzy hash or None}.
+    """
+    hashers = {a: _new_hash(a) for a in algorithms}
+    live = [h for h in hashers.values() if h is not None]
+    fz = ssdeep.Hash() if fuzzy and ssdeep is not None else None
+
+    def update(chunk):
+        for h in live:
+            h.update(chunk)
+        if fz is not None:
+            fz.update(bytes(chunk))
+
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_MIN:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                try:
+                    for off in range(0, size, CHUNK):
+                        update(view[off:off + CHUNK])
+                finally:
+                    view.release()
+        else:
+            buf = bytearray(CHUNK)
+            view = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                update(view[:n])
+
+    out = {"size": size, "ssdeep": fz.digest() if fz is not None else None}
+    for a, h in hashers.items():
+        out[a] = h.hexdigest() if h is not None else None
+    return out
@@ -0,0 +1,87 @@
+# modules/fuzzy_index.py
+"""
+Fuzzy Index
+Candidate index for ssdeep matching. ssdeep only scores two hashes when their block
+sizes are equal or differ by a factor of two AND the compared chunks share a 7-char
+substring, so signatures are bucketed by (block size, 7-gram): only signatures sharing
+a gram with the artifact are ever passed to ssdeep.compare. Chunks too short for a
+gram (tiny files) are keyed whole, so an identical hash is still found.
+"""
+
+import re
+from collections import defaultdict
+from modules.registry_db import RegistryMirror
+
+try:
+    import ssdeep
+except Exception:
+    ssdeep = None
+
+GRAM = 7          # ssdeep's ROLLING_WINDOW: minimum common substring for a non-zero score
+THRESHOLD = 60
+_RUNS = re.compile(r"(.)\1{3,}")
+
+def parse(fuzzy):
+    """'bs:chunk:double_chunk' -> (bs, chunk, double_chunk) with >3 repeats collapsed like ssdeep."""
+    try:
+        bs, c1, c2 = fuzzy.split(":", 2)
+        bs = int(bs)
+    except (AttributeError, ValueError):
+        return None
+    c2 = c2.split(",", 1)[0]  # drop a trailing ,"filename"
+    return bs, _RUNS.sub(r"\1\1\1", c1), _RUNS.sub(r"\1\1\1", c2)
+
+def grams(chunk):
+    """7-grams of chunk; a chunk shorter than that is its own key (ssdeep scores it only
+    against an identical hash, and a shorter key never collides with a gram)."""
+    if len(chunk) < GRAM:
+        return {chunk} if chunk else set()
+    return {chunk[i:i + GRAM] for i in range(len(chunk) - GRAM + 1)}
+
+def keys(fuzzy):
+    """Index keys for a hash: chunk grams at bs, double-chunk grams at 2*bs."""
+    p = parse(fuzzy)
+    if p is None:
+        return set()
+    bs, c1, c2 = p
+    return {(bs, g) for g in grams(c1)} | {(bs * 2, g) for g in grams(c2)}
+
+
+class FuzzyIndex(RegistryMirror):
+    """(block size, 7-gram) -> signature ids, mirrored from signatures.ssdeep."""
+
+    def __init__(self, connect):
+        super().__init__(connect, ("ssdeep", "name"))
+        self.buckets = defaultdict(set)
+        self.hashes = {}
+
+    def _reset(self, total):
+        self.buckets = defaultdict(set)
+        self.hashes = {}
+
+    def _add(self, rid, fuzzy, name):
+        self.hashes[rid] = (fuzzy, name)
+        for k in keys(fuzzy):
+            self.buckets[k].add(rid)
+
+    def candidates(self, fuzzy):
+        self.refresh()
+        found = set()
+        for k in keys(fuzzy):
+            ids = self.buckets.get(k)
+            if ids:
+                found |= ids
+        return found
+
+    def best_match(self, fuzzy, threshold=THRESHOLD, cancel=None):
+        """(id, name, score) of the highest-scoring signature above threshold, or None.
+        A set cancel (threading.Event) stops the comparisons early."""
+        best = None
+        for rid in self.candidates(fuzzy):
+            if cancel is not None and cancel.is_set():
+                return None
+            sig, name = self.hashes[rid]
+            score = ssdeep.compare(fuzzy, sig)
+            if score > threshold and (best is None or score > best[2]):
+                best = (rid, name, score)
+        return best
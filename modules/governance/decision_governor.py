@@ -4,8 +4,10 @@ Decision Governor — controls subsystem autonomy.
 """
 
 import os, configparser, time
+from modules import audit_writer
 
 POLICY_FILE = "mission.policy"
+GOVERNOR_LOG = "audit/governor_audit.log"
 
 def load_policy():
     cfg = configparser.ConfigParser()
@@ -45,9 +47,9 @@ def confirm_action(domain):
         return False
 
 def audit_governor_log(domain, result):
-    os.makedirs("audit", exist_ok=True)
-    with open("audit/governor_audit.log", "a") as f:
-        f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} | {domain} | {result}\n")
+    # decisions are durable before the action they gate goes ahead
+    audit_writer.get(GOVERNOR_LOG).write(
+        f"{time.strftime('%Y-%m-%d %H:%M:%S')} | {domain} | {result}", sync=True)
 
 def enforce(domain, func, *args, **kwargs):
     """Decorator-like wrapper for enforcing policy."""
@@ -0,0 +1,66 @@
+# modules/hash_bloom.py
+"""
+Hash Bloom
+In-process Bloom filter over the registry's known digests, so an unknown hash is
+rejected in memory and never reaches SQLite. Built once per process and refreshed
+incrementally (new rowids) through registry_db.RegistryMirror.
+"""
+
+import math, hashlib
+from modules.registry_db import RegistryMirror
+
+ERROR_RATE = 0.001
+
+def _key(value):
+    return hashlib.blake2b(value.lower().encode(), digest_size=16).digest()
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=ERROR_RATE):
+        capacity = max(int(capacity), 1024)
+        self.capacity = capacity
+        self.m = int(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bytearray((self.m + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        d = _key(value)
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:], "little") | 1
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def add(self, value):
+        bits = self.bits
+        for p in self._positions(value):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        bits = self.bits
+        for p in self._positions(value):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+
+class RegistryBloom(RegistryMirror):
+    """Bloom filter mirroring one digest column of a registry table (signatures, hashes)."""
+
+    def __init__(self, connect, column="sha256", table="signatures"):
+        super().__init__(connect, (column,), table=table)
+        self.filter = None
+
+    def _reset(self, total):
+        self.filter = BloomFilter(capacity=2 * total)
+
+    def _add(self, rid, value):
+        self.filter.add(value)
+
+    def _overfull(self):
+        return self.filter.count > self.filter.capacity
+
+    def might_contain(self, value):
+        self.refresh()
+        return value in self.filter
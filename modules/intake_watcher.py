@@ -0,0 +1,255 @@
+# modules/intake_watcher.py
+"""
+Intake Watcher
+Wakes the gate loop when an upload has finished landing, instead of polling every 5 s.
+Uses Linux inotify through libc (close-after-write / atomic rename) and falls back to
+stat polling elsewhere. Both paths debounce, so a half-written file is never reported.
+"""
+
+import os, time, struct, select, ctypes, ctypes.util
+
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_MOVE_SELF   = 0x00000800
+IN_Q_OVERFLOW  = 0x00004000
+IN_IGNORED     = 0x00008000
+IN_ISDIR       = 0x40000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_MOVE_SELF
+
+_EVENT = struct.Struct("iIII")   # wd, mask, cookie, len
+STALE_WRITER = 30.0              # forget a writer that kept a file open this long
+
+def _load_inotify():
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        return libc
+    except (OSError, AttributeError):
+        return None
+
+
+class IntakeWatcher:
+    """Event-driven intake for a directory of uploads.
+
+    root      directory to watch (base dir or spool dir)
+    names     only these file names count as uploads (e.g. translator_gate.SPOOL_FILES)
+    recursive also watch one level of sub-directories (spool mode)
+    settle    seconds a finished file must stay quiet before it is reported
+    """
+
+    def __init__(self, root, names=None, recursive=False, settle=0.5, poll_interval=1.0):
+        self.root = os.path.abspath(root)
+        self.names = set(names) if names else None
+        self.recursive = recursive
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self._writing = {}   # path -> last write event (open writer)
+        self._landed = {}    # path -> time it was closed / renamed in
+        self._wds = {}
+        self._fd = None
+        self._stats = {}
+        os.makedirs(self.root, exist_ok=True)
+        libc = _load_inotify()
+        if libc is not None:
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd >= 0:
+                self._libc, self._fd = libc, fd
+                self._watch(self.root)
+                if recursive:
+                    for d in self._subdirs(self.root):
+                        self._watch(d)
+        if self._fd is None:
+            self._stats = self._snapshot()
+        print(f"[INTAKE] watching {self.root} ({self.mode})")
+
+    @property
+    def mode(self):
+        return "inotify" if self._fd is not None else "polling"
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+    # --- public API ---
+    def pending(self):
+        """True while a watched file is still open for writing or not yet settled."""
+        self._drop_stale()
+        return bool(self._writing or self._landed)
+
+    def wait(self, timeout=None):
+        """Block until uploads have landed and settled; return their paths ([] on timeout)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            ready = self._collect()
+            if ready:
+                return ready
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                return []
+            step = self._next_due(now)
+            if deadline is not None:
+                step = deadline - now if step is None else min(step, deadline - now)
+            if self._fd is not None:
+                self._read_events(step)
+            else:
+                time.sleep(self.poll_interval if step is None else min(step, self.poll_interval))
+                self._poll()
+
+    # --- bookkeeping ---
+    def _relevant(self, path):
+        name = os.path.basename(path)
+        if name.startswith("."):
+            return False  # .processed, staging dirs, temp files
+        return self.names is None or name in self.names
+
+    def _collect(self):
+        self._drop_stale()
+        if self._writing:
+            return []
+        now = time.monotonic()
+        ready = [p for p, t in self._landed.items() if now - t >= self.settle]
+        for p in ready:
+            del self._landed[p]
+        return ready
+
+    def _next_due(self, now):
+        if self._writing or not self._landed:
+            return None
+        return max(0.0, min(self._landed.values()) + self.settle - now)
+
+    def _drop_stale(self):
+        now = time.monotonic()
+        for p, t in list(self._writing.items()):
+            if now - t > STALE_WRITER:
+                del self._writing[p]
+                self._landed[p] = now
+
+    def _subdirs(self, d):
+        try:
+            return [e.path for e in os.scandir(d) if e.is_dir() and not e.name.startswith(".")]
+        except OSError:
+            return []
+
+    # --- inotify backend ---
+    def _watch(self, d):
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(d), WATCH_MASK)
+        if wd >= 0:
+            self._wds[wd] = d
+
+    def _unwatch(self, wd):
+        """Stop watching a sub-directory that was moved away (e.g. retired into .processed);
+        the watch follows the inode, so its events would otherwise arrive under the old path."""
+        d = self._wds.pop(wd, None)
+        if d is None:
+            return
+        self._libc.inotify_rm_watch(self._fd, wd)
+        prefix = d + os.sep
+        for pending in (self._writing, self._landed):
+            for p in [p for p in pending if p == d or p.startswith(prefix)]:
+                del pending[p]
+
+    def _rescan(self, d, now):
+        # files written into a new sub-directory before its watch was added sent no events
+        try:
+            entries = [e.path for e in os.scandir(d) if e.is_file()]
+        except OSError:
+            return
+        for p in entries:
+            if self._relevant(p) and p not in self._writing:
+                self._landed[p] = now
+
+    def _read_events(self, timeout):
+        r, _, _ = select.select([self._fd], [], [], timeout)
+        if not r:
+            return
+        try:
+            buf = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        now = time.monotonic()
+        off = 0
+        while off < len(buf):
+            wd, mask, _cookie, ln = _EVENT.unpack_from(buf, off)
+            name = buf[off + _EVENT.size: off + _EVENT.size + ln].rstrip(b"\0")
+            off += _EVENT.size + ln
+            if mask & IN_Q_OVERFLOW:
+                self._landed[self.root] = now  # lost events: let the caller rescan
+                continue
+            if mask & IN_IGNORED:
+                self._wds.pop(wd, None)
+                continue
+            base = self._wds.get(wd)
+            if base is None:
+                continue
+            if mask & IN_MOVE_SELF:
+                if base != self.root:
+                    self._unwatch(wd)
+                continue
+            if not name:
+                continue
+            path = os.path.join(base, os.fsdecode(name))
+            if mask & IN_ISDIR:
+                if mask & IN_MOVED_FROM:
+                    # moved out of the watched tree, or renamed to a dot name
+                    for w in [w for w, d in self._wds.items() if d == path]:
+                        self._unwatch(w)
+                elif (self.recursive and base == self.root and mask & (IN_CREATE | IN_MOVED_TO)
+                        and not os.path.basename(path).startswith(".")):
+                    self._watch(path)
+                    self._rescan(path, now)
+                    if mask & IN_MOVED_TO:   # atomic rename of a finished upload set
+                        self._landed[path] = now
+                continue
+            if os.path.basename(path).startswith("."):
+                continue
+            if mask & IN_MOVED_FROM:
+                self._writing.pop(path, None)
+                self._landed.pop(path, None)
+                continue
+            if not self._relevant(path):
+                continue
+            if mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                self._writing.pop(path, None)
+                self._landed[path] = now
+            elif mask & (IN_CREATE | IN_MODIFY):
+                self._writing[path] = now
+                self._landed.pop(path, None)
+
+    # --- polling backend ---
+    def _candidates(self):
+        dirs = [self.root] + (self._subdirs(self.root) if self.recursive else [])
+        for d in dirs:
+            try:
+                for e in os.scandir(d):
+                    if e.is_file() and self._relevant(e.path):
+                        yield e.path
+            except OSError:
+                continue
+
+    def _snapshot(self):
+        snap = {}
+        for p in self._candidates():
+            try:
+                st = os.stat(p)
+            except OSError:
+                continue
+            snap[p] = (st.st_size, st.st_mtime_ns)
+        return snap
+
+    def _poll(self):
+        now = time.monotonic()
+        snap = self._snapshot()
+        for p, sig in snap.items():
+            if self._stats.get(p) != sig:
+                # still changing: restart its quiet period
+                self._landed[p] = now
+        for p in list(self._landed):
+            if p not in snap and p != self.root:
+                del self._landed[p]
+        self._stats = snap
@@ -1,5 +1,10 @@
 # local_matcher.py
-import sqlite3, hashlib, json
+import hashlib, os, time
+from modules import registry_db, registry_schema
+from modules.registry_snapshot import Snapshot, SNAPSHOT
+from modules.hash_bloom import RegistryBloom
+from modules.fuzzy_index import FuzzyIndex
+from modules.rule_engine import RuleEngine
 try:
     import ssdeep
 except Exception:
@@ -14,41 +19,120 @@ def sha256_file(path):
             h.update(chunk)
     return h.hexdigest()
 
-def match_exact(sha256):
-    conn=sqlite3.connect(DB)
-    cur=conn.cursor()
-    cur.execute("SELECT id,name FROM signatures WHERE sha256=?",(sha256,))
-    r=cur.fetchone(); conn.close()
-    return r
+# published registry snapshot (registry_snapshot); used only while it matches the
+# registry generation, otherwise lookups fall back to SQLite
+_gen=[None, 0.0]
 
-def match_ssdeep(path):
+def _snapshot():
+    snap=Snapshot.current(SNAPSHOT)
+    if snap is None:
+        return None
+    now=time.monotonic()
+    if now-_gen[1]>=registry_db.MIRROR_REFRESH:
+        try:
+            _gen[0]=registry_db.connect(DB).execute("SELECT generation FROM registry_generation WHERE id=0").fetchone()[0]
+        except Exception:
+            _gen[0]=None
+        _gen[1]=now
+    return snap if snap.generation==_gen[0] else None
+
+# exact matching over the (algo, digest) hash index, strongest algorithm first
+EXACT_ALGOS=("sha256","sha1","md5","whirlpool")
+_EXACT_SQL=("SELECT h.algo, s.id, s.name FROM hashes h JOIN signatures s ON s.id=h.signature_id "
+            "WHERE (h.algo, h.digest) IN (VALUES "+",".join("(?,?)" for _ in EXACT_ALGOS)+")")
+
+# a registry a reader left below v4 (duplicates waiting for registry_cli --migrate) has
+# no hashes table yet: look up the digest columns of signatures instead (before v4,
+# MD5/SHA-1 feed digests were stored in signatures.sha256)
+HASHES_VERSION=4
+_LEGACY_SQL=" UNION ALL ".join(
+    "SELECT ?, id, name FROM signatures WHERE lower(%s)=?" % ("whirlpool" if a=="whirlpool" else "sha256")
+    for a in EXACT_ALGOS)
+
+# negative lookups stop here; only possible hits reach SQLite (hashes unique index)
+_hash_filter=RegistryBloom(lambda: registry_db.connect(DB), "digest", table="hashes")
+
+def match_exact(sha256, digests=None):
+    """(id, name, algo) of the signature matching any digest of the artifact, or None.
+
+    digests: digest_engine.digest_file() result; every algorithm in it is looked up
+    in one query, so MD5/SHA-1 feed indicators match without another read."""
+    wanted={a:(digests or {}).get(a) for a in EXACT_ALGOS}
+    wanted["sha256"]=sha256 or wanted["sha256"]
+    wanted={a:v.lower() for a,v in wanted.items() if v}
+    snap=_snapshot()
+    if snap is not None:
+        return snap.lookup_digests(wanted, EXACT_ALGOS)
+    conn=registry_db.connect(DB)
+    legacy=registry_schema.version(conn)<HASHES_VERSION
+    if not legacy:
+        wanted={a:v for a,v in wanted.items() if _hash_filter.might_contain(v)}
+        if not wanted:
+            return None
+    params=[x for a in EXACT_ALGOS for x in (a, wanted.get(a))]
+    hits={}
+    for algo,rid,name in conn.execute(_LEGACY_SQL if legacy else _EXACT_SQL,params):
+        # a digest several signatures carry: the oldest wins, as in the snapshot
+        if algo not in hits or rid<hits[algo][0]:
+            hits[algo]=(rid,name,algo)
+    return next((hits[a] for a in EXACT_ALGOS if a in hits), None)
+
+_fuzzy_index=FuzzyIndex(lambda: registry_db.connect(DB))
+
+def match_ssdeep(path, fuzzy=None, cancel=None):
+    # fuzzy: precomputed hash from digest_engine, saves re-reading the file
+    # cancel: threading.Event set by matcher_cascade once another matcher decided
     if ssdeep is None:
         return None
-    s=ssdeep.hash_from_file(path)
-    conn=sqlite3.connect(DB)
-    cur=conn.cursor()
-    cur.execute("SELECT id,name,ssdeep FROM signatures WHERE ssdeep IS NOT NULL")
-    rows=cur.fetchall(); conn.close()
-    best=None
-    for rid,name,rs in rows:
-        score=ssdeep.compare(s, rs)
-        if score>60:
-            best=(rid,name,score)
-            break
-    return best
-
-# simple rule matching (regex) example
-import regex
-def match_rules(path):
-    text=open(path,"rb",errors="ignore").read().decode("utf-8",errors="ignore")
-    conn=sqlite3.connect(DB)
-    cur=conn.cursor()
-    cur.execute("SELECT id,name,meta FROM signatures WHERE rule_tag IS NOT NULL")
-    for rid,name,meta in cur:
-        meta=json.loads(meta) if meta else {}
-        rules=meta.get("regex_patterns",[])
-        for pat in rules:
-            if regex.search(pat, text):
-                return (rid,name,pat)
-    conn.close()
-    return None
+    s=fuzzy or ssdeep.hash_from_file(path)
+    # only signatures sharing a block size and 7-gram with s are compared; best score wins
+    snap=_snapshot()
+    if snap is not None:
+        return snap.best_match(s, cancel=cancel)
+    return _fuzzy_index.best_match(s, cancel=cancel)
+
+# rule matching: registry regex rules compiled once, literal-prefiltered
+_rule_engine=RuleEngine(lambda: registry_db.connect(DB))
+
+_synced=[None]
+
+def sync(generation):
+    """Bring every matcher's registry view up to generation (the verdict cache's) now,
+    instead of within MIRROR_REFRESH, so a verdict cached under it saw the same rows."""
+    if generation is None or generation==_synced[0]:
+        return generation
+    _gen[1]=0.0  # recheck which generation the snapshot must match
+    _hash_filter.refresh(force=True)
+    _fuzzy_index.refresh(force=True)
+    _rule_engine.refresh(force=True)
+    _synced[0]=generation
+    return generation
+
+STREAM_MIN=16<<20  # above this, decode and scan the mmap'd file a window at a time
+
+def _sync_rules():
+    snap=_snapshot()
+    if snap is None:
+        _rule_engine.unpin()
+    elif not _rule_engine.pinned or _rule_engine.generation!=snap.generation:
+        _rule_engine.load(snap.rules(), snap.generation)
+
+def match_all_rules(path, cancel=None):
+    _sync_rules()
+    if os.path.getsize(path)>=STREAM_MIN:
+        return _rule_engine.scan_file(path, cancel=cancel)
+    with open(path,"rb") as f:
+        text=f.read().decode("utf-8",errors="ignore")
+    return _rule_engine.scan(text, cancel=cancel)
+
+def match_rules(path, cancel=None, generation=None):
+    # cancel: set by matcher_cascade once another matcher decided (threading.Event, or
+    # the shared flag of a pool worker); generation: sync() this process first, since
+    # the rule stage runs in a pool worker with its own rule engine
+    sync(generation)
+    if os.path.getsize(path)>=STREAM_MIN:
+        _sync_rules()
+        hits=_rule_engine.scan_file(path, first_only=True, cancel=cancel)
+    else:
+        hits=match_all_rules(path, cancel=cancel)
+    return hits[0] if hits else None
@@ -0,0 +1,165 @@
+# modules/matcher_cascade.py
+"""
+Matcher Cascade
+Starts the gate's independent matchers together instead of exact -> fuzzy -> rule in
+sequence. The first decisive (truthy) result wins and the remaining stages are
+cancelled: queued work is dropped and cancellable stages get a threading.Event they
+poll. Each stage's timeout runs from when it actually starts, and every stage's
+timing is reported back.
+
+Thread stages get their own executor per run, so a stage that overruns its timeout
+(SQLite and ssdeep calls cannot be interrupted) holds only its own thread, never a
+slot the next upload needs. Process stages (CPU-bound regex) share one pool; their
+start times and cancel flags travel through shared slots, so they are timed and
+cancelled like thread stages. Inside a pool worker (spool batches) process stages run
+on threads instead: the batch already spreads uploads over the CPUs.
+"""
+
+import time, threading, itertools, multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+MAX_PROCESSES = None   # defaults to os.cpu_count()
+POLL = 0.05            # how often queued process stages are checked for having started
+SLOTS = 1024           # start-time slots shared with the process pool, reused in turn
+
+_processes = None
+_slots = None          # RawArray of time.monotonic() stamps written by pool workers
+_cancels = None        # RawArray of cancel flags, set by the parent, polled by workers
+_next_slot = itertools.count()
+_pool_lock = threading.Lock()
+
+def _init_worker(slots, cancels):
+    global _slots, _cancels
+    _slots, _cancels = slots, cancels
+
+
+class _SlotCancel:
+    """The pool-worker side of a stage's cancel flag; polled like a threading.Event."""
+
+    def __init__(self, slot):
+        self.slot = slot
+
+    def is_set(self):
+        return bool(_cancels[self.slot])
+
+
+def _in_worker(slot, func, args, kwargs, cancellable):
+    _slots[slot] = time.monotonic()  # CLOCK_MONOTONIC: comparable with the parent's
+    if cancellable:
+        kwargs = dict(kwargs, cancel=_SlotCancel(slot))
+    return func(*args, **kwargs)
+
+def _process_pool():
+    global _processes, _slots, _cancels
+    with _pool_lock:
+        if _processes is None:
+            _slots = multiprocessing.RawArray("d", SLOTS)
+            _cancels = multiprocessing.RawArray("b", SLOTS)
+            _processes = ProcessPoolExecutor(max_workers=MAX_PROCESSES, initializer=_init_worker,
+                                             initargs=(_slots, _cancels))
+        return _processes
+
+
+class Stage:
+    """One matcher call. process=True runs it in a process pool (CPU-bound regex);
+    cancellable=True passes cancel=<object with is_set()> to the call."""
+
+    def __init__(self, name, func, *args, timeout=None, process=False, cancellable=False, **kwargs):
+        self.name = name
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.timeout = timeout
+        # a pool worker does not start a pool of its own
+        self.process = process and multiprocessing.parent_process() is None
+        self.cancellable = cancellable
+
+
+def _marking(started, name, func):
+    def call(*args, **kwargs):
+        started[name] = time.monotonic()
+        return func(*args, **kwargs)
+    return call
+
+def run(stages):
+    """Run stages concurrently.
+
+    Returns (winning stage name or None, its result, {stage: seconds | "timeout" |
+    "cancelled" | "error"}). When several stages finish together, the earlier one in
+    the list wins.
+    """
+    cancel = threading.Event()
+    submitted = time.monotonic()
+    order = {st.name: i for i, st in enumerate(stages)}
+    threaded = sum(1 for st in stages if not st.process)
+    threads = ThreadPoolExecutor(max_workers=threaded, thread_name_prefix="cascade") if threaded else None
+    started, futures, slots = {}, {}, {}
+    for st in stages:
+        if st.process:
+            pool = _process_pool()
+            slot = slots[st.name] = next(_next_slot) % SLOTS
+            _slots[slot] = 0.0
+            _cancels[slot] = 0
+            f = pool.submit(_in_worker, slot, st.func, st.args, st.kwargs, st.cancellable)
+        else:
+            kwargs = dict(st.kwargs, cancel=cancel) if st.cancellable else st.kwargs
+            f = threads.submit(_marking(started, st.name, st.func), *st.args, **kwargs)
+        futures[f] = st
+
+    def stop(f):
+        f.cancel()
+        if futures[f].process:
+            _cancels[slots[futures[f].name]] = 1  # a running worker sees it at its next check
+
+    timings, winner, pending = {}, None, set(futures)
+    while pending and winner is None:
+        now = time.monotonic()
+        queued = False
+        for f in pending:
+            st = futures[f]
+            if st.name not in started:
+                if st.process and _slots[slots[st.name]]:
+                    started[st.name] = _slots[slots[st.name]]  # a pool worker picked it up
+                else:
+                    queued = queued or st.timeout is not None
+        deadlines = [started[futures[f].name] + futures[f].timeout for f in pending
+                     if futures[f].timeout is not None and futures[f].name in started]
+        step = max(0.0, min(deadlines) - now) if deadlines else None
+        if queued:
+            step = POLL if step is None else min(step, POLL)
+        done, pending = wait(pending, timeout=step, return_when=FIRST_COMPLETED)
+        for f in sorted(done, key=lambda f: order[futures[f].name]):
+            st = futures[f]
+            if st.process and st.name not in started and _slots[slots[st.name]]:
+                started[st.name] = _slots[slots[st.name]]
+            try:
+                res = f.result()
+                timings[st.name] = round(time.monotonic() - started.get(st.name, submitted), 6)
+            except Exception as e:
+                print(f"[CASCADE] {st.name} failed: {e}")
+                res, timings[st.name] = None, "error"
+            if res and winner is None:
+                winner = (st.name, res)
+        now = time.monotonic()
+        for f in list(pending):
+            st = futures[f]
+            if st.timeout is not None and st.name in started and now - started[st.name] >= st.timeout:
+                pending.discard(f)
+                stop(f)
+                timings[st.name] = "timeout"
+
+    # decisive verdict (or all done): stop whatever is still queued or running
+    cancel.set()
+    for f in pending:
+        stop(f)
+        timings.setdefault(futures[f].name, "cancelled")
+    if threads is not None:
+        threads.shutdown(wait=False, cancel_futures=True)
+    if winner is None:
+        return None, None, timings
+    return winner[0], winner[1], timings
+
+def conclusive(timings):
+    """True when every stage ran to completion: a miss that can be cached. A timeout,
+    error or cancellation only says this run found nothing."""
+    return all(isinstance(t, (int, float)) for t in timings.values())
@@ -1,6 +1,11 @@
 # misp_sync.py
-import sqlite3, time, json
-from pymisp import PyMISP
+import time, json
+from modules import registry_db, registry_snapshot
+
+try:
+    from pymisp import PyMISP
+except Exception:
+    PyMISP = None
 
 # CONFIG: your MISP server + key
 MISP_URL = "https://misp.example.local"   # or public instance
@@ -9,59 +14,114 @@ VERIFY = False  # verify TLS certs? set True in prod
 
 # Local DB path (same schema as registry.db earlier)
 DB = "registry.db"
+SOURCE = "misp"
+PAGE_SIZE = 500
+HASH_TYPES = ("sha256", "md5", "sha1")
+
+INSERT_SQL = "INSERT OR IGNORE INTO signatures(name,sha256,author,ts,meta) VALUES(?,?,?,?,?)"
+
+_misp = None
 
-misp = PyMISP(MISP_URL, MISP_KEY, ssl=VERIFY)
+def client():
+    """The MISP client, created on first use so importing this module never dials out."""
+    global _misp
+    if _misp is None:
+        if PyMISP is None:
+            raise RuntimeError("pymisp is not installed")
+        _misp = PyMISP(MISP_URL, MISP_KEY, ssl=VERIFY)
+    return _misp
 
 def init_db():
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS signatures(
-        id INTEGER PRIMARY KEY,
-        name TEXT,
-        sha256 TEXT,
-        whirlpool TEXT,
-        ssdeep TEXT,
-        rule_tag TEXT,
-        author TEXT,
-        ts INTEGER,
-        signer_pub BLOB,
-        signature BLOB,
-        meta JSON
-    )""")
-    conn.commit(); conn.close()
+    # registry_db migrates the schema (registry_schema) when the connection is opened
+    registry_db.connect(DB, writer=True)
 
 def upsert_hash(name, sha256, author="misp", meta=None):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM signatures WHERE sha256=?", (sha256,))
-    if cur.fetchone():
-        conn.close(); return False
-    # create a lightweight meta entry (signed by you later via registry_cli)
-    cur.execute("INSERT INTO signatures(name,sha256,author,ts,meta) VALUES(?,?,?,?,?)",
-                (name, sha256, author, int(time.time()), json.dumps(meta or {})))
-    conn.commit(); conn.close()
-    return True
+    with registry_db.transaction(DB) as conn:
+        if conn.execute("SELECT id FROM signatures WHERE sha256=?", (sha256,)).fetchone():
+            return False
+        # create a lightweight meta entry (signed by you later via registry_cli)
+        cur = conn.execute(INSERT_SQL, (name, sha256, author, int(time.time()), json.dumps(meta or {})))
+    return cur.rowcount == 1
+
+def event_rows(event, now):
+    """signatures rows for one event's hash and yara attributes (top level and objects)."""
+    name = event.get('info', 'misp-event')
+    attrs = list(event.get('Attribute', []))
+    for obj in event.get('Object', []) or []:
+        attrs.extend(obj.get('Attribute', []))
+    rows = []
+    for attr in attrs:
+        atype = attr.get('type')
+        value = attr.get('value')
+        if not value:
+            continue
+        if atype == "sha256":
+            rows.append((name, value.strip().lower(), "misp", now, json.dumps({})))
+        # other digests go to the (algo, digest) hash index through meta
+        elif atype in HASH_TYPES:
+            rows.append((name, None, "misp", now, json.dumps({"hashes": {atype: value.strip().lower()}})))
+        # capture YARA rules or yara signature text, stored as meta for later mapping
+        elif atype == "yara":
+            rows.append((name, None, "misp", now, json.dumps({"yara": value})))
+    return rows
+
+def fetch_pages(misp, since, page_size=PAGE_SIZE):
+    """Yield lists of events modified at or after since, one MISP result page at a time."""
+    page = 1
+    while True:
+        events = misp.search(controller="events", timestamp=int(since), page=page,
+                             limit=page_size, pythonify=False)
+        if isinstance(events, dict) and "errors" in events:
+            raise RuntimeError(f"MISP search failed: {events['errors']}")
+        yield events
+        if len(events) < page_size:
+            return
+        page += 1
+
+def sync_events(days=1, misp=None, page_size=PAGE_SIZE):
+    """Pull events changed since the stored cursor (first run: the last N days).
 
-def sync_events(days=1):
+    Each page is written in one transaction; events whose timestamp has not moved since
+    the last run are skipped. The cursor advances only after every page is stored, so
+    an interrupted run is simply repeated from the old cursor.
+    """
     init_db()
-    since = (time.time() - days*86400)
-    # Pull events modified in last N days
-    events = misp.search(timestamp=int(since))
-    print(f"[SYNC] fetched {len(events)} events")
-    for ev in events:
-        # each event may have multiple attributes
-        for attr in ev.get('Event', {}).get('Attribute', []):
-            atype = attr.get('type')
-            value = attr.get('value')
-            if atype in ("sha256","md5","sha1"):
-                print("[SYNC] adding hash", value)
-                upsert_hash(ev['Event'].get('info','misp-event'), value, author="misp")
-            # capture YARA rules or yara signature text
-            if atype == "yara":
-                # store as a rule_tag/meta for later mapping
-                name = ev['Event'].get('info','misp-event')
-                upsert_hash(name, None, author="misp", meta={"yara": value})
+    misp = misp or client()
+    conn = registry_db.connect(DB)
+    cursor = registry_db.get_cursor(conn, SOURCE)
+    since = int(cursor) if cursor is not None else int(time.time() - days*86400)
+    newest = since
+    fetched = changed = added = 0
+    for events in fetch_pages(misp, since, page_size):
+        fetched += len(events)
+        uuids = [ev.get('Event', ev).get('uuid') for ev in events]
+        known = dict(conn.execute(
+            f"SELECT uuid, timestamp FROM misp_events WHERE uuid IN ({','.join('?' * len(uuids))})",
+            uuids).fetchall()) if uuids else {}
+        now = int(time.time())
+        rows, seen = [], []
+        for ev in events:
+            ev = ev.get('Event', ev)
+            uuid, stamp = ev.get('uuid'), int(ev.get('timestamp') or 0)
+            newest = max(newest, stamp)
+            if uuid in known and known[uuid] >= stamp:
+                continue  # unchanged since the last sync
+            rows.extend(event_rows(ev, now))
+            seen.append((uuid, stamp))
+        if not seen:
+            continue
+        changed += len(seen)
+        with registry_db.transaction(DB) as tx:
+            rows = [r for r in rows if not registry_db.known_row(tx, r[0], r[1], r[4])]
+            added += tx.executemany(INSERT_SQL, rows).rowcount
+            tx.executemany("INSERT OR REPLACE INTO misp_events(uuid, timestamp) VALUES(?,?)", seen)
+    with registry_db.transaction(DB) as tx:
+        registry_db.set_cursor(tx, SOURCE, newest)
+    print(f"[SYNC] fetched {fetched} events, {changed} changed, {added} new signatures")
+    if added:
+        registry_snapshot.republish(DB)
     print("[SYNC] done")
+    return {"fetched": fetched, "changed": changed, "added": added, "cursor": newest}
 
 if __name__ == "__main__":
     sync_events(days=7)
@@ -0,0 +1,151 @@
+# modules/quarantine_store.py
+"""
+Quarantine Store
+Content-addressed quarantine: objects live at <root>/objects/ab/cd/<sha256>, identical
+content is kept once with a reference count, and index.db answers listing/stats
+without walking the tree. Moves are a rename when possible; across filesystems the
+data is reflinked (FICLONE) or copied in-kernel with copy_file_range.
+"""
+
+import os, errno, fcntl, shutil, sqlite3, tempfile, time, re
+
+QUARANTINE_DIR = "quarantine"
+FICLONE = 0x40049409
+_SHA_RE = re.compile(r"^[0-9a-f]{64}$")
+
+INDEX_SCHEMA = """CREATE TABLE IF NOT EXISTS objects(
+    sha256 TEXT PRIMARY KEY,
+    size INTEGER,
+    refs INTEGER NOT NULL DEFAULT 0,
+    name TEXT,
+    first_ts INTEGER,
+    last_ts INTEGER
+)"""
+
+def object_path(sha, root=QUARANTINE_DIR):
+    return os.path.join(root, "objects", sha[:2], sha[2:4], sha)
+
+def _index(root):
+    os.makedirs(root, exist_ok=True)
+    conn = sqlite3.connect(os.path.join(root, "index.db"), timeout=30)
+    conn.execute(INDEX_SCHEMA)
+    return conn
+
+# --- data movement ---
+def _reflink(src_fd, dst_fd):
+    try:
+        fcntl.ioctl(dst_fd, FICLONE, src_fd)
+        return True
+    except OSError:
+        return False
+
+def _copy_range(src_fd, dst_fd, size):
+    if not hasattr(os, "copy_file_range"):
+        return False
+    done = 0
+    try:
+        while done < size:
+            n = os.copy_file_range(src_fd, dst_fd, size - done)
+            if n == 0:
+                break
+            done += n
+    except OSError as e:
+        if done == 0 and e.errno in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+            return False
+        raise
+    return done == size
+
+def _copy_across(src, dst):
+    # a private temp name: two processes quarantining the same sha never share one
+    fd, tmp = tempfile.mkstemp(prefix=os.path.basename(dst) + ".", suffix=".part",
+                               dir=os.path.dirname(dst))
+    try:
+        with open(src, "rb") as fi, os.fdopen(fd, "wb") as fo:
+            size = os.fstat(fi.fileno()).st_size
+            if not _reflink(fi.fileno(), fo.fileno()) and not _copy_range(fi.fileno(), fo.fileno(), size):
+                fi.seek(0); fo.seek(0); fo.truncate()
+                shutil.copyfileobj(fi, fo, 1 << 20)
+            fo.flush()
+            os.fsync(fo.fileno())
+        os.replace(tmp, dst)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except FileNotFoundError:
+            pass
+        raise
+    os.unlink(src)
+
+def _move(src, dst):
+    try:
+        os.rename(src, dst)  # same filesystem: metadata only
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        _copy_across(src, dst)
+
+# --- public API ---
+def store(src, sha, name=None, root=QUARANTINE_DIR):
+    """Move src into the store under sha; duplicates only bump the refcount. Returns the object path."""
+    dst = object_path(sha, root)
+    size = os.path.getsize(src)
+    if os.path.exists(dst):
+        os.unlink(src)  # already held: dedupe
+    else:
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        _move(src, dst)
+        os.chmod(dst, 0o400)
+    now = int(time.time())
+    conn = _index(root)
+    with conn:
+        conn.execute(
+            "INSERT INTO objects(sha256,size,refs,name,first_ts,last_ts) VALUES(?,?,1,?,?,?) "
+            "ON CONFLICT(sha256) DO UPDATE SET refs=refs+1, last_ts=excluded.last_ts",
+            (sha, size, name, now, now))
+    conn.close()
+    return dst
+
+def release(sha, root=QUARANTINE_DIR):
+    """Drop one reference; the object is deleted when none remain. Returns remaining refs."""
+    conn = _index(root)
+    with conn:
+        conn.execute("UPDATE objects SET refs=refs-1 WHERE sha256=? AND refs>0", (sha,))
+        row = conn.execute("SELECT refs FROM objects WHERE sha256=?", (sha,)).fetchone()
+        refs = row[0] if row else 0
+        if refs == 0:
+            conn.execute("DELETE FROM objects WHERE sha256=?", (sha,))
+            try:
+                os.unlink(object_path(sha, root))
+            except FileNotFoundError:
+                pass
+    conn.close()
+    return refs
+
+def contains(sha, root=QUARANTINE_DIR):
+    return os.path.exists(object_path(sha, root))
+
+def list_objects(root=QUARANTINE_DIR, limit=100):
+    conn = _index(root)
+    rows = conn.execute("SELECT sha256,size,refs,name,last_ts FROM objects "
+                        "ORDER BY last_ts DESC LIMIT ?", (limit,)).fetchall()
+    conn.close()
+    return rows
+
+def stats(root=QUARANTINE_DIR):
+    conn = _index(root)
+    objects, size, refs = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(size),0), COALESCE(SUM(refs),0) FROM objects").fetchone()
+    conn.close()
+    return {"objects": objects, "bytes": size, "references": refs}
+
+def migrate_flat(root=QUARANTINE_DIR):
+    """Move legacy quarantine/<sha> files into the sharded layout. Returns how many moved."""
+    if not os.path.isdir(root):
+        return 0
+    moved = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if _SHA_RE.match(name) and os.path.isfile(path):
+            store(path, name, root=root)
+            moved += 1
+    return moved
@@ -1,51 +1,136 @@
 # registry_cli.py
-import sqlite3, json, time, argparse
+import json, time, argparse, os, csv, sys, functools, itertools
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
 from cryptography.hazmat.primitives import serialization
+from modules.digest_engine import digest_file
+from modules import registry_db, registry_schema, registry_snapshot
 
 DB="registry.db"
 def init_db():
-    c=sqlite3.connect(DB)
-    cur=c.cursor()
-    cur.execute("""CREATE TABLE IF NOT EXISTS signatures(
-        id INTEGER PRIMARY KEY,
-        name TEXT,
-        sha256 TEXT,
-        whirlpool TEXT,
-        ssdeep TEXT,
-        rule_tag TEXT,
-        author TEXT,
-        ts INTEGER,
-        signer_pub BLOB,
-        signature BLOB,
-        meta JSON
-    )""")
-    c.commit(); c.close()
+    # registry_db migrates the schema (registry_schema) when the connection is opened
+    return registry_db.connect(DB, writer=True)
 
+INSERT_SQL="INSERT OR IGNORE INTO signatures(name,sha256,whirlpool,ssdeep,rule_tag,author,ts,signer_pub,signature,meta) VALUES(?,?,?,?,?,?,?,?,?,?)"
+
+@functools.lru_cache(maxsize=4)
 def load_privkey(path="keys/privkey.pem"):
+    # parsed once per process; bulk imports sign every entry with the same key
     b=open(path,"rb").read()
     return Ed25519PrivateKey.from_private_bytes(b)
 
-def add_entry(name, sha256=None, whirl=None, ssdeep=None, rule_tag=None, author="you", meta=None, privkey="keys/privkey.pem"):
-    init_db()
-    entry = {"name":name,"sha256":sha256,"whirlpool":whirl,"ssdeep":ssdeep,"rule_tag":rule_tag,"author":author,"ts":int(time.time()),"meta":meta or {}}
+def signed_row(sk, name, sha256=None, whirl=None, ssdeep=None, rule_tag=None, author="you", meta=None, ts=None):
+    """Sign the canonical entry and return the signatures row tuple for INSERT_SQL."""
+    entry = {"name":name,"sha256":sha256,"whirlpool":whirl,"ssdeep":ssdeep,"rule_tag":rule_tag,"author":author,"ts":ts or int(time.time()),"meta":meta or {}}
     payload = json.dumps(entry, sort_keys=True).encode()
-    sk = load_privkey(privkey)
     sig = sk.sign(payload)
     pub = sk.public_key().public_bytes(encoding=serialization.Encoding.Raw, format=serialization.PublicFormat.Raw)
-    conn=sqlite3.connect(DB)
-    cur=conn.cursor()
-    cur.execute("INSERT INTO signatures(name,sha256,whirlpool,ssdeep,rule_tag,author,ts,signer_pub,signature,meta) VALUES(?,?,?,?,?,?,?,?,?,?)",
-                (name,sha256,whirl,ssdeep,rule_tag,author,entry["ts"],pub,sig,json.dumps(entry["meta"])))
-    conn.commit(); conn.close()
-    print("[OK] added", name)
+    return (name,sha256,whirl,ssdeep,rule_tag,author,entry["ts"],pub,sig,json.dumps(entry["meta"]))
+
+def add_entry(name, sha256=None, whirl=None, ssdeep=None, rule_tag=None, author="you", meta=None, privkey="keys/privkey.pem"):
+    init_db()
+    row = signed_row(load_privkey(privkey), name, sha256, whirl, ssdeep, rule_tag, author, meta)
+    with registry_db.transaction(DB) as conn:
+        added = conn.execute(INSERT_SQL, row).rowcount
+    print("[OK] added" if added else "[SKIP] sha256 already registered:", name)
+    if added:
+        registry_snapshot.republish(DB)
+
+def add_file(path, name=None, rule_tag=None, author="you", privkey="keys/privkey.pem"):
+    """Register an artifact, filling sha256/whirlpool/ssdeep from one read of the file."""
+    d = digest_file(path)
+    # md5/sha1 go where the hashes table indexes them (registry_schema)
+    meta = {"size": d["size"], "hashes": {"md5": d["md5"], "sha1": d["sha1"]}}
+    add_entry(name or os.path.basename(path), d["sha256"], d["whirlpool"], d["ssdeep"],
+              rule_tag, author, meta, privkey)
+
+# --- bulk import ---
+FIELDS=("name","sha256","whirlpool","ssdeep","rule_tag","author","meta")
+EXTRA_DIGESTS=("md5","sha1")
+
+def iter_records(path, fmt=None):
+    """Yield entry dicts from a CSV (header row) or JSONL stream; path '-' reads stdin.
+    Optional md5/sha1 fields end up in meta["hashes"]."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "jsonl")
+    f = sys.stdin if path == "-" else open(path, newline="")
+    try:
+        rows = csv.DictReader(f) if fmt == "csv" else (json.loads(l) for l in f if l.strip())
+        for rec in rows:
+            meta = rec.get("meta") or {}
+            if isinstance(meta, str):
+                meta = json.loads(meta)
+            out = {k: (rec.get(k) or None) for k in FIELDS}
+            out["meta"] = meta
+            if out["sha256"]:
+                out["sha256"] = out["sha256"].strip().lower()
+            # md5/sha1 columns are indexed through meta.hashes, never the sha256 column
+            extra = {a: rec[a].strip().lower() for a in EXTRA_DIGESTS if rec.get(a)}
+            if extra:
+                meta.setdefault("hashes", {}).update(extra)
+            yield out
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+def _sign_batch(args):
+    batch, privkey, author, ts = args
+    sk = load_privkey(privkey)  # once per worker process thanks to the cache
+    return [signed_row(sk, r["name"] or r["sha256"] or "unnamed", r["sha256"], r["whirlpool"], r["ssdeep"],
+                       r["rule_tag"], r["author"] or author, r["meta"], ts) for r in batch]
+
+def _batches(records, size):
+    batch = []
+    for rec in records:
+        batch.append(rec)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _ordered_map(pool, func, items, ahead):
+    """pool.map that pulls items lazily: at most ahead calls queued or running at once."""
+    items = iter(items)
+    pending = deque(pool.submit(func, i) for i in itertools.islice(items, ahead))
+    while pending:
+        result = pending.popleft().result()
+        for i in itertools.islice(items, 1):
+            pending.append(pool.submit(func, i))
+        yield result
+
+def import_entries(path, fmt=None, batch_size=10000, workers=1, author="import", privkey="keys/privkey.pem"):
+    """Sign and insert a CSV/JSONL stream: one transaction and executemany per batch,
+    duplicate sha256 values skipped by the unique index. Signing can fan out to workers."""
+    init_db()
+    ts = int(time.time())
+    jobs = ((b, privkey, author, ts) for b in _batches(iter_records(path, fmt), batch_size))
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    seen = added = 0
+    start = time.perf_counter()
+    try:
+        # a couple of batches per worker in flight, so a large import is not read into memory
+        signed = _ordered_map(pool, _sign_batch, jobs, workers * 2) if pool else map(_sign_batch, jobs)
+        for rows in signed:
+            with registry_db.transaction(DB) as conn:
+                added += conn.executemany(INSERT_SQL, rows).rowcount
+            seen += len(rows)
+            rate = seen / max(time.perf_counter() - start, 1e-9)
+            print(f"[IMPORT] {seen} read, {added} added, {seen - added} duplicate ({rate:,.0f}/s)")
+    finally:
+        if pool:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+    print(f"[OK] imported {added}/{seen} entries in {elapsed:.1f}s ({seen / max(elapsed, 1e-9):,.0f} entries/s)")
+    if added:
+        registry_snapshot.republish(DB)
+    return {"read": seen, "added": added, "seconds": round(elapsed, 3)}
 
 def list_entries():
     init_db()
-    conn=sqlite3.connect(DB)
+    conn=registry_db.connect(DB)
     for row in conn.execute("SELECT id,name,sha256,whirlpool,ssdeep,rule_tag,author,ts FROM signatures"):
         print(row)
-    conn.close()
 
 if __name__=="__main__":
     p=argparse.ArgumentParser()
@@ -55,9 +140,25 @@ if __name__=="__main__":
     p.add_argument("--whirlpool")
     p.add_argument("--ssdeep")
     p.add_argument("--rule_tag")
+    p.add_argument("--file", help="compute the digests from this artifact")
     p.add_argument("--list", action="store_true")
+    p.add_argument("--import", dest="import_path", metavar="PATH", help="bulk import a CSV/JSONL file ('-' for stdin)")
+    p.add_argument("--format", choices=("csv","jsonl"))
+    p.add_argument("--batch", type=int, default=10000)
+    p.add_argument("--workers", type=int, default=1, help="signing processes for --import")
+    p.add_argument("--snapshot", action="store_true", help="publish the memory-mapped registry snapshot for gate workers")
+    p.add_argument("--migrate", action="store_true", help="apply pending schema migrations, duplicate rows set aside")
     args=p.parse_args()
-    if args.add:
+    if args.migrate:
+        print(f"[OK] registry schema v{registry_schema.version(init_db())}")
+    if args.snapshot:
+        init_db()
+        registry_snapshot.compile_snapshot(DB)
+    if args.import_path:
+        import_entries(args.import_path, args.format, args.batch, args.workers)
+    if args.add and args.file:
+        add_file(args.file, args.name, args.rule_tag)
+    elif args.add:
         add_entry(args.name, args.sha256, args.whirlpool, args.ssdeep, args.rule_tag)
     if args.list:
         list_entries()
@@ -0,0 +1,193 @@
+# modules/registry_db.py
+"""
+Registry DB
+One access layer for registry.db. Connections are pooled per thread (and re-opened in
+forked workers), run in WAL mode so sync-job writes never block gate reads, and carry
+tuned pragmas plus a large prepared-statement cache: keep SQL text constant and
+sqlite3 reuses the compiled statement on every call. The schema itself is owned by
+registry_schema and migrated when a connection is opened; steps that set rows aside
+wait for a writer connection (transaction(), connect(writer=True)).
+"""
+
+import sqlite3, threading, os, time, json
+from contextlib import contextmanager
+from modules import registry_schema
+
+DB = "registry.db"
+STATEMENT_CACHE = 256
+MIRROR_REFRESH = 1.0   # seconds between generation checks by in-memory mirrors
+PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),      # safe with WAL, fsync only at checkpoints
+    ("cache_size", -65536),         # 64 MiB page cache
+    ("mmap_size", 268435456),       # 256 MiB memory-mapped reads
+    ("temp_store", "MEMORY"),
+    ("busy_timeout", 5000),
+)
+
+_local = threading.local()
+
+def prepare(conn, writer=False):
+    """Bring conn's registry schema up to date (see registry_schema); True once ready.
+    Only a writer applies the steps that set duplicate rows aside."""
+    return registry_schema.migrate(conn, destructive=writer) == registry_schema.VERSION
+
+def open_connection(path=DB, writer=False, **kwargs):
+    """A new tuned connection, outside the pool (for callers that need their own handle)."""
+    conn = sqlite3.connect(path, timeout=30, cached_statements=STATEMENT_CACHE, **kwargs)
+    for name, value in PRAGMAS:
+        conn.execute(f"PRAGMA {name}={value}")
+    prepare(conn, writer)
+    return conn
+
+def connect(path=DB, writer=False):
+    """The calling thread's pooled connection to path. Do not close it. Pass writer=True
+    from code that changes the registry (CLI, syncs) so it finishes every migration."""
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.conns = {}  # fresh pool after fork: never share a handle with the parent
+        _local.writers = set()
+        _local.pid = os.getpid()
+    key = os.path.abspath(path)
+    conn = _local.conns.get(key)
+    if conn is None:
+        conn = _local.conns[key] = open_connection(path, writer)
+    elif writer and key not in _local.writers:
+        prepare(conn, writer)
+    if writer:
+        _local.writers.add(key)
+    return conn
+
+@contextmanager
+def transaction(path=DB):
+    """Pooled connection inside one transaction: commit on success, roll back on error."""
+    conn = connect(path, writer=True)
+    with conn:
+        yield conn
+
+def get_cursor(conn, source, default=None):
+    row = conn.execute("SELECT cursor FROM sync_state WHERE source=?", (source,)).fetchone()
+    return row[0] if row else default
+
+def set_cursor(conn, source, cursor):
+    """Record source's resume point; call inside the transaction that wrote its rows."""
+    conn.execute("INSERT OR REPLACE INTO sync_state(source, cursor, updated) VALUES(?,?,?)",
+                 (source, str(cursor), int(time.time())))
+
+def known_row(conn, name, sha256, meta):
+    """True if a feed row is already registered by a digest in meta["hashes"]. Rows
+    with a sha256, and hashless rules/IOCs (unique by name and meta), are left to the
+    unique indexes: insert them with INSERT OR IGNORE."""
+    if sha256 is not None:
+        return False
+    digests = (json.loads(meta).get("hashes") or {}) if meta else {}
+    return bool(digests) and all(
+        conn.execute("SELECT 1 FROM hashes WHERE algo=? AND digest=?", (a, d)).fetchone()
+        for a, d in digests.items())
+
+def close_all():
+    for conn in getattr(_local, "conns", {}).values():
+        conn.close()
+    _local.conns = {}
+    _local.writers = set()
+
+
+class RegistryMirror:
+    """Base for in-memory structures built from registry rows.
+
+    Subclasses implement _reset(total) and _add(rid, *values); rows come from the
+    signatures table by default, or from a table derived from it (rules, iocs) whose
+    rows are appended together with their signature. refresh() checks the registry
+    generation at most every MIRROR_REFRESH seconds, appends rows past the last seen
+    rowid, and rebuilds when rows were updated or deleted.
+    """
+
+    def __init__(self, connect, columns, table="signatures"):
+        self._connect = connect          # callable -> sqlite3 connection
+        self.columns = tuple(columns)
+        self.table = table
+        self.last_id = 0
+        self.last_sig = 0
+        self.generation = None
+        self.built = False
+        self.pinned = False
+        self._checked = 0.0
+        self._lock = threading.Lock()
+
+    def _reset(self, total):
+        raise NotImplementedError
+
+    def _add(self, rid, *values):
+        raise NotImplementedError
+
+    def _overfull(self):
+        return False
+
+    def _rows(self, conn, after=0):
+        cols = ", ".join(self.columns)
+        return conn.execute(
+            f"SELECT id, {cols} FROM {self.table} WHERE id > ? AND {self.columns[0]} IS NOT NULL",
+            (after,)).fetchall()
+
+    def _top(self, conn, table):
+        return conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()[0]
+
+    def rebuild(self, conn):
+        try:
+            total = self._top(conn, self.table)
+            sig_top = self._top(conn, "signatures")
+            rows = self._rows(conn)
+        except sqlite3.OperationalError:
+            total, sig_top, rows = 0, 0, []  # no registry tables yet
+        self._reset(total)
+        for row in rows:
+            self._add(*row)
+        self.last_id = total
+        self.last_sig = sig_top
+        self.built = True
+
+    def load(self, rows, generation):
+        """Fill from rows supplied by the caller (a registry snapshot) instead of SQLite;
+        refresh() leaves the mirror alone until unpin()."""
+        with self._lock:
+            self._reset(len(rows))
+            for row in rows:
+                self._add(*row)
+            self.generation = generation
+            self.built = self.pinned = True
+
+    def unpin(self):
+        if self.pinned:
+            with self._lock:
+                self.pinned = self.built = False
+
+    def refresh(self, force=False):
+        if self.pinned:
+            return
+        now = time.monotonic()
+        if not force and self.built and now - self._checked < MIRROR_REFRESH:
+            return
+        with self._lock:
+            self._checked = now
+            conn = self._connect()
+            try:
+                gen = conn.execute("SELECT generation FROM registry_generation WHERE id=0").fetchone()[0]
+            except sqlite3.OperationalError:
+                gen = None  # no registry yet
+            if self.built and gen is not None and gen == self.generation:
+                return
+            if not self.built or gen is None or self.generation is None:
+                self.rebuild(conn)
+            else:
+                # every signatures row change bumps the generation by one, so if the bump
+                # equals the signatures appended since last_sig nothing was updated or deleted
+                appended, sig_top = conn.execute(
+                    "SELECT COUNT(*), COALESCE(MAX(id), ?) FROM signatures WHERE id > ?",
+                    (self.last_sig, self.last_sig)).fetchone()
+                prev = self.last_id
+                for row in self._rows(conn, prev):
+                    self._add(*row)
+                self.last_id = max(prev, self._top(conn, self.table))
+                self.last_sig = sig_top
+                if gen - self.generation != appended or self._overfull():
+                    self.rebuild(conn)
+            self.generation = gen
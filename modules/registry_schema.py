@@ -0,0 +1,337 @@
+# modules/registry_schema.py
+"""
+Registry Schema
+Single owner of the registry.db schema. Every change is a numbered migration; the
+applied version lives in PRAGMA user_version and migrate() brings any registry.db,
+including files written before versioning, up to date in place, one transaction per
+step. Add new steps at the end of MIGRATIONS, never edit an applied one. Steps that
+would drop duplicate rows move them to signatures_removed instead and are applied by
+writers only (migrate(destructive=True)), never by a gate opening the registry to read.
+
+Regex patterns, YARA text and IOCs are kept in typed rules/iocs tables, filled from
+signatures.meta by triggers at insert time, so matchers query just what they need
+instead of parsing every meta blob. File digests of every algorithm live in hashes,
+one row per (algo, digest, signature): signatures.sha256 holds SHA-256 only, other
+digests are given as meta {"hashes": {"md5": ..., "sha1": ...}}.
+"""
+
+import sqlite3
+
+SIGNATURES_DDL = """CREATE TABLE IF NOT EXISTS signatures(
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    sha256 TEXT,
+    whirlpool TEXT,
+    ssdeep TEXT,
+    rule_tag TEXT,
+    author TEXT,
+    ts INTEGER,
+    signer_pub BLOB,
+    signature BLOB,
+    meta JSON
+)"""
+
+# generation counter bumped once per signatures row change (caches and mirrors key on it)
+GENERATION_DDL = [
+    """CREATE TABLE IF NOT EXISTS registry_generation(
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        generation INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO registry_generation(id, generation) VALUES(0, 0)",
+] + [
+    f"""CREATE TRIGGER IF NOT EXISTS signatures_gen_{op.lower()} AFTER {op} ON signatures
+        BEGIN UPDATE registry_generation SET generation = generation + 1 WHERE id = 0; END"""
+    for op in ("INSERT", "UPDATE", "DELETE")
+]
+
+# per-source resume points for the feed syncs (misp_sync, stix_sync)
+SYNC_DDL = [
+    """CREATE TABLE IF NOT EXISTS sync_state(
+        source TEXT PRIMARY KEY,
+        cursor TEXT,
+        updated INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS misp_events(
+        uuid TEXT PRIMARY KEY,
+        timestamp INTEGER
+    )""",
+    """CREATE TABLE IF NOT EXISTS stix_indicators(
+        id TEXT PRIMARY KEY,
+        modified TEXT
+    )""",
+]
+
+# rows moved out of signatures by a migration, kept for review instead of deleted
+REMOVED_DDL = """CREATE TABLE IF NOT EXISTS signatures_removed(
+    id INTEGER,
+    name TEXT,
+    sha256 TEXT,
+    whirlpool TEXT,
+    ssdeep TEXT,
+    rule_tag TEXT,
+    author TEXT,
+    ts INTEGER,
+    signer_pub BLOB,
+    signature BLOB,
+    meta JSON,
+    reason TEXT,
+    removed INTEGER
+)"""
+
+_COLUMNS = "id, name, sha256, whirlpool, ssdeep, rule_tag, author, ts, signer_pub, signature, meta"
+
+def _set_aside(conn, where, reason):
+    """Move the signatures rows matching where to signatures_removed; returns how many."""
+    conn.execute(REMOVED_DDL)
+    conn.execute(f"INSERT INTO signatures_removed({_COLUMNS}, reason, removed) "
+                 f"SELECT {_COLUMNS}, ?, strftime('%s', 'now') FROM signatures WHERE {where}", (reason,))
+    moved = conn.execute(f"DELETE FROM signatures WHERE {where}").rowcount
+    if moved:
+        print(f"[REGISTRY] moved {moved} {reason} rows to signatures_removed")
+    return moved
+
+# one row per sha256 (NULLs allowed for rule-only rows); keeps the oldest of any duplicates
+DUPLICATE_SHA256 = """sha256 IS NOT NULL AND id NOT IN
+    (SELECT MIN(id) FROM signatures WHERE sha256 IS NOT NULL GROUP BY sha256)"""
+
+INDEXES = [
+    "DROP INDEX IF EXISTS idx_signatures_sha256",  # superseded by the unique index
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_signatures_sha256 ON signatures(sha256)",
+    "CREATE INDEX IF NOT EXISTS idx_signatures_ssdeep ON signatures(ssdeep) WHERE ssdeep IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_signatures_rule_tag ON signatures(rule_tag) WHERE rule_tag IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS idx_signatures_ts ON signatures(ts)",
+]
+
+RULES_DDL = [
+    """CREATE TABLE IF NOT EXISTS rules(
+        id INTEGER PRIMARY KEY,
+        signature_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,          -- 'regex' | 'yara'
+        body TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_rules_kind ON rules(kind, id)",
+    "CREATE INDEX IF NOT EXISTS idx_rules_signature ON rules(signature_id)",
+    """CREATE TABLE IF NOT EXISTS iocs(
+        id INTEGER PRIMARY KEY,
+        signature_id INTEGER NOT NULL,
+        kind TEXT NOT NULL,          -- 'domain', 'ipv4-addr', 'url', ... (STIX object type)
+        value TEXT NOT NULL
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_iocs_value ON iocs(kind, value)",
+    "CREATE INDEX IF NOT EXISTS idx_iocs_signature ON iocs(signature_id)",
+]
+
+# rows derived from one signature's meta. {r} is the row (NEW in triggers, s in the
+# backfill), {m} its meta or NULL when that is not valid JSON, {each}/{src} the FROM parts
+_EXTRACT = [
+    """INSERT INTO rules(signature_id, kind, body)
+        SELECT {r}.id, 'regex', j.value FROM {each}json_each({m}, '$.regex_patterns') j
+        WHERE j.type = 'text'""",
+    """INSERT INTO rules(signature_id, kind, body)
+        SELECT {r}.id, 'yara', json_extract({m}, '$.yara') {src}
+        WHERE json_type({m}, '$.yara') = 'text'""",
+    """INSERT INTO iocs(signature_id, kind, value)
+        SELECT {r}.id, 'domain', json_extract({m}, '$.domain') {src}
+        WHERE json_type({m}, '$.domain') = 'text'""",
+    # stix_sync observables that are not file hashes
+    """INSERT INTO iocs(signature_id, kind, value)
+        SELECT {r}.id, json_extract({m}, '$.observable'), json_extract({m}, '$.value') {src}
+        WHERE {r}.sha256 IS NULL AND {r}.ssdeep IS NULL
+          AND json_type({m}, '$.observable') = 'text' AND json_type({m}, '$.value') = 'text'""",
+]
+
+def _extract(r, each="", src=""):
+    m = f"CASE WHEN json_valid({r}.meta) THEN {r}.meta END"
+    return [s.format(r=r, m=m, each=each, src=src) for s in _EXTRACT]
+
+_CLEAR = ["DELETE FROM rules WHERE signature_id = OLD.id", "DELETE FROM iocs WHERE signature_id = OLD.id"]
+
+def _trigger(name, event, statements):
+    return f"CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN {'; '.join(statements)}; END"
+
+EXTRACT_TRIGGERS = [
+    _trigger("signatures_meta_insert", "AFTER INSERT ON signatures", _extract("NEW")),
+    _trigger("signatures_meta_update", "AFTER UPDATE OF meta, sha256, ssdeep ON signatures",
+             _CLEAR + _extract("NEW")),
+    _trigger("signatures_meta_delete", "AFTER DELETE ON signatures", _CLEAR),
+] + [
+    # direct edits of derived rows count as registry changes too (inserts arrive through
+    # signatures, whose own trigger already bumped the generation)
+    f"""CREATE TRIGGER IF NOT EXISTS {t}_gen_{op.lower()} AFTER {op} ON {t}
+        BEGIN UPDATE registry_generation SET generation = generation + 1 WHERE id = 0; END"""
+    for t in ("rules", "iocs") for op in ("UPDATE", "DELETE")
+]
+
+def _backfill(conn):
+    """Extract rules/iocs from the meta of every signature already in the table."""
+    for stmt in _extract("s", each="signatures s, ", src="FROM signatures s"):
+        conn.execute(stmt)
+
+def _step2(conn):
+    _set_aside(conn, DUPLICATE_SHA256, "duplicate sha256")
+    for stmt in INDEXES:
+        conn.execute(stmt)
+
+# --- v4: typed hash index ---
+HASHES_DDL = [
+    """CREATE TABLE IF NOT EXISTS hashes(
+        id INTEGER PRIMARY KEY,
+        algo TEXT NOT NULL,          -- 'sha256', 'sha1', 'md5', 'whirlpool', ...
+        digest TEXT NOT NULL,        -- lower-case hex
+        signature_id INTEGER NOT NULL,
+        UNIQUE(algo, digest)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_hashes_signature ON hashes(signature_id)",
+]
+
+# md5/sha1 that feeds wrote into signatures.sha256 move to meta.hashes
+MOVE_FOREIGN_DIGESTS = """UPDATE signatures SET
+    meta = json_set(CASE WHEN json_valid(meta) THEN meta ELSE '{}' END,
+                    CASE length(sha256) WHEN 32 THEN '$.hashes.md5' ELSE '$.hashes.sha1' END,
+                    lower(sha256)),
+    sha256 = NULL
+    WHERE length(sha256) IN (32, 40)"""
+
+_EXTRACT_V4 = _EXTRACT[:3] + [
+    # stix_sync observables that are neither file hashes nor a digest column
+    """INSERT INTO iocs(signature_id, kind, value)
+        SELECT {r}.id, json_extract({m}, '$.observable'), json_extract({m}, '$.value') {src}
+        WHERE {r}.sha256 IS NULL AND {r}.ssdeep IS NULL
+          AND json_type({m}, '$.observable') = 'text' AND json_type({m}, '$.value') = 'text'
+          AND COALESCE(json_extract({m}, '$.path'), '') NOT LIKE 'hashes.%'""",
+    """INSERT OR IGNORE INTO hashes(algo, digest, signature_id)
+        SELECT 'sha256', lower({r}.sha256), {r}.id {src} WHERE length({r}.sha256) = 64""",
+    """INSERT OR IGNORE INTO hashes(algo, digest, signature_id)
+        SELECT 'whirlpool', lower({r}.whirlpool), {r}.id {src} WHERE {r}.whirlpool IS NOT NULL""",
+    """INSERT OR IGNORE INTO hashes(algo, digest, signature_id)
+        SELECT lower(j.key), lower(j.value), {r}.id FROM {each}json_each({m}, '$.hashes') j
+        WHERE j.type = 'text'""",
+]
+
+def _extract_v4(r, each="", src=""):
+    m = f"CASE WHEN json_valid({r}.meta) THEN {r}.meta END"
+    return [s.format(r=r, m=m, each=each, src=src) for s in _EXTRACT_V4]
+
+_CLEAR_V4 = _CLEAR + ["DELETE FROM hashes WHERE signature_id = OLD.id"]
+
+TRIGGERS_V4 = [
+    _trigger("signatures_meta_insert", "AFTER INSERT ON signatures", _extract_v4("NEW")),
+    _trigger("signatures_meta_update", "AFTER UPDATE OF meta, sha256, whirlpool, ssdeep ON signatures",
+             _CLEAR_V4 + _extract_v4("NEW")),
+    _trigger("signatures_meta_delete", "AFTER DELETE ON signatures", _CLEAR_V4),
+] + [
+    f"""CREATE TRIGGER IF NOT EXISTS hashes_gen_{op.lower()} AFTER {op} ON hashes
+        BEGIN UPDATE registry_generation SET generation = generation + 1 WHERE id = 0; END"""
+    for op in ("UPDATE", "DELETE")
+]
+
+def _step4(conn):
+    for stmt in HASHES_DDL:
+        conn.execute(stmt)
+    for name in ("signatures_meta_insert", "signatures_meta_update", "signatures_meta_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute(MOVE_FOREIGN_DIGESTS)
+    # re-derive everything with the v4 rules (hash observables are no longer iocs)
+    conn.execute("DELETE FROM rules")
+    conn.execute("DELETE FROM iocs")
+    for stmt in _extract_v4("s", each="signatures s, ", src="FROM signatures s"):
+        conn.execute(stmt)
+    for stmt in TRIGGERS_V4:
+        conn.execute(stmt)
+
+# --- v5: hashless rows deduped by content ---
+# rule/IOC rows without a sha256 are unique by (name, meta), so feeds can INSERT OR
+# IGNORE them like hashed rows instead of looking each one up
+DUPLICATE_CONTENT = """sha256 IS NULL AND id NOT IN
+    (SELECT MIN(id) FROM signatures WHERE sha256 IS NULL GROUP BY name, meta)"""
+CONTENT_INDEX = """CREATE UNIQUE INDEX IF NOT EXISTS ux_signatures_content
+    ON signatures(name, meta) WHERE sha256 IS NULL"""
+
+def _step5(conn):
+    _set_aside(conn, DUPLICATE_CONTENT, "duplicate hashless")
+    conn.execute(CONTENT_INDEX)
+
+# --- v6: md5/sha1 that registry_cli --file kept at the top of meta ---
+MOVE_META_DIGESTS = [
+    f"""UPDATE signatures SET
+        meta = json_set(json_remove(meta, '$.{algo}'), '$.hashes.{algo}', lower(json_extract(meta, '$.{algo}')))
+        WHERE json_valid(meta) AND json_type(meta, '$.{algo}') = 'text'
+          AND length(json_extract(meta, '$.{algo}')) = {size}"""
+    for algo, size in (("md5", 32), ("sha1", 40))
+]
+
+# --- v7: a digest can belong to several signatures ---
+# v4 made (algo, digest) unique, so a second feed row with the same md5 got no hashes
+# row and deleting the first row dropped the digest for both
+HASHES_DDL_V7 = [
+    """CREATE TABLE hashes(
+        id INTEGER PRIMARY KEY,
+        algo TEXT NOT NULL,
+        digest TEXT NOT NULL,
+        signature_id INTEGER NOT NULL,
+        UNIQUE(algo, digest, signature_id)   -- also the (algo, digest) lookup index
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_hashes_signature ON hashes(signature_id)",
+]
+
+def _step7(conn):
+    for name in ("signatures_meta_insert", "signatures_meta_update", "signatures_meta_delete"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+    conn.execute("DROP TABLE hashes")  # its own generation triggers go with it
+    for stmt in HASHES_DDL_V7:
+        conn.execute(stmt)
+    for stmt in _extract_v4("s", each="signatures s, ", src="FROM signatures s")[-3:]:
+        conn.execute(stmt)  # just the hashes inserts: rules and iocs are unchanged
+    for stmt in TRIGGERS_V4:
+        conn.execute(stmt)
+
+# (version, statements and/or callables taking the connection)
+MIGRATIONS = [
+    (1, [SIGNATURES_DDL] + GENERATION_DDL + SYNC_DDL),
+    (2, [_step2]),
+    (3, RULES_DDL + [_backfill] + EXTRACT_TRIGGERS),
+    (4, [_step4]),
+    (5, [_step5]),
+    (6, MOVE_META_DIGESTS),
+    (7, [_step7]),
+]
+VERSION = MIGRATIONS[-1][0]
+
+# steps that move rows out of signatures, by version: only a writer (registry_cli, the
+# feed syncs) applies them, readers stop short while there is anything to move
+DESTRUCTIVE = {2: DUPLICATE_SHA256, 5: DUPLICATE_CONTENT}
+
+def version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate(conn, destructive=True):
+    """Apply every pending migration to conn's database; returns the resulting version.
+    With destructive=False it stops before a step that would move rows aside."""
+    if version(conn) >= VERSION:
+        return VERSION
+    for target, steps in MIGRATIONS:
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")  # one writer migrates; the rest see the result
+        try:
+            if version(conn) >= target:
+                conn.rollback()
+                continue
+            if not destructive and target in DESTRUCTIVE and conn.execute(
+                    f"SELECT EXISTS(SELECT 1 FROM signatures WHERE {DESTRUCTIVE[target]})").fetchone()[0]:
+                conn.rollback()
+                print(f"[REGISTRY] schema v{target} sets duplicate rows aside; left to a writer "
+                      f"(python -m modules.registry_cli --migrate)")
+                return target - 1
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version={target}")
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        print(f"[REGISTRY] schema migrated to v{target}")
+    return VERSION
@@ -0,0 +1,269 @@
+# modules/registry_snapshot.py
+"""
+Registry Snapshot
+Read-only, memory-mapped export of registry.db for gate workers. compile_snapshot()
+writes sorted (algorithm, digest) records (binary search), the ssdeep (block size,
+7-gram) buckets and the regex rule rows into one flat file and publishes it with an
+atomic rename.
+Every worker maps the same file, so lookups cost no SQL and the page cache holds a
+single copy however many processes read it. Snapshot.current() notices a newly
+published file and swaps to it; lookups already running keep the old mapping.
+
+Compiled regexes cannot be serialised, so the rules section carries the rows the
+RuleEngine compiles from (it does so once per snapshot generation).
+"""
+
+import os, mmap, struct, hashlib, time, threading
+from bisect import bisect_left
+from modules import registry_db
+from modules.digest_engine import ALGORITHMS
+from modules.fuzzy_index import keys as fuzzy_keys, THRESHOLD
+
+try:
+    import ssdeep
+except Exception:
+    ssdeep = None
+
+SNAPSHOT = "registry.snap"
+MAGIC = b"AVSNAP02"
+HEADER = struct.Struct("<8sQI")          # magic, registry generation, section count
+SECTION = struct.Struct("<8sQQI")        # name, offset, length, record count
+HASH_REC = struct.Struct("<B64sIII")     # algo code, digest, signature id, name offset, name length
+FUZZY_REC = struct.Struct("<IIIII")      # signature id, name off/len, hash off/len
+FKEY_REC = struct.Struct("<QII")         # bucket key, first posting, posting count
+POSTING = struct.Struct("<I")            # index into the fuzzy records
+RULE_REC = struct.Struct("<IIIIII")      # rule id, signature id, pattern off/len, name off/len
+
+def _bucket(key):
+    bs, gram = key
+    return int.from_bytes(hashlib.blake2b(f"{bs}:{gram}".encode(), digest_size=8).digest(), "little")
+
+ALGO_CODES = {a: i + 1 for i, a in enumerate(ALGORITHMS)}   # algorithms the gate computes
+
+def _hash_key(algo, value):
+    """Sortable algo code + raw digest for a hex digest, or None if it cannot be stored."""
+    code = ALGO_CODES.get(algo)
+    try:
+        raw = bytes.fromhex(value)
+    except (TypeError, ValueError):
+        return None
+    if code is None or len(raw) > 64:
+        return None
+    return bytes([code]) + raw.ljust(64, b"\0")
+
+
+# --- writer ---
+class _Strings:
+    def __init__(self):
+        self.blob = bytearray()
+        self.seen = {}
+
+    def add(self, text):
+        data = (text or "").encode("utf-8")
+        if data not in self.seen:
+            self.seen[data] = len(self.blob)
+            self.blob += data
+        return self.seen[data], len(data)
+
+def compile_snapshot(db=registry_db.DB, path=SNAPSHOT):
+    """Export db into a snapshot file and atomically publish it at path."""
+    conn = registry_db.connect(db)
+    # one read transaction: every section reflects the same registry generation
+    conn.execute("BEGIN")
+    try:
+        gen = conn.execute("SELECT generation FROM registry_generation WHERE id=0").fetchone()[0]
+        digests = conn.execute(
+            "SELECT h.algo, h.digest, s.id, s.name FROM hashes h JOIN signatures s ON s.id = h.signature_id").fetchall()
+        fuzzy = conn.execute("SELECT id, name, ssdeep FROM signatures WHERE ssdeep IS NOT NULL").fetchall()
+        rules = conn.execute(
+            "SELECT r.id, r.body, s.id, s.name FROM rules r JOIN signatures s ON s.id = r.signature_id "
+            "WHERE r.kind = 'regex' ORDER BY r.id").fetchall()
+    finally:
+        conn.rollback()
+
+    strings = _Strings()
+    hashes = []
+    for algo, value, rid, name in digests:
+        key = _hash_key(algo, value)
+        if key is not None:
+            hashes.append(HASH_REC.pack(key[0], key[1:], rid, *strings.add(name)))
+    hashes.sort()
+
+    fuzzy_recs, buckets = [], {}
+    for i, (rid, name, value) in enumerate(fuzzy):
+        fuzzy_recs.append(FUZZY_REC.pack(rid, *strings.add(name), *strings.add(value)))
+        for k in fuzzy_keys(value):
+            buckets.setdefault(_bucket(k), []).append(i)
+    fkeys, postings = [], bytearray()
+    for b in sorted(buckets):
+        ids = sorted(set(buckets[b]))
+        fkeys.append(FKEY_REC.pack(b, len(postings) // POSTING.size, len(ids)))
+        postings += b"".join(POSTING.pack(i) for i in ids)
+
+    rule_recs = [RULE_REC.pack(rule_id, sig_id, *strings.add(body), *strings.add(name))
+                 for rule_id, body, sig_id, name in rules]
+
+    sections = [(b"hashes", b"".join(hashes), len(hashes)),
+                (b"fuzzy", b"".join(fuzzy_recs), len(fuzzy_recs)),
+                (b"fkeys", b"".join(fkeys), len(fkeys)),
+                (b"postings", bytes(postings), len(postings) // POSTING.size),
+                (b"rules", b"".join(rule_recs), len(rule_recs)),
+                (b"strings", bytes(strings.blob), len(strings.seen))]
+    offset = HEADER.size + SECTION.size * len(sections)
+    directory = []
+    for name, data, count in sections:
+        offset = (offset + 7) & ~7
+        directory.append((name, offset, data, count))
+        offset += len(data)
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, gen, len(sections)))
+        for name, off, data, count in directory:
+            f.write(SECTION.pack(name, off, len(data), count))
+        for name, off, data, count in directory:
+            f.write(b"\0" * (off - f.tell()))
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)  # readers see either the old file or the complete new one
+    print(f"[SNAPSHOT] generation {gen}: {len(hashes)} digests, {len(fuzzy_recs)} ssdeep, "
+          f"{len(rule_recs)} rules -> {path}")
+    return gen
+
+def republish(db=registry_db.DB, path=SNAPSHOT):
+    """Recompile after a registry write, but only where a snapshot is already in use."""
+    if os.path.exists(path):
+        return compile_snapshot(db, path)
+    return None
+
+
+# --- reader ---
+class _Records:
+    """Sequence view of fixed-width records for bisect, keyed by their first field
+    (or by their first key_bytes raw bytes)."""
+
+    def __init__(self, buf, offset, count, rec, key_bytes=None):
+        self.buf, self.offset, self.count, self.rec = buf, offset, count, rec
+        self.key_bytes = key_bytes
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        start = self.offset + i * self.rec.size
+        if self.key_bytes:
+            return self.buf[start:start + self.key_bytes]
+        return self.rec.unpack_from(self.buf, start)[0]
+
+    def record(self, i):
+        return self.rec.unpack_from(self.buf, self.offset + i * self.rec.size)
+
+
+class Snapshot:
+    """One mapped snapshot file. Use Snapshot.current(path) to follow republishing."""
+
+    _lock = threading.Lock()
+    _current = {}   # path -> (Snapshot, checked at)
+
+    def __init__(self, path=SNAPSHOT):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self.ident = (st.st_ino, st.st_mtime_ns, st.st_size)
+        magic, self.generation, count = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a registry snapshot of this format")
+        self.sections = {}
+        for i in range(count):
+            name, off, length, n = SECTION.unpack_from(self._map, HEADER.size + i * SECTION.size)
+            self.sections[name.rstrip(b"\0")] = (off, length, n)
+        self._hashes = self._records(b"hashes", HASH_REC, key_bytes=65)
+        self._fuzzy = self._records(b"fuzzy", FUZZY_REC)
+        self._fkeys = self._records(b"fkeys", FKEY_REC)
+        self._postings = self._records(b"postings", POSTING)
+        self._rules = self._records(b"rules", RULE_REC)
+        self._strings = self.sections[b"strings"][0]
+
+    @classmethod
+    def current(cls, path=SNAPSHOT):
+        """The latest published snapshot at path (stat checked every MIRROR_REFRESH s), or None."""
+        now = time.monotonic()
+        snap, checked = cls._current.get(path, (None, 0.0))
+        if now - checked < registry_db.MIRROR_REFRESH:
+            return snap
+        with cls._lock:
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                snap = None
+            else:
+                if snap is None or snap.ident != (st.st_ino, st.st_mtime_ns, st.st_size):
+                    try:
+                        snap = cls(path)
+                    except (OSError, ValueError) as e:
+                        print(f"[SNAPSHOT] cannot load {path}: {e}")
+                        snap = None
+            cls._current[path] = (snap, now)
+        return snap
+
+    def _records(self, name, rec, key_bytes=None):
+        off, _, n = self.sections[name]
+        return _Records(self._map, off, n, rec, key_bytes)
+
+    def _str(self, off, length):
+        start = self._strings + off
+        return self._map[start:start + length].decode("utf-8")
+
+    def lookup(self, algo, value):
+        """(signature id, name) for one hex digest, or None."""
+        key = _hash_key(algo, value.lower()) if value else None
+        if key is None:
+            return None
+        i = bisect_left(self._hashes, key)
+        if i < len(self._hashes) and self._hashes[i] == key:
+            _, _, rid, off, length = self._hashes.record(i)
+            return (rid, self._str(off, length))
+        return None
+
+    def lookup_digests(self, digests, order=ALGORITHMS):
+        """(signature id, name, algo) for the first of {algo: hex} that is known, or None."""
+        for algo in order:
+            hit = self.lookup(algo, digests.get(algo))
+            if hit is not None:
+                return hit + (algo,)
+        return None
+
+    def fuzzy_candidates(self, fuzzy):
+        found = set()
+        keys = self._fkeys
+        for k in fuzzy_keys(fuzzy):
+            b = _bucket(k)
+            i = bisect_left(keys, b)
+            if i < len(keys):
+                key, first, count = keys.record(i)
+                if key == b:
+                    found.update(self._postings[j] for j in range(first, first + count))
+        return found
+
+    def best_match(self, fuzzy, threshold=THRESHOLD, cancel=None):
+        """(id, name, score) of the highest-scoring signature above threshold, or None.
+        A set cancel (threading.Event) stops the comparisons early."""
+        best = None
+        for i in self.fuzzy_candidates(fuzzy):
+            if cancel is not None and cancel.is_set():
+                return None
+            rid, noff, nlen, hoff, hlen = self._fuzzy.record(i)
+            score = ssdeep.compare(fuzzy, self._str(hoff, hlen))
+            if score > threshold and (best is None or score > best[2]):
+                best = (rid, self._str(noff, nlen), score)
+        return best
+
+    def rules(self):
+        """Rule rows as RuleEngine loads them: (rule id, pattern, signature id, name)."""
+        out = []
+        for i in range(len(self._rules)):
+            rule_id, sig_id, poff, plen, noff, nlen = self._rules.record(i)
+            out.append((rule_id, self._str(poff, plen), sig_id, self._str(noff, nlen)))
+        return out
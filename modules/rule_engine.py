@@ -0,0 +1,253 @@
+# modules/rule_engine.py
+"""
+Rule Engine
+Compiles every regex rule in the registry (the rules table) once into a cached ruleset. Each
+rule's required literal (when it has one) goes into a multi-literal prefilter
+(Aho-Corasick via pyahocorasick, or a lookahead alternation in re), so a file is
+scanned once for all literals and only rules whose literal occurs, plus rules
+without one, run their regex. Rebuilt only when the registry generation changes.
+
+scan_file() is the bounded-memory mode for large artifacts: the file is mmap'd and
+decoded one overlapping window at a time, so resident memory stays at about one
+window whatever the file size. Windows are decoded exactly as scan() decodes a whole
+file and run through the same str-compiled rules, with some context on either side;
+a match of a rule that looks past its end ("$", "\\b", lookahead) only counts with
+real text after it, so no rule fires on a window edge and both modes give the same
+verdict.
+"""
+
+import re, mmap, os
+from collections import namedtuple
+from modules.registry_db import RegistryMirror
+
+try:
+    import regex as rx
+except Exception:
+    rx = re
+try:
+    import ahocorasick
+except Exception:
+    ahocorasick = None
+try:
+    from re import _parser as sre_parse
+except ImportError:   # Python < 3.11
+    import sre_parse
+
+MIN_LITERAL = 3
+WINDOW = 8 << 20           # bytes scanned per window in scan_file
+DEFAULT_OVERLAP = 64 << 10  # used when a rule's match length is unbounded
+CONTEXT = 1 << 10          # bytes decoded before and after a window, for anchors and lookarounds
+UTF8_MAX = 4               # bytes per character, at most
+GUARD = CONTEXT // UTF8_MAX  # characters that must follow an edge-sensitive match
+
+Rule = namedtuple("Rule", "id name pattern compiled literal width edge")
+_END_ATS = {sre_parse.AT_END, sre_parse.AT_END_STRING, sre_parse.AT_BOUNDARY, sre_parse.AT_NON_BOUNDARY}
+
+def max_width(pattern):
+    """Longest possible match of pattern, in characters, or None if unbounded."""
+    try:
+        hi = sre_parse.parse(pattern).getwidth()[1]
+    except Exception:
+        return None
+    return hi if hi < sre_parse.MAXREPEAT else None
+
+def _subpatterns(av):
+    for x in av if isinstance(av, (list, tuple)) else (av,):
+        if isinstance(x, sre_parse.SubPattern):
+            yield x
+        elif isinstance(x, (list, tuple)):
+            yield from _subpatterns(x)
+
+def _peeks_ahead(parsed):
+    for op, av in parsed:
+        if op is sre_parse.AT and av in _END_ATS:
+            return True
+        if op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT) and av[0] == 1:
+            return True
+        if any(_peeks_ahead(p) for p in _subpatterns(av)):
+            return True
+    return False
+
+def edge_sensitive(pattern):
+    """True if a match of pattern can depend on the text after it ("$", "\\b",
+    lookahead), so it may match at the end of a window but not in the whole file."""
+    try:
+        return _peeks_ahead(sre_parse.parse(pattern))
+    except Exception:
+        return True  # syntax only the regex module knows: assume it can
+
+def required_literal(pattern, minimum=MIN_LITERAL):
+    """Longest run of plain characters every match must contain, or None."""
+    try:
+        parsed = sre_parse.parse(pattern)
+    except Exception:
+        return None  # syntax only the regex module knows: no prefilter
+    if parsed.state.flags & (sre_parse.SRE_FLAG_IGNORECASE | sre_parse.SRE_FLAG_VERBOSE):
+        return None
+    best, run = "", []
+    for op, av in list(parsed) + [(None, None)]:
+        if op is sre_parse.LITERAL:
+            run.append(chr(av))
+            continue
+        if len(run) > len(best):
+            best = "".join(run)
+        run = []
+    return best if len(best) >= minimum else None
+
+
+class LiteralPrefilter:
+    """Reports which of a set of literals (all str or all bytes) occur in a text, in one pass."""
+
+    def __init__(self, literals):
+        self.literals = sorted(set(literals), key=len, reverse=True)
+        self._auto = None
+        self._re = None
+        if not self.literals:
+            return
+        as_bytes = isinstance(self.literals[0], bytes)
+        if ahocorasick is not None and not as_bytes:
+            self._auto = ahocorasick.Automaton()
+            for lit in self.literals:
+                self._auto.add_word(lit, lit)
+            self._auto.make_automaton()
+        else:
+            # zero-width lookahead tries every offset, so overlapping literals are all seen;
+            # longest-first means a shorter literal at the same offset is one of its prefixes
+            sep, open_, close = (b"|", b"(?=(", b"))") if as_bytes else ("|", "(?=(", "))")
+            self._re = re.compile(open_ + sep.join(map(re.escape, self.literals)) + close)
+            self._prefixes = {l: [p for p in self.literals if l.startswith(p)] for l in self.literals}
+
+    def present(self, text, pos=0, endpos=None):
+        found = set()
+        total = len(self.literals)
+        if endpos is None:
+            endpos = len(text)
+        if self._auto is not None:
+            for _, lit in self._auto.iter(text, pos, endpos):
+                found.add(lit)
+                if len(found) == total:
+                    break
+        elif self._re is not None:
+            for m in self._re.finditer(text, pos, endpos):
+                found.update(self._prefixes[m.group(1)])
+                if len(found) == total:
+                    break
+        return found
+
+
+class RuleEngine(RegistryMirror):
+    """Compiled regex rules, mirrored from the rules table."""
+
+    def __init__(self, connect):
+        super().__init__(connect, ("body",), table="rules")
+        self.rules = []
+        self._prefilter = None
+
+    def _reset(self, total):
+        self.rules = []
+        self._prefilter = None
+
+    def _rows(self, conn, after=0):
+        return conn.execute(
+            "SELECT r.id, r.body, s.id, s.name FROM rules r JOIN signatures s ON s.id = r.signature_id "
+            "WHERE r.id > ? AND r.kind = 'regex' ORDER BY r.id", (after,)).fetchall()
+
+    def _add(self, rule_id, pat, sig_id, name):
+        self._prefilter = None
+        try:
+            compiled = rx.compile(pat)
+        except Exception as e:
+            print(f"[RULES] skipping bad pattern in signature {sig_id}: {e}")
+            return
+        self.rules.append(Rule(sig_id, name, pat, compiled, required_literal(pat), max_width(pat),
+                               edge_sensitive(pat)))
+
+    def prefilter(self):
+        if self._prefilter is None:
+            self._prefilter = LiteralPrefilter(r.literal for r in self.rules if r.literal)
+        return self._prefilter
+
+    def overlap(self):
+        """Bytes shared by consecutive windows: the longest match any rule can produce."""
+        widths = [r.width * UTF8_MAX if r.width is not None else DEFAULT_OVERLAP for r in self.rules]
+        return max(widths, default=0)
+
+    def scan(self, text, cancel=None):
+        """Every rule matching text, as (id, name, pattern) in registry order.
+
+        cancel: optional threading.Event; once set the scan stops between rules.
+        """
+        self.refresh()
+        rules, pf = self.rules, self.prefilter()
+        hits = pf.present(text)
+        out = []
+        for r in rules:
+            if cancel is not None and cancel.is_set():
+                break
+            if (r.literal is None or r.literal in hits) and r.compiled.search(text):
+                out.append((r.id, r.name, r.pattern))
+        return out
+
+    def scan_file(self, path, first_only=False, window=WINDOW, overlap=None, cancel=None):
+        """Scan path through an mmap in overlapping, separately decoded windows.
+
+        overlap defaults to the longest bounded rule width (DEFAULT_OVERLAP for
+        unbounded rules); matches longer than the overlap may be missed across a
+        window edge. With first_only the scan stops at the first hit; a set cancel
+        event stops it at the next window.
+        """
+        self.refresh()
+        rules, pf = self.rules, self.prefilter()
+        overlap = self.overlap() if overlap is None else overlap
+        matched = set()
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                start = 0
+                while start < size and len(matched) < len(rules):
+                    if cancel is not None and cancel.is_set():
+                        break
+                    end = min(size, start + window + overlap)
+                    text, pos, limit = _decode_window(m, size, start, end)
+                    hits = pf.present(text, pos)
+                    for i, r in enumerate(rules):
+                        if i in matched or (r.literal is not None and r.literal not in hits):
+                            continue
+                        if _search(r, text, pos, limit):
+                            matched.add(i)
+                            if first_only:
+                                return [(r.id, r.name, r.pattern)]
+                    # drop the pages we are done with so RSS stays at about one window
+                    lo = max(0, start - CONTEXT) & ~(mmap.PAGESIZE - 1)
+                    hi = (start + window - CONTEXT) & ~(mmap.PAGESIZE - 1)
+                    if hasattr(m, "madvise") and hi > lo:
+                        m.madvise(mmap.MADV_DONTNEED, lo, hi - lo)
+                    start += window
+        return [(r.id, r.name, r.pattern) for i, r in enumerate(rules) if i in matched]
+
+
+def _char_start(m, i, size):
+    """i moved back to the first byte of the UTF-8 character it falls in."""
+    for _ in range(UTF8_MAX - 1):
+        if i <= 0 or i >= size or not 0x80 <= m[i] < 0xC0:
+            break
+        i -= 1
+    return i
+
+def _decode_window(m, size, start, end):
+    """(text, pos, limit): bytes start..end of m decoded as scan() decodes a whole file,
+    with CONTEXT bytes either side; text[pos:limit] is the window itself."""
+    cuts = [_char_start(m, i, size) for i in (max(0, start - CONTEXT), start, end, min(size, end + CONTEXT))]
+    parts = [m[a:b].decode("utf-8", errors="ignore") for a, b in zip(cuts, cuts[1:])]
+    return "".join(parts), len(parts[0]), len(parts[0]) + len(parts[1])
+
+def _search(rule, text, pos, limit):
+    """First match of rule in text from pos, unless it needs more text to be sure of.
+    A match ending past limit starts in the next window (or is longer than the
+    overlap); it still counts unless the rule looks ahead and the text ends too soon."""
+    m = rule.compiled.search(text, pos)
+    if m is None or m.end() <= limit or not rule.edge:
+        return m
+    return m if m.end() + GUARD <= len(text) else None
@@ -1,40 +1,134 @@
 # stix_sync.py
-from taxii2client.v20 import Server
-from stix2 import parse
-import sqlite3, json, time
+import json, re, time
+from datetime import datetime, timedelta, timezone
+from taxii2client.v20 import Server, as_pages
+from modules import registry_db, registry_snapshot
+
+try:
+    from stix2patterns.pattern import Pattern
+except Exception:
+    Pattern = None
 
 DB = "registry.db"
 TAXII_URL = "https://cti-taxii.mitre.org/taxii/"
 COLLECTION_NAME = "enterprise-attack"   # pick the collection you want
+PER_REQUEST = 500
+# added_after is compared with the server's clock: step back a little to absorb skew
+CURSOR_SKEW = timedelta(minutes=5)
+
+HASH_COLUMNS = {"SHA-256": "sha256", "SHA256": "sha256", "SSDEEP": "ssdeep"}
+RULE_TAGS = {"domain-name": "domain"}
+
+INSERT_SQL = ("INSERT OR IGNORE INTO signatures(name,sha256,ssdeep,rule_tag,author,ts,meta) "
+              "VALUES(?,?,?,?,?,?,?)")
 
 def init_db():
-    conn = sqlite3.connect(DB)
-    conn.execute("""CREATE TABLE IF NOT EXISTS signatures(
-        id INTEGER PRIMARY KEY,
-        name TEXT,
-        sha256 TEXT,
-        whirlpool TEXT,
-        ssdeep TEXT,
-        rule_tag TEXT,
-        author TEXT,
-        ts INTEGER,
-        signer_pub BLOB,
-        signature BLOB,
-        meta JSON
-    )""")
-    conn.commit(); conn.close()
+    # registry_db migrates the schema (registry_schema) when the connection is opened
+    registry_db.connect(DB, writer=True)
 
 def upsert(name, sha256=None, rule_tag=None, meta=None):
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    cur.execute("SELECT id FROM signatures WHERE sha256=?", (sha256,))
-    if cur.fetchone():
-        conn.close(); return False
-    cur.execute("INSERT INTO signatures(name,sha256,rule_tag,author,ts,meta) "
-                "VALUES(?,?,?,?,?,?)",
-                (name, sha256, rule_tag, "stix-taxii", int(time.time()), json.dumps(meta or {})))
-    conn.commit(); conn.close()
-    return True
+    with registry_db.transaction(DB) as conn:
+        if conn.execute("SELECT id FROM signatures WHERE sha256=?", (sha256,)).fetchone():
+            return False
+        cur = conn.execute("INSERT OR IGNORE INTO signatures(name,sha256,rule_tag,author,ts,meta) "
+                           "VALUES(?,?,?,?,?,?)",
+                           (name, sha256, rule_tag, "stix-taxii", int(time.time()), json.dumps(meta or {})))
+    return cur.rowcount == 1
+
+# --- pattern parsing ---
+_QUOTED = re.compile(r"'((?:[^'\\]|\\.)*)'")
+# object-type:path op value, path steps being names, 'quoted keys' or [index]
+_COMPARISON = re.compile(
+    r"([a-z0-9-]+):((?:[A-Za-z0-9_-]+|'(?:[^'\\]|\\.)*'|\[[^\]]*\]|\.)+)\s*"
+    r"(NOT\s+)?(=|!=|IN|LIKE|MATCHES)\s*(\((?:[^()'\\]|'(?:[^'\\]|\\.)*')*\)|'(?:[^'\\]|\\.)*')")
+
+def _unquote(value):
+    return [re.sub(r"\\(.)", r"\1", v) for v in _QUOTED.findall(value)]
+
+def _split_path(path):
+    return [p.strip("'") for p in re.findall(r"'(?:[^'\\]|\\.)*'|[A-Za-z0-9_-]+", path)]
+
+def comparisons(pattern):
+    """(object_type, [path steps], value) for every positive = / IN comparison in a pattern."""
+    out = []
+    if Pattern is not None:
+        try:
+            found = Pattern(pattern).inspect().comparisons
+        except Exception:
+            return out
+        for otype, items in found.items():
+            for path, op, value in items:
+                if op in ("=", "IN"):
+                    out.extend((otype, [str(p) for p in path], v) for v in _unquote(value))
+        return out
+    for otype, path, negated, op, value in _COMPARISON.findall(pattern):
+        if not negated and op in ("=", "IN"):
+            out.extend((otype, _split_path(path), v) for v in _unquote(value))
+    return out
+
+def indicator_rows(obj, now):
+    """signatures rows for every hash and observable in one indicator's pattern."""
+    name = obj.get("name") or "unknown"
+    pattern = obj.get("pattern") or ""
+    rows = []
+    for otype, path, value in comparisons(pattern):
+        meta = {"pattern": pattern, "observable": otype, "path": ".".join(path), "value": value,
+                "indicator": obj.get("id")}
+        if otype == "file" and len(path) == 2 and path[0] == "hashes":
+            column = HASH_COLUMNS.get(path[1].upper())
+            if column == "sha256":
+                rows.append((name, value.lower(), None, None, "stix-taxii", now, json.dumps(meta)))
+                continue
+            if column == "ssdeep":
+                rows.append((name, None, value, None, "stix-taxii", now, json.dumps(meta)))
+                continue
+            # MD5, SHA-1, SHA-512, ...: indexed by the (algo, digest) hashes table
+            meta["hashes"] = {path[1].lower().replace("-", ""): value.lower()}
+            rows.append((name, None, None, None, "stix-taxii", now, json.dumps(meta)))
+            continue
+        rows.append((name, None, None, RULE_TAGS.get(otype, otype), "stix-taxii", now, json.dumps(meta)))
+    return rows
+
+def _store_page(indicators):
+    """Write one page of raw indicator dicts in a single transaction; returns rows added."""
+    if not indicators:
+        return 0
+    now = int(time.time())
+    with registry_db.transaction(DB) as conn:
+        ids = [o.get("id") for o in indicators]
+        known = dict(conn.execute(
+            f"SELECT id, modified FROM stix_indicators WHERE id IN ({','.join('?' * len(ids))})",
+            ids).fetchall())
+        rows, seen = [], []
+        for o in indicators:
+            modified = o.get("modified") or o.get("created")
+            if o.get("id") in known and known[o["id"]] == modified:
+                continue  # unchanged since the last sync
+            rows.extend(indicator_rows(o, now))
+            seen.append((o.get("id"), modified))
+        rows = [r for r in rows if not registry_db.known_row(conn, r[0], r[1], r[6])]
+        added = conn.executemany(INSERT_SQL, rows).rowcount
+        conn.executemany("INSERT OR REPLACE INTO stix_indicators(id, modified) VALUES(?,?)", seen)
+    return added
+
+def sync_collection(coll, per_request=PER_REQUEST):
+    """Page through coll's objects added since its cursor; only indicators are kept."""
+    source = f"stix:{coll.id}"
+    conn = registry_db.connect(DB)
+    cursor = registry_db.get_cursor(conn, source)
+    started = datetime.now(timezone.utc) - CURSOR_SKEW
+    filters = {"added_after": cursor} if cursor else {}
+    fetched = added = 0
+    for envelope in as_pages(coll.get_objects, per_request=per_request, **filters):
+        objs = envelope.get("objects") or []
+        fetched += len(objs)
+        added += _store_page([o for o in objs if o.get("type") == "indicator"])
+    with registry_db.transaction(DB) as tx:
+        registry_db.set_cursor(tx, source, started.strftime("%Y-%m-%dT%H:%M:%S.%fZ"))
+    print(f"[+] {coll.title}: {fetched} objects fetched, {added} new signatures")
+    if added:
+        registry_snapshot.republish(DB)
+    return added
 
 def sync():
     init_db()
@@ -44,23 +138,7 @@ def sync():
     for coll in collections:
         if COLLECTION_NAME.lower() in coll.title.lower():
             print(f"[+] Found collection: {coll.title}")
-            objs = coll.get_objects()
-            for o in objs["objects"]:
-                try:
-                    stix_obj = parse(o, allow_custom=True)
-                except Exception:
-                    continue
-                if stix_obj.type == "indicator":
-                    pattern = stix_obj.pattern
-                    # Example pattern: "[file:hashes.'SHA-256' = 'abcdef123...']"
-                    if "file:hashes.'SHA-256'" in pattern:
-                        sha = pattern.split("'")[3]
-                        upsert(stix_obj.name or "unknown", sha256=sha,
-                               meta={"pattern": pattern})
-                    elif "domain-name:value" in pattern:
-                        domain = pattern.split("'")[3]
-                        upsert(stix_obj.name or "unknown",
-                               rule_tag="domain", meta={"domain": domain})
+            sync_collection(coll)
             print("[✓] Sync complete")
             break
 
@@ -1,30 +1,47 @@
 # translator_gate_local.py
 from verify_manifest import verify_manifest  # earlier code
-from local_matcher import sha256_file, match_exact, match_ssdeep, match_rules
+from local_matcher import match_exact, match_ssdeep, match_rules, sync as sync_matchers
+from digest_engine import digest_file
+import verdict_cache, quarantine_store, matcher_cascade
+from matcher_cascade import Stage
 from audit import append_entry  # your hash-chain
 
 def process_upload(manifest_p, sig_p, content_p):
     manifest = verify_manifest(manifest_p, sig_p)  # raises if invalid
-    sha = sha256_file(content_p)
+    digests = digest_file(content_p)  # one read for every matcher
+    sha = digests["sha256"]
     if sha != manifest.get("content_sha256"):
         append_entry({"action":"reject","reason":"hash_mismatch","sha":sha})
         return {"status":"reject","reason":"hash_mismatch"}
-    # exact match
-    exact = match_exact(sha)
-    if exact:
-        append_entry({"action":"allow","sha":sha,"matched":"exact","id":exact[0]})
-        return {"status":"allow","why":"exact"}
-    # fuzzy
-    fuzzy = match_ssdeep(content_p)
-    if fuzzy:
-        append_entry({"action":"allow","sha":sha,"matched":"fuzzy","id":fuzzy[0],"score":fuzzy[2]})
-        return {"status":"allow","why":"fuzzy"}
-    # rule match
-    rule = match_rules(content_p)
-    if rule:
-        append_entry({"action":"allow","sha":sha,"matched":"rule","id":rule[0],"pattern":rule[2]})
-        return {"status":"allow","why":"rule"}
-    # unknown -> quarantine
-    append_entry({"action":"quarantine","sha":sha})
-    # move file to quarantine/...
-    return {"status":"quarantine"}
+    # seen before with the same registry -> same verdict, no matchers
+    cached = verdict_cache.lookup(sha)
+    if cached:
+        append_entry({"action":cached["status"],"sha":sha,"cached":True,**cached["details"]})
+        if cached["status"] == "allow":
+            return {"status":"allow","why":cached["why"]}
+        return {"status":"quarantine","path":quarantine_store.store(content_p, sha, manifest.get("name"))}
+    # matchers see at least the generation the verdict is cached under
+    generation = sync_matchers(verdict_cache.generation())
+    # exact, fuzzy and rule matchers run concurrently; the first hit cancels the rest
+    why, hit, timings = matcher_cascade.run([
+        Stage("exact", match_exact, sha, digests=digests, timeout=2.0),
+        Stage("fuzzy", match_ssdeep, content_p, fuzzy=digests["ssdeep"], timeout=10.0, cancellable=True),
+        Stage("rule", match_rules, content_p, generation=generation, timeout=30.0, process=True,
+              cancellable=True),
+    ])
+    if why == "exact":
+        details = {"matched":"exact","id":hit[0],"algo":hit[2]}
+    elif why == "fuzzy":
+        details = {"matched":"fuzzy","id":hit[0],"score":hit[2]}
+    elif why == "rule":
+        details = {"matched":"rule","id":hit[0],"pattern":hit[2]}
+    if why:
+        verdict_cache.remember(sha, "allow", why, details, generation=generation)
+        append_entry({"action":"allow","sha":sha,**details,"timings":timings})
+        return {"status":"allow","why":why}
+    # unknown -> quarantine; cached only if no matcher timed out or failed
+    if matcher_cascade.conclusive(timings):
+        verdict_cache.remember(sha, "quarantine", generation=generation)
+    qpath = quarantine_store.store(content_p, sha, manifest.get("name"))
+    append_entry({"action":"quarantine","sha":sha,"path":qpath,"timings":timings})
+    return {"status":"quarantine","path":qpath}
@@ -0,0 +1,134 @@
+# modules/verdict_cache.py
+"""
+Verdict Cache
+Remembers the gate's allow/quarantine decision per content sha256 so repeat artifacts
+skip the exact -> ssdeep -> regex cascade. An in-memory LRU sits in front of an on-disk
+SQLite store, and every entry is stamped with the registry generation: once registry.db
+changes, older verdicts are treated as misses. The matchers' registry mirrors refresh
+on their own schedule, so a caller caching a fresh verdict passes the generation its
+matchers were synced to (local_matcher.sync); verdicts for an older one are not stored.
+"""
+
+import sqlite3, json, time, os, threading
+from collections import OrderedDict
+from modules import registry_db
+
+REGISTRY_DB = "registry.db"
+CACHE_DB = "verdict_cache.db"
+LRU_SIZE = 4096
+
+CACHE_SCHEMA = """CREATE TABLE IF NOT EXISTS verdicts(
+    sha256 TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    why TEXT,
+    details JSON,
+    generation INTEGER NOT NULL,
+    ts INTEGER
+)"""
+
+
+class VerdictCache:
+    def __init__(self, registry_path=REGISTRY_DB, cache_db=CACHE_DB, size=LRU_SIZE):
+        self.registry_path = registry_path
+        self.cache_db = cache_db
+        self.size = size
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._pid = None
+        self._data_version = None
+        self._generation = None
+
+    # --- connections (reopened after fork so pool workers never share a handle) ---
+    def _connect(self):
+        if self._pid == os.getpid():
+            return
+        # own handle, not the pool: data_version only moves for other connections' commits
+        self._reg = registry_db.open_connection(self.registry_path, check_same_thread=False)
+        self._store = sqlite3.connect(self.cache_db, check_same_thread=False)
+        self._store.execute(CACHE_SCHEMA)
+        self._store.commit()
+        self._pid = os.getpid()
+        self._data_version = None
+        self._generation = None
+        self._lru.clear()
+
+    def generation(self):
+        """Current registry generation, or None when the registry has no signatures table."""
+        self._connect()
+        dv = self._reg.execute("PRAGMA data_version").fetchone()[0]
+        if dv == self._data_version and self._generation is not None:
+            return self._generation
+        self._data_version = dv
+        gen = self._read_generation()
+        if gen != self._generation:
+            self._lru.clear()
+            if gen is not None:
+                self._store.execute("DELETE FROM verdicts WHERE generation <> ?", (gen,))
+                self._store.commit()
+        self._generation = gen
+        return gen
+
+    def _read_generation(self):
+        try:
+            return self._reg.execute("SELECT generation FROM registry_generation WHERE id=0").fetchone()[0]
+        except sqlite3.OperationalError:
+            pass
+        if not registry_db.prepare(self._reg):
+            return None  # no signatures table yet: caching stays off
+        self._data_version = self._reg.execute("PRAGMA data_version").fetchone()[0]
+        return self._reg.execute("SELECT generation FROM registry_generation WHERE id=0").fetchone()[0]
+
+    # --- public API ---
+    def get(self, sha):
+        """Return the cached verdict dict for sha, or None."""
+        with self._lock:
+            gen = self.generation()
+            if gen is None:
+                return None
+            hit = self._lru.get(sha)
+            if hit is not None:
+                self._lru.move_to_end(sha)
+                return hit
+            row = self._store.execute(
+                "SELECT status, why, details FROM verdicts WHERE sha256=? AND generation=?",
+                (sha, gen)).fetchone()
+            if row is None:
+                return None
+            verdict = {"status": row[0], "why": row[1], "details": json.loads(row[2] or "{}")}
+            self._remember(sha, verdict)
+            return verdict
+
+    def current(self):
+        with self._lock:
+            return self.generation()
+
+    def put(self, sha, status, why=None, details=None, generation=None):
+        with self._lock:
+            gen = self.generation()
+            if gen is None or generation is not None and generation != gen:
+                return  # decided against an older registry: not worth keeping
+            verdict = {"status": status, "why": why, "details": details or {}}
+            self._remember(sha, verdict)
+            self._store.execute(
+                "INSERT OR REPLACE INTO verdicts(sha256, status, why, details, generation, ts) "
+                "VALUES(?,?,?,?,?,?)",
+                (sha, status, why, json.dumps(verdict["details"]), gen, int(time.time())))
+            self._store.commit()
+
+    def _remember(self, sha, verdict):
+        self._lru[sha] = verdict
+        self._lru.move_to_end(sha)
+        if len(self._lru) > self.size:
+            self._lru.popitem(last=False)
+
+
+_default = VerdictCache()
+
+def lookup(sha):
+    return _default.get(sha)
+
+def generation():
+    return _default.current()
+
+def remember(sha, status, why=None, details=None, generation=None):
+    _default.put(sha, status, why, details, generation)
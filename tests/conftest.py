@@ -0,0 +1,17 @@
+import os, sys
+import pytest
+
+# modules are imported from the repository root, as the entry points run them
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def keypair(tmp_path):
+    """(private key path, public key path): a fresh raw Ed25519 pair, as in keys/."""
+    from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+    from cryptography.hazmat.primitives import serialization
+    sk = Ed25519PrivateKey.generate()
+    priv, pub = tmp_path / "privkey.pem", tmp_path / "pubkey.pem"
+    priv.write_bytes(sk.private_bytes(serialization.Encoding.Raw, serialization.PrivateFormat.Raw,
+                                      serialization.NoEncryption()))
+    pub.write_bytes(sk.public_key().public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw))
+    return str(priv), str(pub)
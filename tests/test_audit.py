@@ -0,0 +1,86 @@
+import json, os, shutil
+import pytest
+import audit
+
+EVERY = 3
+
+@pytest.fixture
+def log(tmp_path, monkeypatch, keypair):
+    monkeypatch.chdir(tmp_path)  # checkpoints are signed with keys/ in the working dir
+    os.makedirs("keys")
+    shutil.copy(keypair[0], "keys/privkey.pem")
+    shutil.copy(keypair[1], "keys/pubkey.pem")
+    return str(tmp_path / "audit.log")
+
+def _append(path, n, start=0):
+    # what the audit writer does with a flushed batch, minus the thread
+    sealed = audit.AuditChain(path, checkpoint_every=EVERY).seal(
+        [{"action": "allow", "i": i} for i in range(start, start + n)])
+    with open(path, "a") as f:
+        f.writelines(json.dumps(e) + "\n" for e in sealed)
+    return sealed
+
+def _lines(path):
+    with open(path) as f:
+        return [json.loads(l) for l in f]
+
+def _rewrite(path, lines):
+    with open(path, "w") as f:
+        f.writelines(json.dumps(e) + "\n" for e in lines)
+
+def test_signed_checkpoint_every_n_entries_across_batches(log):
+    _append(log, 4)
+    _append(log, 4, start=4)   # a new chain object picks up the head from the file
+    lines = _lines(log)
+    assert [e["seq"] for e in lines] == list(range(1, len(lines) + 1))
+    checkpoints = [e for e in lines if e.get("action") == "checkpoint"]
+    assert [e["seq"] for e in checkpoints] == [4, 7, 10]   # after every EVERY-th link
+    for e in checkpoints:
+        assert e["head"] == e["prev"] and "signature" in e
+    res = audit.verify(log, state_path="audit.verify", full=True)
+    assert res["ok"] and res["verified"] == len(lines) and res["checkpoint"] == 10
+
+def test_changed_or_dropped_entry_breaks_the_chain(log):
+    _append(log, 5)
+    lines = _lines(log)
+    changed = [dict(e) for e in lines]
+    changed[1]["action"] = "quarantine"
+    _rewrite(log, changed)
+    res = audit.verify(log, state_path="audit.verify", full=True)
+    assert not res["ok"] and res["errors"][0][2] == "entry 2 does not match its hash"
+    _rewrite(log, lines[:1] + lines[2:])
+    res = audit.verify(log, state_path="audit.verify", full=True)
+    assert not res["ok"] and res["errors"][0][2] == "chain broken at seq 3"
+
+def test_verify_resumes_from_the_last_checkpoint(log):
+    _append(log, 4)                        # seq 1-3, checkpoint 4, seq 5
+    first = audit.verify(log, state_path="audit.verify")
+    assert first["ok"] and first["verified"] == 5 and first["checkpoint"] == 4
+    _append(log, 2, start=4)               # seq 6, checkpoint 7, seq 8
+    with open(log, "rb") as f:
+        anchor = sum(len(l) for l in f.readlines()[:4])
+    res = audit.verify(log, state_path="audit.verify")
+    assert res["ok"] and res["start"] == ("audit.log", anchor)
+    assert res["verified"] == 4 and res["checkpoint"] == 7
+
+def test_tampered_anchor_is_reverified_from_the_start(log):
+    _append(log, 4)
+    audit.verify(log, state_path="audit.verify")
+    lines = _lines(log)
+    lines[3]["ts"] += 1                    # a rewritten checkpoint, rehashed to look intact
+    lines[3]["hash"] = audit.entry_hash(lines[3])
+    _rewrite(log, lines)
+    res = audit.verify(log, state_path="audit.verify")
+    assert not res["ok"] and res["start"] == ("audit.log", 0)
+    assert res["errors"][0][2].startswith("checkpoint anchor changed")
+    assert res["errors"][1][2] == "checkpoint 4 signature does not verify"
+
+def test_checkpoint_with_a_forged_signature_is_rejected(log):
+    _append(log, 4)
+    lines = _lines(log)
+    lines[3]["signature"] = lines[3]["signature"][::-1]   # not part of the hash: the chain holds
+    _rewrite(log, lines)
+    res = audit.verify(log, state_path="audit.verify")
+    assert not res["ok"] and res["errors"] == [("audit.log", res["errors"][0][1],
+                                                "checkpoint 4 signature does not verify")]
+    assert not os.path.exists("audit.verify")   # the saved state never passes a bad checkpoint
@@ -0,0 +1,41 @@
+from modules import audit_dedupe
+from modules.audit_dedupe import DigestIndex, line_digest
+
+def test_index_grows_past_its_load_factor(tmp_path):
+    path = str(tmp_path / "audit.dedupe")
+    index = DigestIndex(path, slots=8)
+    digests = [line_digest(b'{"i": %d}\n' % i) for i in range(100)]
+    for pos, d in enumerate(digests):
+        slot, kept = index.find(d)
+        assert kept is None
+        index.put(slot, d, pos, True)
+        assert index.used <= index.slots * audit_dedupe.MAX_LOAD
+    assert index.slots == 256 and index.used == 100
+    index.commit()
+    index.close()
+    index = DigestIndex(path)   # reopened: the grown table was committed in place
+    assert (index.slots, index.used) == (256, 100)
+    assert [index.find(d)[1] for d in digests] == list(range(100))
+    index.close()
+
+def test_dedupe_drops_repeated_lines_once(tmp_path):
+    log, idx = tmp_path / "audit.log", str(tmp_path / "audit.dedupe")
+    log.write_bytes(b"a\nb\na\n")
+    assert audit_dedupe.dedupe(str(log), idx) == 1
+    with open(log, "ab") as f:
+        f.write(b"b\nc\n")
+    assert audit_dedupe.dedupe(str(log), idx) == 1
+    assert audit_dedupe.dedupe(str(log), idx) == 0
+    assert log.read_bytes() == b"a\nb\nc\n"
+
+def test_self_check_leaves_a_chained_log_alone(tmp_path, monkeypatch):
+    from modules.diagnostics import self_check
+    log, idx = tmp_path / "audit.log", tmp_path / "audit.dedupe"
+    monkeypatch.setattr(self_check, "AUDIT_LOG", str(log))
+    monkeypatch.setattr(self_check, "AUDIT_DEDUPE", str(idx))
+    log.write_bytes(b"a\na\n")
+    assert self_check.dedupe_audit_log() is True
+    chained = b'{"action": "allow", "seq": 1, "prev": "00", "hash": "11"}\n'
+    log.write_bytes(b"a\na\n" + chained)
+    assert self_check.dedupe_audit_log() is False
+    assert log.read_bytes() == b"a\na\n" + chained
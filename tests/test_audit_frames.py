@@ -0,0 +1,67 @@
+import json
+import pytest
+from modules import audit_frames
+
+ENTRIES = [
+    {"action": "allow", "sha": "ab" * 32, "ts": 1700000000.125, "seq": 1, "prev": "0" * 64},
+    {"action": "quarantine", "why": "rule: é ☃ \u0000", "details": {"hits": [1, -2, 3.5e-9, None, True, False]}},
+    {"action": "checkpoint", "signature": "c2lnbmF0dXJl", "merkle": {"proof": ["cd" * 32], "index": 0}},
+    {"big": 2 ** 64, "bigger": 10 ** 40, "negative": -2 ** 64 - 1, "edge": 2 ** 64 - 1, "small": -2 ** 63},
+    {"hex_like": "ABCDEF0123456789", "odd": "abc", "short": "abcd", "empty": "", "list": []},
+    {"signature": "not base64!", "nested": {"a": {"b": {"c": [{}]}}}},
+]
+
+def test_jsonl_frames_jsonl_round_trip(tmp_path):
+    src, frames, back = tmp_path / "audit.log", tmp_path / "audit.avf", tmp_path / "back.log"
+    src.write_text("".join(json.dumps(e) + "\n" for e in ENTRIES) + "not json\n")
+    assert audit_frames.to_frames(str(src), str(frames)) == (len(ENTRIES), 1)
+    assert audit_frames.to_jsonl(str(frames), str(back)) == len(ENTRIES)
+    assert back.read_text() == "".join(json.dumps(e) + "\n" for e in ENTRIES)
+
+# RFC 8949 appendix A
+ENCODINGS = [
+    (0, "00"), (23, "17"), (24, "1818"), (1000, "1903e8"), (2 ** 32, "1b0000000100000000"),
+    (2 ** 64 - 1, "1bffffffffffffffff"), (2 ** 64, "c249010000000000000000"),
+    (-1, "20"), (-1000, "3903e7"), (-2 ** 64, "3bffffffffffffffff"), (-2 ** 64 - 1, "c349010000000000000000"),
+    (1.5, "fb3ff8000000000000"), (False, "f4"), (True, "f5"), (None, "f6"),
+    ("", "60"), ("a", "6161"), ("ü", "62c3bc"), (b"\x01\x02", "420102"),
+    ([1, [2, 3]], "8201820203"), ({"a": 1, "b": [2, 3]}, "a26161016162820203"),
+]
+
+def test_cbor_encodings():
+    for value, expected in ENCODINGS:
+        assert audit_frames.dumps(value).hex() == expected, value
+        assert audit_frames.loads(bytes.fromhex(expected)) == value
+
+def test_cbor_hex_strings_use_tag_23():
+    h = "0123456789abcdef" * 4
+    encoded = audit_frames.dumps(h)
+    assert encoded[:1] == b"\xd7" and len(encoded) < len(h)
+    assert audit_frames.loads(encoded) == h
+    for s in ("0123456789ABCDEF", "0123456789abcde", "0123456789abcd"):   # upper, odd, short
+        assert audit_frames.dumps(s)[:1] != b"\xd7" and audit_frames.loads(audit_frames.dumps(s)) == s
+
+def test_cbor_decodes_other_float_widths():
+    assert audit_frames.loads(bytes.fromhex("f93c00")) == 1.0
+    assert audit_frames.loads(bytes.fromhex("fa47c35000")) == 100000.0
+
+def test_cbor_rejects_what_it_cannot_read():
+    for bad in ("9f01ff", "0001", "f8ff"):   # indefinite length, trailing byte, simple value
+        with pytest.raises(audit_frames.FrameError):
+            audit_frames.loads(bytes.fromhex(bad))
+    with pytest.raises(TypeError):
+        audit_frames.dumps({"a": object()})
+
+def test_damaged_frame_is_detected(tmp_path):
+    path = tmp_path / "audit.avf"
+    audit_frames.append_frames(str(path), ENTRIES)
+    data = bytearray(path.read_bytes())
+    with audit_frames.FrameReader(str(path)) as reader:
+        offsets = reader.offsets()
+        assert [e for _, e in reader] == ENTRIES
+    data[offsets[2] + audit_frames.HEAD.size + 1] ^= 1
+    path.write_bytes(bytes(data))
+    with audit_frames.FrameReader(str(path)) as reader:
+        assert reader.read(offsets[1])[0] == ENTRIES[1]
+        with pytest.raises(audit_frames.FrameError):
+            reader.read(offsets[2])
@@ -0,0 +1,67 @@
+import json, os, threading
+from modules import audit_segments
+
+def _entries(n, first=0, t0=1000.0):
+    return [{"action": "allow" if i % 3 else "quarantine", "sha": f"{i % 7:064x}", "ts": t0 + i, "i": i}
+            for i in range(first, first + n)]
+
+def _write(path, entries):
+    with open(path, "a") as f:
+        f.write("".join(json.dumps(e) + "\n" for e in entries))
+
+def test_roll_seal_and_query(tmp_path, monkeypatch):
+    monkeypatch.setattr(audit_segments, "BLOCK", 512)   # several blocks per segment
+    log = str(tmp_path / "audit.log")
+    _write(log, _entries(100))
+    base = audit_segments.segment_base(log, 1)
+    os.replace(log, base)
+    sealed = audit_segments.seal(base)
+    assert not os.path.exists(base) and os.path.exists(sealed)
+    idx = audit_segments.load_index(base)
+    assert idx["lines"] == 100 and len(idx["blocks"]) > 3 and idx["ts"] == [1000.0, 1099.0]
+    _write(log, _entries(20, first=100))   # the live file carries on
+    everything = list(audit_segments.query(log))
+    assert [e["i"] for e in everything] == list(range(120))
+    hits = list(audit_segments.query(log, sha=f"{3:064x}", action="allow", since=1010, until=1110))
+    assert [e["i"] for e in hits] == [i for i in range(10, 111)
+                                      if i % 7 == 3 and i % 3 and i < 120]
+    assert list(audit_segments.query(log, sha="f" * 64)) == []
+    # offsets from the sealed segment are the offsets the plain file had
+    lines = [raw for _, raw in audit_segments.read_lines(sealed)]
+    offsets = [off for off, _ in audit_segments.read_lines(sealed)]
+    assert offsets == [sum(map(len, lines[:i])) for i in range(len(lines))]
+    assert next(audit_segments.read_lines(sealed, offsets[57]))[1] == lines[57]
+
+def test_concurrent_sealers_publish_one_segment(tmp_path):
+    log = str(tmp_path / "audit.log")
+    _write(log, _entries(2000))
+    base = audit_segments.segment_base(log, 1)
+    os.replace(log, base)
+    results, errors = [], []
+
+    def sealer():
+        try:
+            results.append(audit_segments.seal(base))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=sealer) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert errors == []
+    assert [r for r in results if r is not None] == [base + audit_segments.SUFFIX[audit_segments.CODEC]]
+    assert [e["i"] for e in audit_segments.query(log)] == list(range(2000))
+    sealed = os.path.basename(base) + audit_segments.SUFFIX[audit_segments.CODEC]
+    assert sorted(os.listdir(tmp_path)) == [sealed, os.path.basename(base) + ".idx"]   # no temp files left
+
+
+def test_seal_pending_seals_leftover_plain_segments(tmp_path):
+    log = str(tmp_path / "audit.log")
+    for n in (1, 2):
+        _write(log, _entries(10, first=10 * n))
+        os.replace(log, audit_segments.segment_base(log, n))
+    audit_segments.seal_pending(log)
+    assert all(audit_segments._split(f)[1] is not None for _, f in audit_segments.segments(log))
+    assert [e["i"] for e in audit_segments.query(log)] == list(range(10, 30))
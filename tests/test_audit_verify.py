@@ -0,0 +1,47 @@
+import json
+import pytest
+import crypto
+from modules import audit_verify
+
+def _write_log(path, privkey, batches=3, per_batch=5):
+    with open(path, "w") as f:
+        for b in range(batches):
+            rows = [{"action": "allow", "sha": f"{b:02x}{i:02x}" * 16, "i": i} for i in range(per_batch)]
+            f.write("".join(json.dumps(e) + "\n" for e in crypto.sign_batch(rows, privkey)))
+
+def test_lines_split_at_every_offset(tmp_path):
+    path = tmp_path / "audit.log"
+    path.write_bytes(b'{"a": 1}\n\n{"b": 22}\n{"c": 333}\npartial')
+    size = path.stat().st_size
+    whole = list(audit_verify._lines(str(path), 0, size, None))
+    newlines = [i for i, c in enumerate(path.read_bytes()) if c == ord("\n")]
+    # every cut, and in particular one on each newline and one just after it
+    for cut in sorted(set(range(size + 1)) | set(newlines) | {n + 1 for n in newlines}):
+        parts = (list(audit_verify._lines(str(path), 0, cut, None)) +
+                 list(audit_verify._lines(str(path), cut, size, None)))
+        assert parts == whole, cut
+
+@pytest.mark.parametrize("chunk", [1, 7, 64, 1 << 20])
+def test_report_is_the_same_for_any_chunk_size(tmp_path, keypair, chunk):
+    priv, pub = keypair
+    path = tmp_path / "audit.log"
+    _write_log(path, priv)
+    report = audit_verify.verify_signatures(str(path), pub, workers=1, chunk=chunk)
+    assert (report["checked"], report["ok"], report["bad"]) == (15, 15, 0)
+
+def test_failures_are_reported_with_their_offsets(tmp_path, keypair):
+    priv, pub = keypair
+    path = tmp_path / "audit.log"
+    _write_log(path, priv)
+    lines = path.read_bytes().splitlines(keepends=True)
+    lines[3] = lines[3].replace(b'"allow"', b'"quarantine"')   # tampered after its batch root verified
+    lines[7] = b'{"action": "allow"}\n'                        # unsigned
+    lines[11] = b"{not json\n"
+    path.write_bytes(b"".join(lines))
+    offsets = [sum(map(len, lines[:i])) for i in range(len(lines))]
+    for chunk in (1, 100, 1 << 20):
+        report = audit_verify.verify_signatures(str(path), pub, workers=1, chunk=chunk)
+        assert (report["ok"], report["bad"], report["missing"], report["malformed"]) == (12, 1, 1, 1)
+        assert report["offsets"]["bad"] == [("audit.log", offsets[3])]
+        assert report["offsets"]["missing"] == [("audit.log", offsets[7])]
+        assert report["offsets"]["malformed"] == [("audit.log", offsets[11])]
@@ -0,0 +1,25 @@
+import json, time
+from modules import audit_writer
+
+def _writer(path, rolled):
+    return audit_writer.AuditWriter(str(path), roller=rolled.append, interval=0.01)
+
+def test_segment_age_counts_from_the_first_entry(tmp_path):
+    path = tmp_path / "audit.log"
+    path.write_text(json.dumps({"action": "allow", "ts": time.time() - 2 * audit_writer.SEGMENT_AGE}) + "\n")
+    rolled = []
+    w = _writer(path, rolled)   # a restarted process: the file is old, the writer new
+    w.write({"action": "allow", "ts": time.time()}, sync=True)
+    w.close()
+    assert rolled == [str(path)]
+
+def test_fresh_log_is_not_rolled(tmp_path):
+    path = tmp_path / "audit.log"
+    rolled = []
+    w = _writer(path, rolled)
+    w.write({"action": "allow", "ts": time.time()}, sync=True)
+    w.close()
+    w = _writer(path, rolled)
+    w.write({"action": "allow", "ts": time.time()}, sync=True)
+    w.close()
+    assert rolled == []
@@ -0,0 +1,55 @@
+import hashlib
+import pytest
+import crypto
+
+def _batch(n, privkey):
+    return crypto.sign_batch([{"action": "allow", "i": i} for i in range(n)], privkey)
+
+@pytest.mark.parametrize("size", [1, 2, 3, 4, 5, 7, 8, 9, 16, 17])
+def test_every_proof_leads_to_the_root(size):
+    leaves = [hashlib.sha256(bytes([i])).digest() for i in range(size)]
+    levels = crypto._levels(leaves)
+    root = levels[-1][0]
+    for i, leaf in enumerate(leaves):
+        proof = crypto._proof(levels, i)
+        assert crypto._root_from_proof(leaf, i, size, proof) == root
+        if size > 1:   # the same proof at another index: wrong root, or a proof of the wrong length
+            try:
+                assert crypto._root_from_proof(leaf, (i + 1) % size, size, proof) != root
+            except (ValueError, StopIteration):
+                pass
+
+def test_proof_longer_than_the_tree_is_rejected():
+    levels = crypto._levels([b"a" * 32, b"b" * 32])
+    with pytest.raises(ValueError):
+        crypto._root_from_proof(b"a" * 32, 0, 2, crypto._proof(levels, 0) + ["00" * 32])
+
+def test_batch_entries_verify_alone_and_with_shared_roots(keypair):
+    priv, pub = keypair
+    entries = _batch(5, priv)
+    assert all(crypto.verify_log(e, pub) for e in entries)
+    roots = set()
+    assert all(crypto.verify_log(e, pub, roots) for e in entries)
+    assert len(roots) == 1
+
+def test_bad_batch_signature_is_never_cached(keypair):
+    priv, pub = keypair
+    entries, other = _batch(4, priv), _batch(3, priv)
+    for e in entries:
+        e["signature"] = other[0]["signature"]   # valid signature, different root
+    roots = set()
+    assert not any(crypto.verify_log(e, pub, roots) for e in entries)
+    assert roots == set()
+    assert all(crypto.verify_log(e, pub, roots) for e in other)
+
+def test_tampering_is_caught_once_the_root_is_cached(keypair):
+    priv, pub = keypair
+    entries = _batch(4, priv)
+    roots = set()
+    assert crypto.verify_log(entries[0], pub, roots)
+    forged_proof = dict(entries[1], merkle=dict(entries[1]["merkle"], proof=["00" * 32] * 2))
+    forged_body = dict(entries[2], action="quarantine")
+    forged_index = dict(entries[3], merkle=dict(entries[3]["merkle"], index=2))
+    for e in (forged_proof, forged_body, forged_index):
+        assert not crypto.verify_log(e, pub, roots)
+    assert crypto.verify_log(entries[1], pub, roots)
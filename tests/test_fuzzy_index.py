@@ -0,0 +1,18 @@
+from modules import registry_db
+from modules.fuzzy_index import FuzzyIndex, keys
+
+def test_short_chunks_are_keyed_whole():
+    assert keys("3:abc:ab") == {(3, "abc"), (6, "ab")}
+    assert keys("3::") == set()
+
+def test_identical_short_hash_is_a_candidate(tmp_path):
+    conn = registry_db.open_connection(str(tmp_path / "registry.db"), writer=True)
+    with conn:
+        tiny = conn.execute("INSERT INTO signatures(name, ssdeep) VALUES('tiny', '3:hMCE:hl')").lastrowid
+        conn.execute("INSERT INTO signatures(name, ssdeep) VALUES('other', '3:hMCF:hl2')")
+        big = conn.execute("INSERT INTO signatures(name, ssdeep) VALUES('big', "
+                           "'96:s4Ud1Lj96tHHlZDrwciQmA+4uy1I0G4HYuL8N3TzS8QsO/wqWXLcMSx:sF1LjEtHHlZDrwciQmA+4u')").lastrowid
+    index = FuzzyIndex(lambda: conn)
+    assert index.candidates("3:hMCE:hl") == {tiny}
+    assert big in index.candidates("96:xxs4Ud1Lj96tHHlZDrw:yy")
+    conn.close()
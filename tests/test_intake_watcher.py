@@ -0,0 +1,38 @@
+import os
+import pytest
+from modules.intake_watcher import IntakeWatcher
+
+NAMES = ("manifest.json", "manifest.sig", "artifact.bin")
+
+@pytest.fixture
+def watcher(tmp_path):
+    w = IntakeWatcher(str(tmp_path / "spool"), names=NAMES, recursive=True, settle=0.05)
+    if w.mode != "inotify":
+        w.close()
+        pytest.skip("inotify not available")
+    yield w
+    w.close()
+
+def _write(path, data=b"x"):
+    with open(path, "wb") as f:
+        f.write(data)
+
+def test_set_written_before_its_watch_is_reported(watcher):
+    d = os.path.join(watcher.root, "set1")
+    os.mkdir(d)
+    _write(os.path.join(d, "artifact.bin"))  # lands before the IN_CREATE for set1 is read
+    assert os.path.join(d, "artifact.bin") in watcher.wait(timeout=2)
+
+def test_retired_set_is_no_longer_watched(watcher):
+    d = os.path.join(watcher.root, "set1")
+    os.mkdir(d)
+    watcher.wait(timeout=0.2)
+    assert d in watcher._wds.values()
+    os.makedirs(os.path.join(watcher.root, ".processed"))
+    moved = os.path.join(watcher.root, ".processed", "set1")
+    os.rename(d, moved)
+    watcher.wait(timeout=0.2)
+    assert list(watcher._wds.values()) == [watcher.root]
+    _write(os.path.join(moved, "artifact.bin"))  # no event under the stale path
+    assert watcher.wait(timeout=0.3) == []
+    assert not watcher.pending()
@@ -0,0 +1,38 @@
+import json, sqlite3
+import pytest
+from modules import registry_db, registry_schema, local_matcher
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # no registry.snap here: lookups go to SQLite
+    monkeypatch.setattr(local_matcher, "DB", str(tmp_path / "registry.db"))
+    yield local_matcher.DB
+    registry_db.close_all()
+
+def _v1(path, rows):
+    conn = sqlite3.connect(path)
+    for step in registry_schema.MIGRATIONS[0][1]:
+        conn.execute(step)
+    conn.execute("PRAGMA user_version=1")
+    conn.executemany("INSERT INTO signatures(name, sha256, whirlpool, meta) VALUES(?,?,?,?)", rows)
+    conn.commit()
+    conn.close()
+
+def test_reader_below_v4_matches_on_signature_columns(registry):
+    _v1(registry, [("first", "aa" * 32, None, "{}"),
+                   ("again", "aa" * 32, None, "{}"),       # duplicate: the reader stays at v1
+                   ("md5 in sha256", "BB" * 16, None, "{}"),
+                   ("wp", None, "cc" * 64, "{}")])
+    assert registry_schema.version(registry_db.connect(registry)) == 1
+    assert local_matcher.match_exact("aa" * 32) == (1, "first", "sha256")
+    assert local_matcher.match_exact("ee" * 32, {"md5": "BB" * 16}) == (3, "md5 in sha256", "md5")
+    assert local_matcher.match_exact(None, {"whirlpool": "cc" * 64}) == (4, "wp", "whirlpool")
+    assert local_matcher.match_exact("ee" * 32) is None
+
+def test_current_registry_matches_through_hashes(registry):
+    with registry_db.transaction(registry) as conn:
+        conn.execute("INSERT INTO signatures(name, sha256, meta) VALUES(?,?,?)",
+                     ("feed", None, json.dumps({"hashes": {"sha1": "DD" * 20}})))
+    local_matcher._hash_filter.refresh(force=True)
+    assert local_matcher.match_exact("ee" * 32, {"sha1": "dd" * 20}) == (1, "feed", "sha1")
+    assert local_matcher.match_exact("ee" * 32) is None
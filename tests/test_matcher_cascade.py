@@ -0,0 +1,82 @@
+import os, time, threading
+import pytest
+from modules import matcher_cascade
+from modules.matcher_cascade import Stage
+
+def _hit(value, delay=0.0):
+    time.sleep(delay)
+    return value
+
+def _until_cancelled(cancel, seen=None, limit=5.0):
+    end = time.monotonic() + limit
+    while time.monotonic() < end:
+        if cancel.is_set():
+            if seen is not None:
+                seen.set()
+            return None
+        time.sleep(0.01)
+    return "too late"
+
+def _pid(cancel=None):
+    return os.getpid()
+
+def _boom():
+    raise RuntimeError("matcher failed")
+
+def test_first_hit_cancels_the_rest():
+    seen = threading.Event()
+    t0 = time.monotonic()
+    why, res, timings = matcher_cascade.run([
+        Stage("exact", _hit, None),
+        Stage("fuzzy", _hit, "match", delay=0.05),
+        Stage("rule", _until_cancelled, seen=seen, cancellable=True),
+    ])
+    assert (why, res) == ("fuzzy", "match")
+    assert time.monotonic() - t0 < 2.0
+    assert timings["rule"] == "cancelled" and seen.wait(2.0)
+    assert not matcher_cascade.conclusive(timings)
+
+def test_a_miss_by_every_stage_is_conclusive():
+    why, res, timings = matcher_cascade.run([Stage("exact", _hit, None), Stage("rule", _hit, 0)])
+    assert why is None and res is None
+    assert set(timings) == {"exact", "rule"} and matcher_cascade.conclusive(timings)
+
+def test_timeout_and_error_are_not_conclusive():
+    why, _, timings = matcher_cascade.run([
+        Stage("slow", _until_cancelled, timeout=0.1, cancellable=True),
+        Stage("broken", _boom),
+    ])
+    assert why is None
+    assert timings == {"slow": "timeout", "broken": "error"}
+    assert not matcher_cascade.conclusive(timings)
+
+@pytest.fixture
+def one_process(monkeypatch):
+    # a private single-worker pool: a stage still running would block the next one
+    monkeypatch.setattr(matcher_cascade, "MAX_PROCESSES", 1)
+    monkeypatch.setattr(matcher_cascade, "_processes", None)
+    yield
+    matcher_cascade._processes.shutdown()
+
+def test_process_stage_runs_in_the_pool_and_is_cancelled(one_process):
+    why, pid, timings = matcher_cascade.run([Stage("rule", _pid, process=True, cancellable=True)])
+    assert why == "rule" and pid != os.getpid()
+    assert isinstance(timings["rule"], float)
+    t0 = time.monotonic()
+    why, _, timings = matcher_cascade.run([
+        Stage("exact", _hit, "match", delay=0.2),
+        Stage("rule", _until_cancelled, process=True, cancellable=True),
+    ])
+    assert why == "exact" and timings["rule"] == "cancelled"
+    # the worker saw the shared flag and is free for the next run
+    why, _, _ = matcher_cascade.run([Stage("rule", _pid, process=True)])
+    assert why == "rule" and time.monotonic() - t0 < 4.0
+
+def _nested_run():
+    return matcher_cascade.run([Stage("rule", _pid, process=True)])[1]
+
+def test_pool_worker_runs_process_stages_on_threads():
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        worker = pool.submit(os.getpid).result()
+        assert pool.submit(_nested_run).result() == worker
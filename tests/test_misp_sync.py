@@ -0,0 +1,48 @@
+import time
+import pytest
+from modules import misp_sync, registry_db
+
+class FakeMISP:
+    def __init__(self, events):
+        self.events = events
+        self.searches = []
+
+    def search(self, controller, timestamp, page, limit, pythonify):
+        self.searches.append((timestamp, page))
+        hits = [{"Event": e} for e in self.events if e["timestamp"] >= timestamp]
+        return hits[(page - 1) * limit: page * limit]
+
+T = int(time.time())   # a first sync looks back one day
+
+def _event(uuid, stamp, atype, value):
+    return {"uuid": uuid, "timestamp": T + stamp, "info": uuid, "Attribute": [{"type": atype, "value": value}]}
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(misp_sync, "DB", str(tmp_path / "registry.db"))
+    yield misp_sync.DB
+    registry_db.close_all()
+
+def test_sync_resumes_from_its_cursor_and_skips_unchanged_events(db):
+    misp = FakeMISP([_event("e1", 100, "sha256", "AA" * 32), _event("e2", 200, "md5", "bb" * 16)])
+    res = misp_sync.sync_events(misp=misp, page_size=1)
+    assert (res["fetched"], res["changed"], res["added"], res["cursor"]) == (2, 2, 2, T + 200)
+    assert [p for _, p in misp.searches] == [1, 2, 3]
+    conn = registry_db.connect(db)
+    assert registry_db.get_cursor(conn, "misp") == str(T + 200)
+
+    misp.events.append(_event("e3", 300, "sha1", "cc" * 20))
+    misp.searches = []
+    res = misp_sync.sync_events(misp=misp, page_size=10)
+    assert misp.searches == [(T + 200, 1)]            # from the stored cursor, not N days back
+    assert (res["fetched"], res["changed"], res["added"], res["cursor"]) == (2, 1, 1, T + 300)
+    assert sorted(conn.execute("SELECT algo, digest FROM hashes").fetchall()) == [
+        ("md5", "bb" * 16), ("sha1", "cc" * 20), ("sha256", "aa" * 32)]
+
+def test_changed_event_is_reread_without_duplicating_rows(db):
+    misp = FakeMISP([_event("e1", 100, "sha256", "aa" * 32)])
+    misp_sync.sync_events(misp=misp)
+    misp.events[0]["timestamp"] += 50           # edited in MISP, same indicator
+    res = misp_sync.sync_events(misp=misp)
+    assert (res["changed"], res["added"]) == (1, 0)
+    assert registry_db.connect(db).execute("SELECT count(*) FROM signatures").fetchone()[0] == 1
@@ -0,0 +1,43 @@
+import errno, hashlib, os
+from modules import quarantine_store
+
+def _artifact(tmp_path, name, data):
+    p = tmp_path / name
+    p.write_bytes(data)
+    return str(p), hashlib.sha256(data).hexdigest()
+
+def test_identical_content_is_stored_once_and_refcounted(tmp_path):
+    root = str(tmp_path / "quarantine")
+    first, sha = _artifact(tmp_path, "first", b"payload")
+    second, _ = _artifact(tmp_path, "second", b"payload")
+    dst = quarantine_store.store(first, sha, "first", root=root)
+    assert quarantine_store.store(second, sha, "second", root=root) == dst
+    assert dst == os.path.join(root, "objects", sha[:2], sha[2:4], sha)
+    assert not os.path.exists(first) and not os.path.exists(second)
+    assert quarantine_store.stats(root) == {"objects": 1, "bytes": 7, "references": 2}
+    assert quarantine_store.release(sha, root=root) == 1
+    assert quarantine_store.contains(sha, root=root)
+    assert quarantine_store.release(sha, root=root) == 0
+    assert not quarantine_store.contains(sha, root=root)
+    assert quarantine_store.stats(root)["objects"] == 0
+
+def test_move_across_filesystems_copies_then_removes_the_source(tmp_path, monkeypatch):
+    def no_rename(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+    monkeypatch.setattr(quarantine_store.os, "rename", no_rename)
+    root = str(tmp_path / "quarantine")
+    data = os.urandom(3 << 20)
+    src, sha = _artifact(tmp_path, "upload", data)
+    dst = quarantine_store.store(src, sha, root=root)
+    with open(dst, "rb") as f:
+        assert f.read() == data
+    assert not os.path.exists(src)
+    assert os.listdir(os.path.dirname(dst)) == [sha]   # no .part temp file left behind
+
+def test_flat_layout_is_migrated(tmp_path):
+    root = tmp_path / "quarantine"
+    root.mkdir()
+    _, sha = _artifact(root, hashlib.sha256(b"old").hexdigest(), b"old")
+    assert quarantine_store.migrate_flat(str(root)) == 1
+    assert quarantine_store.contains(sha, root=str(root))
+    assert [r[0] for r in quarantine_store.list_objects(str(root))] == [sha]
@@ -0,0 +1,59 @@
+import json, os, shutil, sqlite3, subprocess, sys
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture
+def workdir(tmp_path, keypair):
+    os.makedirs(tmp_path / "keys")
+    shutil.copy(keypair[0], tmp_path / "keys" / "privkey.pem")
+    return tmp_path
+
+def _cli(workdir, *args):
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    return subprocess.run([sys.executable, "-m", "modules.registry_cli", *args], cwd=workdir, env=env,
+                          capture_output=True, text=True, check=True).stdout
+
+def _rows(workdir, sql):
+    conn = sqlite3.connect(str(workdir / "registry.db"))
+    try:
+        return sorted(conn.execute(sql).fetchall())
+    finally:
+        conn.close()
+
+def test_import_signs_batches_and_skips_duplicates(workdir):
+    records = [
+        {"name": "one", "sha256": "AA" * 32, "md5": "BB" * 16},
+        {"name": "one again", "sha256": "aa" * 32},
+        {"name": "rule", "meta": {"regex_patterns": ["evil\\d+"]}},
+        {"name": "two", "sha256": "cc" * 32, "author": "feed"},
+    ]
+    (workdir / "feed.jsonl").write_text("".join(json.dumps(r) + "\n" for r in records))
+    out = _cli(workdir, "--import", "feed.jsonl", "--batch", "2", "--workers", "2")
+    assert "[OK] imported 3/4 entries" in out
+    rows = _rows(workdir, "SELECT name, sha256, author, ts, meta, signer_pub, signature FROM signatures")
+    assert [(r[0], r[1], r[2]) for r in rows] == [
+        ("one", "aa" * 32, "import"), ("rule", None, "import"), ("two", "cc" * 32, "feed")]
+    for name, sha256, author, ts, meta, pub, sig in rows:
+        entry = {"name": name, "sha256": sha256, "whirlpool": None, "ssdeep": None, "rule_tag": None,
+                 "author": author, "ts": ts, "meta": json.loads(meta)}
+        Ed25519PublicKey.from_public_bytes(pub).verify(sig, json.dumps(entry, sort_keys=True).encode())
+    assert ("md5", "bb" * 16) in _rows(workdir, "SELECT algo, digest FROM hashes")
+    assert _rows(workdir, "SELECT kind, body FROM rules") == [("regex", "evil\\d+")]
+
+def test_migrate_sets_duplicates_aside_that_readers_left(workdir):
+    from modules import registry_db, registry_schema
+    conn = sqlite3.connect(str(workdir / "registry.db"))
+    for step in registry_schema.MIGRATIONS[0][1]:
+        conn.execute(step)
+    conn.execute("PRAGMA user_version=1")
+    conn.executemany("INSERT INTO signatures(name, sha256) VALUES(?, ?)", [("a", "aa" * 32), ("b", "aa" * 32)])
+    conn.commit()
+    assert not registry_db.prepare(conn)            # a gate opening it stops short
+    assert registry_schema.version(conn) == 1
+    conn.close()
+    out = _cli(workdir, "--migrate")
+    assert f"[OK] registry schema v{registry_schema.VERSION}" in out
+    assert _rows(workdir, "SELECT id, reason FROM signatures_removed") == [(2, "duplicate sha256")]
+    assert _rows(workdir, "SELECT name FROM signatures") == [("a",)]
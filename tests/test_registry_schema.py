@@ -0,0 +1,87 @@
+import json, sqlite3
+import pytest
+from modules import registry_schema
+
+ROWS = [
+    # name, sha256, meta
+    ("first", "aa" * 32, {"regex_patterns": ["evil\\d+"]}),
+    ("again", "aa" * 32, {}),                              # duplicate sha256 (pre-v2)
+    ("md5 in sha256", "BB" * 16, {}),                      # foreign digest (pre-v4)
+    ("sha1 in sha256", "cc" * 20, {"yara": "rule x { condition: true }"}),
+    ("domain", None, {"domain": "bad.example"}),
+    ("domain", None, {"domain": "bad.example"}),           # duplicate hashless row (pre-v5)
+    ("stix", None, {"observable": "ipv4-addr", "value": "10.0.0.1"}),
+    ("added with --file", "dd" * 32, {"size": 3, "md5": "EE" * 16, "sha1": "ff" * 20}),  # pre-v6
+]
+
+@pytest.fixture
+def v1(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "registry.db"))
+    for step in registry_schema.MIGRATIONS[0][1]:
+        conn.execute(step)
+    conn.execute("PRAGMA user_version=1")
+    conn.executemany("INSERT INTO signatures(name, sha256, meta) VALUES(?,?,?)",
+                     [(n, s, json.dumps(m)) for n, s, m in ROWS])
+    conn.commit()
+    yield conn
+    conn.close()
+
+def _all(conn, sql):
+    return sorted(conn.execute(sql).fetchall())
+
+def test_populated_v1_registry_migrates_to_current(v1):
+    assert registry_schema.migrate(v1) == registry_schema.VERSION
+    assert registry_schema.version(v1) == registry_schema.VERSION
+    assert _all(v1, "SELECT id, reason FROM signatures_removed") == [(2, "duplicate sha256"),
+                                                                     (6, "duplicate hashless")]
+    assert v1.execute("SELECT count(*) FROM signatures").fetchone()[0] == len(ROWS) - 2
+    assert _all(v1, "SELECT algo, digest, signature_id FROM hashes") == [
+        ("md5", "bb" * 16, 3), ("md5", "ee" * 16, 8), ("sha1", "cc" * 20, 4), ("sha1", "ff" * 20, 8),
+        ("sha256", "aa" * 32, 1), ("sha256", "dd" * 32, 8)]
+    assert _all(v1, "SELECT signature_id, kind, body FROM rules") == [
+        (1, "regex", "evil\\d+"), (4, "yara", "rule x { condition: true }")]
+    assert _all(v1, "SELECT signature_id, kind, value FROM iocs") == [
+        (5, "domain", "bad.example"), (7, "ipv4-addr", "10.0.0.1")]
+    # the derived tables follow later writes, and hashless rows stay unique
+    v1.execute("INSERT INTO signatures(name, meta) VALUES('new', ?)", (json.dumps({"regex_patterns": ["x+"]}),))
+    assert v1.execute("INSERT OR IGNORE INTO signatures(name, meta) VALUES('domain', ?)",
+                      (json.dumps({"domain": "bad.example"}),)).rowcount == 0
+    assert ("regex", "x+") in v1.execute("SELECT kind, body FROM rules").fetchall()
+
+def test_reader_leaves_moving_rows_to_a_writer(v1):
+    assert registry_schema.migrate(v1, destructive=False) == 1
+    assert v1.execute("SELECT count(*) FROM signatures").fetchone()[0] == len(ROWS)
+    assert registry_schema.migrate(v1, destructive=True) == registry_schema.VERSION
+
+def test_reader_migrates_a_registry_without_duplicates(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "registry.db"))
+    assert registry_schema.migrate(conn, destructive=False) == registry_schema.VERSION
+    conn.close()
+
+def test_shared_digest_outlives_one_of_its_signatures(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "registry.db"))
+    registry_schema.migrate(conn)
+    md5 = json.dumps({"hashes": {"md5": "ab" * 16}})
+    a = conn.execute("INSERT INTO signatures(name, meta) VALUES('a', ?)", (md5,)).lastrowid
+    b = conn.execute("INSERT INTO signatures(name, meta) VALUES('b', ?)", (md5,)).lastrowid
+    owners = "SELECT signature_id FROM hashes WHERE algo='md5' AND digest=? ORDER BY signature_id"
+    assert conn.execute(owners, ("ab" * 16,)).fetchall() == [(a,), (b,)]
+    conn.execute("DELETE FROM signatures WHERE id=?", (a,))
+    assert conn.execute(owners, ("ab" * 16,)).fetchall() == [(b,)]
+    conn.execute("UPDATE signatures SET meta='{}' WHERE id=?", (b,))
+    assert conn.execute(owners, ("ab" * 16,)).fetchall() == []
+    conn.close()
+
+def test_v6_registry_gets_every_owner_of_a_digest(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "registry.db"))
+    for target, steps in registry_schema.MIGRATIONS[:6]:
+        for step in steps:
+            step(conn) if callable(step) else conn.execute(step)
+    conn.execute("PRAGMA user_version=6")
+    md5 = json.dumps({"hashes": {"md5": "cd" * 16}})
+    conn.executemany("INSERT INTO signatures(name, meta) VALUES(?, ?)", [("a", md5), ("b", md5)])
+    assert conn.execute("SELECT count(*) FROM hashes").fetchone()[0] == 1   # the v4 table drops b's
+    conn.commit()
+    registry_schema.migrate(conn)
+    assert conn.execute("SELECT signature_id FROM hashes ORDER BY 1").fetchall() == [(1,), (2,)]
+    conn.close()
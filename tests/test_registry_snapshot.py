@@ -0,0 +1,38 @@
+import json
+import pytest
+from modules import registry_db, registry_snapshot, local_matcher
+from modules.registry_snapshot import Snapshot
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)   # registry.snap is looked up in the working dir
+    monkeypatch.setattr(registry_db, "MIRROR_REFRESH", 0.0)
+    monkeypatch.setattr(local_matcher, "DB", str(tmp_path / "registry.db"))
+    yield local_matcher.DB
+    registry_db.close_all()
+
+def _add(db, name, sha256=None, meta=None):
+    with registry_db.transaction(db) as conn:
+        conn.execute("INSERT INTO signatures(name, sha256, meta) VALUES(?,?,?)", (name, sha256, json.dumps(meta or {})))
+
+def test_snapshot_answers_digest_lookups(registry):
+    _add(registry, "first", "aa" * 32)
+    _add(registry, "feed", meta={"hashes": {"md5": "BB" * 16}})
+    _add(registry, "same md5", meta={"hashes": {"md5": "bb" * 16}})
+    gen = registry_snapshot.compile_snapshot(registry)
+    snap = Snapshot.current()
+    assert snap.generation == gen
+    assert snap.lookup("sha256", "AA" * 32) == (1, "first")
+    assert snap.lookup_digests({"sha256": "cc" * 32, "md5": "bb" * 16}) == (2, "feed", "md5")  # oldest wins
+    assert snap.lookup("md5", "dd" * 16) is None
+
+def test_stale_snapshot_falls_back_to_sqlite(registry):
+    _add(registry, "first", "aa" * 32)
+    registry_snapshot.compile_snapshot(registry)
+    assert local_matcher._snapshot() is not None
+    assert local_matcher.match_exact("aa" * 32) == (1, "first", "sha256")
+    _add(registry, "newer", "ee" * 32)          # a new generation, not republished
+    assert local_matcher._snapshot() is None
+    assert local_matcher.match_exact("ee" * 32) == (2, "newer", "sha256")
+    registry_snapshot.republish(registry)
+    assert local_matcher._snapshot().lookup("sha256", "ee" * 32) == (2, "newer")
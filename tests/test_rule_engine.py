@@ -0,0 +1,61 @@
+import json
+import pytest
+from modules import registry_db
+from modules.rule_engine import RuleEngine
+
+PATTERNS = [
+    r"\w+@example\.com",
+    r"(?i)secret-token",
+    r"é{3}",
+    r"tail$",
+    r"\bword\b",
+    r"^head",
+    r"foo(?=bar)",
+    r"baz(?!qux)",
+    r"[^\x00-\x7f]{2}end",
+]
+
+@pytest.fixture
+def engine(tmp_path):
+    conn = registry_db.open_connection(str(tmp_path / "registry.db"), writer=True)
+    with conn:
+        for i, pat in enumerate(PATTERNS):
+            conn.execute("INSERT INTO signatures(name, meta) VALUES(?, ?)",
+                         (f"rule{i}", json.dumps({"regex_patterns": [pat]})))
+    yield RuleEngine(lambda: conn)
+    conn.close()
+
+def _both(engine, path, window):
+    with open(path, "rb") as f:
+        whole = engine.scan(f.read().decode("utf-8", errors="ignore"))
+    return whole, engine.scan_file(path, window=window, overlap=64)
+
+@pytest.mark.parametrize("window", [97, 128, 250, 256, 1000, 1 << 20])
+def test_windows_match_whole_file(engine, tmp_path, window):
+    # edge-sensitive text sits on and around every window size above, so "$", "\b"
+    # and lookaheads would fire at a window end if it were treated as the file end
+    body = ("x" * 90 + " tail" + "wordy " + "foo" + "ba" + "bazqux " + "ééé" +
+            "SeCrEt-ToKeN " + "éÿend ")
+    data = (body * 40).encode("utf-8") + b"\xc3" + b"me@example.com"
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(data)
+    whole, windowed = _both(engine, str(path), window)
+    assert windowed == whole
+    assert {name for _, name, _ in whole} == {"rule0", "rule1", "rule2", "rule8"}
+
+def test_no_false_edge_hits(engine, tmp_path):
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(("wordsmith foobaz tailor " * 200).encode())
+    for window in range(60, 140):
+        whole, windowed = _both(engine, str(path), window)
+        assert whole == windowed
+    names = {name for _, name, _ in whole}
+    assert "rule3" not in names and "rule4" not in names and "rule6" not in names
+    assert "rule7" in names   # "baz" not followed by "qux"
+
+def test_genuine_edge_hits(engine, tmp_path):
+    path = tmp_path / "artifact.bin"
+    path.write_bytes(b"head " + b"a word " * 100 + b"foobar and tail")
+    whole, windowed = _both(engine, str(path), 64)
+    assert whole == windowed
+    assert {"rule3", "rule4", "rule5", "rule6"} <= {name for _, name, _ in windowed}
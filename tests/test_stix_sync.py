@@ -0,0 +1,54 @@
+import pytest
+
+pytest.importorskip("taxii2client")
+from modules import stix_sync, registry_db
+
+class FakeCollection:
+    id = "collection-1"
+    title = "Enterprise ATT&CK"
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.filters = []
+
+    def get_objects(self, **kwargs):
+        raise AssertionError("paged through as_pages")
+
+def _as_pages(func, per_request, **filters):
+    coll = func.__self__
+    coll.filters.append(filters)
+    for i in range(0, len(coll.objects), per_request):
+        yield {"objects": coll.objects[i:i + per_request]}
+
+def _indicator(n, pattern, modified="2024-01-01T00:00:00.000Z"):
+    return {"type": "indicator", "id": f"indicator--{n}", "name": f"ind{n}", "pattern": pattern,
+            "modified": modified}
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(stix_sync, "DB", str(tmp_path / "registry.db"))
+    monkeypatch.setattr(stix_sync, "as_pages", _as_pages)
+    stix_sync.init_db()
+    yield stix_sync.DB
+    registry_db.close_all()
+
+def test_sync_resumes_from_added_after_and_skips_unchanged_indicators(db):
+    coll = FakeCollection([
+        _indicator(1, "[file:hashes.'SHA-256' = '" + "AA" * 32 + "']"),
+        {"type": "attack-pattern", "id": "attack-pattern--1"},
+        _indicator(2, "[file:hashes.MD5 = '" + "bb" * 16 + "']"),
+    ])
+    assert stix_sync.sync_collection(coll, per_request=2) == 2
+    cursor = registry_db.get_cursor(registry_db.connect(db), "stix:collection-1")
+    assert coll.filters == [{}] and cursor
+
+    # the server repeats what it has: one indicator unchanged, one edited, one new
+    coll.objects[2]["modified"] = "2024-02-01T00:00:00.000Z"
+    coll.objects.append(_indicator(3, "[domain-name:value = 'bad.example']"))
+    assert stix_sync.sync_collection(coll, per_request=2) == 1
+    assert coll.filters[1] == {"added_after": cursor}
+    conn = registry_db.connect(db)
+    assert conn.execute("SELECT count(*) FROM signatures").fetchone()[0] == 3
+    assert sorted(conn.execute("SELECT algo, digest FROM hashes").fetchall()) == [
+        ("md5", "bb" * 16), ("sha256", "aa" * 32)]
+    assert conn.execute("SELECT kind, value FROM iocs").fetchall() == [("domain-name", "bad.example")]
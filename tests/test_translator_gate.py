@@ -0,0 +1,45 @@
+import json, os, shutil
+import pytest
+from verify_manifest import sign_manifest
+
+@pytest.fixture
+def gate(tmp_path, monkeypatch, keypair):
+    monkeypatch.chdir(tmp_path)  # quarantine/ and keys/ are relative to the working dir
+    os.makedirs("keys")
+    shutil.copy(keypair[1], "keys/pubkey.pem")
+    import translator_gate
+    entries = []
+    monkeypatch.setattr(translator_gate, "append_entry", entries.append)
+    return translator_gate, entries
+
+def _upload(spool, name, priv):
+    d = spool / name
+    d.mkdir(parents=True)
+    (d / "artifact.bin").write_bytes(name.encode())
+    (d / "manifest.json").write_text(json.dumps({"name": name}))
+    sign_manifest(str(d / "manifest.json"), str(d / "manifest.sig"), priv)
+    return d
+
+def _broken(*args, **kwargs):
+    raise RuntimeError("matcher crashed")
+
+def test_errored_set_is_quarantined_before_it_is_retired(gate, tmp_path, monkeypatch, keypair):
+    gate, entries = gate
+    spool = tmp_path / "spool"
+    _upload(spool, "set1", keypair[0])
+    monkeypatch.setattr(gate, "digest_file", _broken)
+    [res] = gate.process_spool(str(spool), workers=1)
+    assert res["status"] == "error" and os.path.isfile(res["path"])
+    assert [e.get("action", e.get("status")) for e in entries] == ["error", "quarantine"]
+    assert not (spool / "set1").exists() and (spool / ".processed" / "set1").is_dir()
+
+def test_set_that_could_not_be_quarantined_stays_in_the_spool(gate, tmp_path, monkeypatch, keypair):
+    gate, _ = gate
+    spool = tmp_path / "spool"
+    _upload(spool, "set1", keypair[0])
+    monkeypatch.setattr(gate, "digest_file", _broken)
+    monkeypatch.setattr(gate, "quarantine_file", _broken)
+    [res] = gate.process_spool(str(spool), workers=1)
+    assert res["status"] == "error" and "path" not in res
+    assert (spool / "set1" / "artifact.bin").is_file()
+    assert gate.scan_spool(str(spool)) == [tuple(str(spool / "set1" / f) for f in gate.SPOOL_FILES)]
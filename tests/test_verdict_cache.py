@@ -0,0 +1,41 @@
+from modules import registry_db
+from modules.verdict_cache import VerdictCache
+
+def _cache(tmp_path):
+    reg = str(tmp_path / "registry.db")
+    registry_db.open_connection(reg, writer=True).close()
+    return reg, VerdictCache(reg, str(tmp_path / "verdict_cache.db"))
+
+def _add_signature(reg, name):
+    conn = registry_db.open_connection(reg, writer=True)
+    with conn:
+        conn.execute("INSERT INTO signatures(name, sha256) VALUES(?, ?)", (name, name * 32))
+    conn.close()
+
+def test_registry_change_invalidates_cached_verdicts(tmp_path):
+    reg, cache = _cache(tmp_path)
+    gen = cache.current()
+    cache.put("a" * 64, "allow", "exact", generation=gen)
+    assert cache.get("a" * 64)["status"] == "allow"
+    _add_signature(reg, "bb")       # another connection commits: a new generation
+    assert cache.current() != gen
+    assert cache.get("a" * 64) is None
+    # nor does it come back from the on-disk store in a new process
+    assert VerdictCache(reg, str(tmp_path / "verdict_cache.db")).get("a" * 64) is None
+
+def test_verdict_from_an_older_generation_is_not_stored(tmp_path):
+    reg, cache = _cache(tmp_path)
+    stale = cache.current()
+    _add_signature(reg, "cc")
+    cache.put("d" * 64, "quarantine", generation=stale)
+    assert cache.get("d" * 64) is None
+    cache.put("d" * 64, "quarantine", generation=cache.current())
+    assert cache.get("d" * 64)["status"] == "quarantine"
+
+def test_lru_spills_to_the_store(tmp_path):
+    reg, cache = _cache(tmp_path)
+    cache.size = 2
+    for sha in ("1" * 64, "2" * 64, "3" * 64):
+        cache.put(sha, "allow", "rule")
+    assert list(cache._lru) == ["2" * 64, "3" * 64]
+    assert cache.get("1" * 64) == {"status": "allow", "why": "rule", "details": {}}
@@ -0,0 +1,44 @@
+import json, os
+import pytest
+from verify_manifest import verify_manifest, verify_manifests, sign_manifest
+
+def _signed(tmp_path, name, priv):
+    d = tmp_path / name
+    d.mkdir()
+    manifest, sig = str(d / "manifest.json"), str(d / "manifest.sig")
+    with open(manifest, "w") as f:
+        json.dump({"name": name}, f)
+    sign_manifest(manifest, sig, priv)
+    return manifest, sig
+
+def test_unreadable_inputs_are_bad_signatures(tmp_path, keypair):
+    priv, pub = keypair
+    manifest, sig = _signed(tmp_path, "a", priv)
+    assert verify_manifest(manifest, sig, pub) == {"name": "a"}
+    os.remove(sig)
+    with pytest.raises(ValueError):
+        verify_manifest(manifest, sig, pub)
+    with pytest.raises(ValueError):
+        verify_manifest(manifest, manifest, str(tmp_path / "missing.pem"))
+
+def test_batch_rejects_each_set_on_its_own(tmp_path, keypair):
+    priv, pub = keypair
+    good = _signed(tmp_path, "good", priv)
+    gone = _signed(tmp_path, "gone", priv)
+    os.remove(gone[1])
+    tampered = _signed(tmp_path, "tampered", priv)
+    with open(tampered[0], "a") as f:
+        f.write(" ")
+    (ok, err), (m1, e1), (m2, e2) = verify_manifests([good, gone, tampered], pub)
+    assert ok == {"name": "good"} and err is None
+    assert m1 is None and "cannot verify" in e1
+    assert m2 is None and "bad manifest signature" in e2
+
+def test_upload_without_a_public_key_is_rejected(tmp_path, monkeypatch, keypair):
+    monkeypatch.chdir(tmp_path)  # no keys/pubkey.pem here
+    import translator_gate
+    manifest, sig = _signed(tmp_path, "upload", keypair[0])
+    entries = []
+    res = translator_gate.process_upload(manifest, sig, manifest, audit=entries.append)
+    assert res == {"status": "reject", "reason": "bad_signature"}
+    assert entries[0]["reason"] == "bad_signature"
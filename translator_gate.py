@@ -1,14 +1,23 @@
 # translator_gate.py  (stand-alone version)
 import os, shutil, json, time, hashlib, base64
+from concurrent.futures import ProcessPoolExecutor
+from modules.digest_engine import digest_file
+from modules import verdict_cache, quarantine_store, matcher_cascade
+from modules.matcher_cascade import Stage
+from verify_manifest import verify_manifest, verify_manifests, sign_manifest
+import audit
 
 QUARANTINE_DIR = "quarantine"
+AUDIT_LOG = "audit.log"
+SPOOL_FILES = ("manifest.json", "manifest.sig", "artifact.bin")
+PROCESSED_DIR = ".processed"
+STAGE_TIMEOUTS = {"exact": 2.0, "fuzzy": 10.0, "rule": 30.0}  # seconds per matcher
 os.makedirs(QUARANTINE_DIR, exist_ok=True)
 
 # --- lightweight built-ins to make it run ---
-def append_entry(data):
-    # simple audit writer
-    with open("audit.log","a") as f:
-        f.write(json.dumps(data)+"\n")
+def append_entry(data, sync=False):
+    # hash-chained and group-committed (audit.py); sync=True waits until it is on disk
+    audit.append_entry(data, sync=sync, path=AUDIT_LOG)
 
 def compute_sha256(path):
     h = hashlib.sha256()
@@ -17,48 +26,169 @@ def compute_sha256(path):
             h.update(chunk)
     return h.hexdigest()
 
-def verify_manifest(manifest_path, sig_path, pubkey_path="keys/pubkey.pem"):
-    # fake verifier for now, just reads manifest
-    with open(manifest_path) as f:
-        return json.load(f)
-
-# placeholder matchers so the file runs
-def match_exact(_): return False
-def match_ssdeep(_): return False
-def match_rules(_): return False
+# registry matchers, with placeholders so the file runs without the registry deps
+try:
+    from modules.local_matcher import match_exact, match_ssdeep, match_rules, sync as sync_matchers
+except Exception:
+    def match_exact(_, digests=None): return False
+    def match_ssdeep(_, fuzzy=None, cancel=None): return False
+    def match_rules(_, cancel=None, generation=None): return False
+    def sync_matchers(generation): return generation
 # ------------------------------------------------
 
-def quarantine_file(content_p, manifest):
-    sha = compute_sha256(content_p)
-    dst = os.path.join(QUARANTINE_DIR, sha)
-    shutil.move(content_p, dst)
-    append_entry({
+def quarantine_file(content_p, manifest, audit=append_entry, sha=None, timings=None):
+    sha = sha or compute_sha256(content_p)
+    dst = quarantine_store.store(content_p, sha, manifest.get("name"), root=QUARANTINE_DIR)
+    entry = {
         "action":"quarantine",
         "sha":sha,
         "ts":time.time(),
         "manifest_name":manifest.get("name")
-    })
+    }
+    if timings:
+        entry["timings"] = timings
+    audit(entry)
     return dst
 
-def process_upload(manifest_p, sig_p, content_p):
-    manifest = verify_manifest(manifest_p, sig_p)
-    sha = compute_sha256(content_p)
+def process_upload(manifest_p, sig_p, content_p, audit=append_entry, manifest=None):
+    # manifest: already verified by a batch caller (process_spool)
+    if manifest is None:
+        try:
+            manifest = verify_manifest(manifest_p, sig_p)
+        except ValueError as e:
+            return _reject_manifest(str(e), audit)
+    digests = digest_file(content_p)  # the only read of the artifact
+    sha = digests["sha256"]
     if sha != manifest.get("content_sha256"):
-        append_entry({"status":"reject","reason":"hash_mismatch","sha":sha})
+        audit({"status":"reject","reason":"hash_mismatch","sha":sha})
         return {"status":"reject","reason":"hash_mismatch"}
 
-    if match_exact(sha):
-        append_entry({"action":"allow","sha":sha,"why":"exact"})
-        return {"status":"allow","why":"exact"}
-    if match_ssdeep(content_p):
-        append_entry({"action":"allow","sha":sha,"why":"fuzzy"})
-        return {"status":"allow","why":"fuzzy"}
-    if match_rules(content_p):
-        append_entry({"action":"allow","sha":sha,"why":"rule"})
-        return {"status":"allow","why":"rule"}
+    # repeat artifact: reuse the earlier decision while the registry is unchanged
+    cached = verdict_cache.lookup(sha)
+    if cached and cached["status"] == "allow":
+        audit({"action":"allow","sha":sha,"why":cached["why"],"cached":True})
+        return {"status":"allow","why":cached["why"],"cached":True}
+    if cached and cached["status"] == "quarantine":
+        qpath = quarantine_file(content_p, manifest, audit=audit, sha=sha)
+        return {"status":"quarantine","path":qpath,"cached":True}
+
+    # matchers see at least the generation the verdict is cached under
+    generation = sync_matchers(verdict_cache.generation())
+    # all matchers start together; the first hit cancels the rest
+    why, _, timings = matcher_cascade.run([
+        Stage("exact", match_exact, sha, digests=digests, timeout=STAGE_TIMEOUTS["exact"]),
+        Stage("fuzzy", match_ssdeep, content_p, fuzzy=digests["ssdeep"], timeout=STAGE_TIMEOUTS["fuzzy"],
+              cancellable=True),
+        Stage("rule", match_rules, content_p, generation=generation, timeout=STAGE_TIMEOUTS["rule"],
+              process=True, cancellable=True),
+    ])
+    if why:
+        return _allow(sha, why, audit, timings, generation)
+
+    if matcher_cascade.conclusive(timings):
+        verdict_cache.remember(sha, "quarantine", generation=generation)
+    qpath = quarantine_file(content_p, manifest, audit=audit, sha=sha, timings=timings)
+    return {"status":"quarantine","path":qpath,"timings":timings}
+
+def _allow(sha, why, audit, timings=None, generation=None):
+    verdict_cache.remember(sha, "allow", why, generation=generation)
+    audit({"action":"allow","sha":sha,"why":why,"timings":timings or {}})
+    return {"status":"allow","why":why,"timings":timings or {}}
+
+def _reject_manifest(reason, audit):
+    audit({"status":"reject","reason":"bad_signature","detail":reason,"ts":time.time()})
+    return {"status":"reject","reason":"bad_signature"}
+
+# --- spool batch intake ---
+def scan_spool(spool_dir, min_age=0):
+    """List complete manifest/sig/artifact sets, one sub-directory per upload, in name order.
+
+    Sets with a file modified in the last min_age seconds are left for a later pass.
+    """
+    sets = []
+    if not os.path.isdir(spool_dir):
+        return sets
+    now = time.time()
+    for name in sorted(os.listdir(spool_dir)):
+        if name.startswith("."):
+            continue  # .processed and in-flight uploads
+        paths = tuple(os.path.join(spool_dir, name, f) for f in SPOOL_FILES)
+        try:
+            newest = max(os.stat(p).st_mtime for p in paths)
+        except OSError:
+            continue  # incomplete set
+        if now - newest >= min_age:
+            sets.append(paths)
+    return sets
+
+def _spool_worker(job):
+    # runs in a pool process: collect audit entries so the parent writes them in order
+    paths, manifest = job
+    entries = []
+    try:
+        res = process_upload(*paths, audit=entries.append, manifest=manifest)
+    except Exception as e:
+        res = {"status":"error","reason":str(e)}
+        entries.append({"status":"error","reason":str(e),"artifact":paths[2]})
+        try:
+            # fail closed: an artifact the gate could not judge is quarantined
+            res["path"] = quarantine_file(paths[2], manifest, audit=entries.append)
+        except Exception:
+            pass  # not even quarantined: the set stays in the spool for the next pass
+    return res, entries
+
+def _judged(res):
+    # a set is retired once it has a verdict (allow, reject, quarantine)
+    return res.get("status") != "error" or "path" in res
+
+def _retire_set(spool_dir, paths):
+    set_dir = os.path.dirname(paths[0])
+    done = os.path.join(spool_dir, PROCESSED_DIR)
+    os.makedirs(done, exist_ok=True)
+    dst = os.path.join(done, os.path.basename(set_dir))
+    if os.path.exists(dst):
+        shutil.rmtree(dst)
+    os.replace(set_dir, dst)
+
+def process_spool(spool_dir, workers=None, pool=None, min_age=0):
+    """Run process_upload over every set in spool_dir across a process pool.
 
-    qpath = quarantine_file(content_p, manifest)
-    return {"status":"quarantine","path":qpath}
+    Returns one verdict per artifact in spool order; audit entries are written
+    in the same order. Processed sets are moved to <spool_dir>/.processed; a set
+    that errored and could not be quarantined is left in place for a retry.
+    """
+    sets = scan_spool(spool_dir, min_age)
+    if not sets:
+        return []
+    own_pool = pool is None and workers != 1
+    if own_pool:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        # one batched signature pass up front; workers only hash and match
+        verified = verify_manifests([p[:2] for p in sets], workers=workers, pool=pool)
+        jobs = [(paths, m) for paths, (m, err) in zip(sets, verified) if err is None]
+        if pool is None:
+            outcomes = map(_spool_worker, jobs)
+        else:
+            chunk = max(1, len(jobs) // (4 * (workers or os.cpu_count() or 1)))
+            outcomes = pool.map(_spool_worker, jobs, chunksize=chunk)
+        results = []
+        for paths, (_, err) in zip(sets, verified):
+            if err is None:
+                res, entries = next(outcomes)
+            else:
+                entries = []
+                res = _reject_manifest(err, entries.append)
+            for e in entries:
+                append_entry(e)
+            res["artifact"] = os.path.basename(os.path.dirname(paths[2]))
+            results.append(res)
+            if _judged(res):
+                _retire_set(spool_dir, paths)
+    finally:
+        if own_pool:
+            pool.shutdown()
+    return results
 
 
 # quick self-test so you can run it standalone
@@ -69,7 +199,11 @@ if __name__ == "__main__":
     sha = compute_sha256("artifact.bin")
     with open("manifest.json","w") as f:
         json.dump({"name":"demo_artifact","content_sha256":sha}, f)
-    open("manifest.sig","w").write(base64.b64encode(b"sig").decode())
+    if os.path.exists("keys/privkey.pem"):
+        sign_manifest("manifest.json", "manifest.sig")
+    else:
+        print("[TEST] keys/privkey.pem missing, manifest will fail verification")
+        open("manifest.sig","w").write(base64.b64encode(b"sig").decode())
 
     print("[TEST] Running translator_gate self-test")
     result = process_upload("manifest.json","manifest.sig","artifact.bin")
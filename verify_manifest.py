@@ -0,0 +1,95 @@
+# verify_manifest.py
+"""
+Ed25519 manifest verification.
+manifest.sig holds the signature (raw 64 bytes or base64) over the exact bytes of
+manifest.json. Public keys are parsed once per process and reused for every call.
+"""
+
+import os, json, base64, binascii, functools
+from concurrent.futures import ProcessPoolExecutor
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives import serialization
+from cryptography.exceptions import InvalidSignature
+
+PUBKEY_PATH = "keys/pubkey.pem"
+PRIVKEY_PATH = "keys/privkey.pem"
+POOL_MIN = 256  # below this a batch is verified in-process
+
+@functools.lru_cache(maxsize=16)
+def _load_pubkey(path, mtime_ns):
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) == 32:  # raw key, as written by the vault's key tooling
+        return Ed25519PublicKey.from_public_bytes(data)
+    return serialization.load_pem_public_key(data)
+
+def load_pubkey(path=PUBKEY_PATH):
+    """Parsed public key; cached per process and reloaded only if the file changes."""
+    return _load_pubkey(os.path.abspath(path), os.stat(path).st_mtime_ns)
+
+def read_signature(sig_path):
+    with open(sig_path, "rb") as f:
+        raw = f.read()
+    if len(raw) == 64:
+        return raw
+    try:
+        return base64.b64decode(raw.strip(), validate=True)
+    except binascii.Error:
+        raise ValueError(f"malformed signature file: {sig_path}")
+
+def verify_manifest(manifest_path, sig_path, pubkey_path=PUBKEY_PATH):
+    """Return the parsed manifest; raises ValueError if the signature does not verify,
+    including when the manifest, signature or public key cannot be read."""
+    try:
+        with open(manifest_path, "rb") as f:
+            body = f.read()
+        load_pubkey(pubkey_path).verify(read_signature(sig_path), body)
+    except InvalidSignature:
+        raise ValueError(f"bad manifest signature: {manifest_path}")
+    except OSError as e:
+        raise ValueError(f"cannot verify {manifest_path}: {e}")
+    return json.loads(body)
+
+def _verify_one(item, pubkey_path=PUBKEY_PATH):
+    try:
+        return verify_manifest(item[0], item[1], pubkey_path), None
+    except ValueError as e:
+        return None, str(e)
+
+def _verify_chunk(args):
+    items, pubkey_path = args
+    return [_verify_one(it, pubkey_path) for it in items]
+
+def verify_manifests(items, pubkey_path=PUBKEY_PATH, workers=None, pool=None):
+    """Verify many (manifest_path, sig_path) pairs in one call.
+
+    Returns [(manifest or None, error or None)] in input order. Large batches are
+    split across a process pool, the caller's executor if one is given; each worker
+    loads the key once.
+    """
+    items = list(items)
+    if len(items) < POOL_MIN or workers == 1:
+        return [_verify_one(it, pubkey_path) for it in items]
+    n = workers or os.cpu_count() or 1
+    size = -(-len(items) // n)
+    chunks = [(items[i:i + size], pubkey_path) for i in range(0, len(items), size)]
+    own_pool = pool is None
+    if own_pool:
+        pool = ProcessPoolExecutor(max_workers=n)
+    out = []
+    try:
+        for part in pool.map(_verify_chunk, chunks):
+            out.extend(part)
+    finally:
+        if own_pool:
+            pool.shutdown()
+    return out
+
+def sign_manifest(manifest_path, sig_path, privkey_path=PRIVKEY_PATH):
+    """Write a base64 Ed25519 signature for manifest_path (self-tests and tooling)."""
+    with open(privkey_path, "rb") as f:
+        sk = Ed25519PrivateKey.from_private_bytes(f.read())
+    with open(manifest_path, "rb") as f:
+        sig = sk.sign(f.read())
+    with open(sig_path, "w") as f:
+        f.write(base64.b64encode(sig).decode())